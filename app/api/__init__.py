@@ -4,6 +4,7 @@ API 路由模块
 提供RESTful API接口，包括：
     - research: 研究相关API接口
     - history: 历史记录API接口
+    - system: 进程级运行状态 (连接池、调度器、缓存)
 
 本模块封装了所有对外暴露的API路由，
 通过FastAPI框架实现高效的网络请求处理。
@@ -15,10 +16,11 @@ API 路由模块
 版本: 1.0.0
 """
 
-from . import research, history
+from . import research, history, system
 
 # 明确列出所有公开的子模块
 __all__ = [
     "research",
     "history",
+    "system",
 ]
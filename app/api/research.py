@@ -3,6 +3,11 @@ from fastapi import APIRouter
 from sse_starlette.sse import EventSourceResponse
 from app.modules.orchestrator.graph import build_graph
 from app.core.config import settings
+from app.core.cancellation import create_token, release_token
+from app.core.budget import create_budget, release_budget
+from app.core.llm_scheduler import llm_scheduler
+from app.modules.orchestrator.deadline import create_planner, release_planner
+from app.modules.utils.file_utils import save_markdown_report
 # 🟢 必须换回 AsyncSqliteSaver
 from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver 
 import aiosqlite
@@ -17,6 +22,62 @@ router = APIRouter()
 # 获取未编译的图谱构建器
 workflow_builder = build_graph()
 
+async def _inspect_checkpoint(graph, config) -> dict:
+    """
+    🟢 检查 thread_id 是否已有检查点，决定本次是全新运行、断点续跑还是已完成
+
+    Returns:
+        {
+            "mode": "fresh" | "resume" | "completed",
+            "resumed_from": 下一个待执行的节点列表,
+            "skipped_nodes": 已完成（本次跳过）的节点，按执行顺序排列,
+            "values": 检查点中的最新状态
+        }
+    """
+    snapshot = await graph.aget_state(config)
+    if not snapshot or not snapshot.values:
+        return {"mode": "fresh", "resumed_from": [], "skipped_nodes": [], "values": {}}
+
+    # 历史检查点按时间倒序返回；除最新一个外，每个检查点的 next 都已执行完毕
+    history = [h async for h in graph.aget_state_history(config)]
+    skipped_nodes = []
+    for h in reversed(history[1:]):
+        skipped_nodes.extend(n for n in h.next if not n.startswith("__"))
+
+    return {
+        "mode": "resume" if snapshot.next else "completed",
+        "resumed_from": list(snapshot.next),
+        "skipped_nodes": skipped_nodes,
+        "values": snapshot.values,
+    }
+
+async def _recover_partial_report(config) -> str:
+    """
+    🟢 硬超时兜底：从检查点中取出目前为止最好的报告
+    优先级：final_report > draft_report > 已完成的分章节草稿
+    """
+    try:
+        async with aiosqlite.connect(settings.CHECKPOINT_DB_PATH) as conn:
+            await conn.execute("PRAGMA busy_timeout=30000;")
+            setattr(conn, "is_alive", lambda: True)
+            graph = workflow_builder.compile(checkpointer=AsyncSqliteSaver(conn))
+            snapshot = await graph.aget_state(config)
+    except Exception as e:
+        print(f"⚠️ [System] Failed to load checkpoint for partial report: {e}")
+        return ""
+
+    values = snapshot.values if snapshot else {}
+    if values.get("final_report"):
+        return values["final_report"]
+    if values.get("draft_report"):
+        return values["draft_report"]
+
+    section_drafts = values.get("section_drafts") or {}
+    if not section_drafts:
+        return ""
+    sections = "\n\n".join(f"## {title}\n\n{text}" for title, text in section_drafts.items())
+    return f"# {values.get('clarified_intent') or values.get('task', '')}\n\n{sections}"
+
 @router.get("/stream")
 async def stream_research(topic: str, thread_id: str = None):
     """
@@ -26,7 +87,8 @@ async def stream_research(topic: str, thread_id: str = None):
         topic: 研究主题
         thread_id: 可选参数，支持断点续传。
                   - 首次请求：不传此参数，系统自动生成新的 thread_id
-                  - 续传请求：传入之前返回的 thread_id，可恢复之前的会话状态
+                  - 续传请求：传入之前返回的 thread_id，从最后完成的节点继续执行，
+                    已完成的节点 (搜索、爬取、写作) 不会重复执行
     """
     # 如果前端未提供 thread_id，则生成新的 UUID
     thread_id = thread_id or str(uuid.uuid4())
@@ -52,6 +114,14 @@ async def stream_research(topic: str, thread_id: str = None):
             "draft_report": "",      
             "final_report": "",     
         }
+
+        # 🟢 协作式取消令牌：超时或客户端断开时，通知在途的 LLM / 爬虫 / OCR 立即停止
+        cancel_token = create_token(task_id)
+        finished = False
+        # 🟢 截止时间规划器：按阶段切分 GLOBAL_TIMEOUT_SEC，时间不足时逐级降级
+        deadline_planner = create_planner(task_id, settings.GLOBAL_TIMEOUT_SEC)
+        # 🟢 资源预算：token / 搜索次数 / 抓取页数 / OCR 秒数
+        budget = create_budget(task_id)
         
         try:
             async with timeout(settings.GLOBAL_TIMEOUT_SEC):
@@ -77,12 +147,41 @@ async def stream_research(topic: str, thread_id: str = None):
                     # 3. 编译图谱
                     graph = workflow_builder.compile(checkpointer=checkpointer)
                     
-                    # 4. 运行图谱 (astream 必须配对异步 checkpointer)
-                    async for event in graph.astream(inputs, config=config):
+                    # 4. 🟢 断点续跑：已有检查点时以 None 作为输入，从中断处继续
+                    session = await _inspect_checkpoint(graph, config)
+                    stream_inputs = inputs if session["mode"] == "fresh" else None
+                    if session["mode"] != "fresh":
+                        print(f"♻️ [System] Resuming {task_id} from {session['resumed_from'] or 'END'}, "
+                              f"skipped {len(session['skipped_nodes'])} completed nodes")
+
+                    yield {
+                        "event": "session",
+                        "data": json.dumps({
+                            "thread_id": thread_id,
+                            "mode": session["mode"],
+                            "resumed_from": session["resumed_from"],
+                            "skipped_nodes": session["skipped_nodes"],
+                        }, ensure_ascii=False)
+                    }
+
+                    # 已完成的会话：直接回放最终报告 (随后的 astream(None) 不会再执行任何节点)
+                    if session["mode"] == "completed":
+                        yield {
+                            "event": "update",
+                            "data": json.dumps({
+                                "step": "publisher",
+                                "data": {"final_report": session["values"].get("final_report", "")}
+                            }, default=str, ensure_ascii=False)
+                        }
+
+                    # 5. 运行图谱 (astream 必须配对异步 checkpointer)
+                    async for event in graph.astream(stream_inputs, config=config):
                         for node_name, state_update in event.items():
                             payload = {
                                 "step": node_name,
-                                "data": state_update
+                                "data": state_update,
+                                "deadline": deadline_planner.snapshot(),
+                                "budget": budget.snapshot()
                             }
                             
                             json_str = json.dumps(
@@ -98,10 +197,24 @@ async def stream_research(topic: str, thread_id: str = None):
                             # 缓冲一下
                             await asyncio.sleep(0.1)
 
+                finished = True
                 yield {"event": "finish", "data": "DONE"}
 
         except asyncio.TimeoutError:
+            cancel_token.cancel("global timeout")
             print(f"⏰ Task timed out after {settings.GLOBAL_TIMEOUT_SEC}s")
+
+            # 🟢 即使硬超时也尽量交付报告：回收检查点中已完成的草稿
+            partial_report = await _recover_partial_report(config)
+            if partial_report:
+                save_markdown_report(topic, partial_report)
+                yield {
+                    "event": "update",
+                    "data": json.dumps({
+                        "step": "publisher",
+                        "data": {"final_report": partial_report, "partial": True}
+                    }, ensure_ascii=False)
+                }
             error_payload = json.dumps(
                 {"error": f"Global Timeout: Research stopped after {settings.GLOBAL_TIMEOUT_SEC} seconds."}, 
                 ensure_ascii=False
@@ -114,4 +227,13 @@ async def stream_research(topic: str, thread_id: str = None):
             error_payload = json.dumps({"error": str(e)}, ensure_ascii=False)
             yield {"event": "error", "data": error_payload}
 
+        finally:
+            # 出错或客户端断开 (CancelledError / GeneratorExit) 时，释放所有在途资源
+            if not finished:
+                cancel_token.cancel("stream closed")
+            release_token(task_id, cancel_token)
+            release_planner(task_id, deadline_planner)
+            release_budget(task_id, budget)
+            llm_scheduler.forget(task_id)
+
     return EventSourceResponse(event_generator())
\ No newline at end of file
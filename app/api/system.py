@@ -0,0 +1,47 @@
+# app/api/system.py
+from fastapi import APIRouter
+from app.core.http import http_clients
+from app.core.llm_scheduler import llm_scheduler
+from app.modules.perception.search_cache import search_cache
+from app.modules.perception.tavily_keys import tavily_keys
+from app.modules.perception.github_provider import github_client
+from app.modules.perception.arxiv_provider import arxiv_client
+from app.modules.perception.search import provider_stats
+from app.modules.perception.fetch_ledger import fetch_ledger
+from app.modules.perception.browser_pool import browser_pool
+from app.modules.perception.crawler import crawl_stats
+from app.modules.perception.content_router import router_stats
+from app.modules.perception.ocr_service import ocr_service
+from app.modules.perception.ocr_cache import ocr_cache
+from app.modules.perception.page_triage import triage_snapshot
+from app.modules.perception.pdf_parallel import pdf_text_stats
+
+router = APIRouter()
+
+
+@router.get("/system/http")
+async def http_stats():
+    """共享 HTTP 连接池的请求数、连接复用率与 HTTP/2 使用情况"""
+    return http_clients.stats()
+
+
+@router.get("/system/stats")
+async def system_stats():
+    """进程级共享组件的运行状态 (LLM 调度、搜索缓存、HTTP 连接池、Tavily Key 池)"""
+    return {
+        "llm_scheduler": llm_scheduler.snapshot(),
+        "search_cache": dict(search_cache.stats),
+        "search_providers": provider_stats(),
+        "fetch_ledger": dict(fetch_ledger.stats),
+        "browser_pool": browser_pool.snapshot(),
+        "crawl_tiers": dict(crawl_stats),
+        "content_router": dict(router_stats),
+        "ocr": ocr_service.snapshot(),
+        "ocr_cache": dict(ocr_cache.stats),
+        "ocr_triage": triage_snapshot(),
+        "pdf_text": dict(pdf_text_stats),
+        "http": http_clients.stats(),
+        "tavily_keys": tavily_keys.stats(),
+        "github": dict(github_client.stats),
+        "arxiv": dict(arxiv_client.stats),
+    }
@@ -0,0 +1,108 @@
+# app/core/budget.py
+"""
+任务级资源预算 (Per-task Resource Budget)
+
+单个病态主题可能触发上百次断言核查，每次都是一轮 4 平台搜索外加可能的 3 次 MAD 调用，
+会挤占其他租户的配额。每个研究任务持有一个 ResourceBudget，在以下边界处扣减：
+
+    - llm_tokens   : simple_llm_call (按 usage.total_tokens 计)
+    - search_calls : search_generic (每次混合搜索计 1 次)
+    - crawl_pages  : crawl_urls (每个 URL 计 1 页)
+    - ocr_seconds  : process_pdf_sync (OCR 消耗的线程 CPU 秒)
+
+预算耗尽时各边界优雅退化 (搜索返回空、跳过抓取/OCR、LLM 返回错误文本)，
+编排层据此提前收尾并发布已有成果。上限为 0 表示不限制。
+"""
+import threading
+from typing import Dict, Optional
+
+from app.core.config import settings
+
+RESOURCES = ("llm_tokens", "search_calls", "crawl_pages", "ocr_seconds")
+
+
+class ResourceBudget:
+    """线程安全的资源计数器 (OCR 在工作线程中扣减)"""
+
+    def __init__(self, task_id: str, limits: Dict[str, float] = None):
+        self.task_id = task_id
+        self.limits: Dict[str, float] = limits or {
+            "llm_tokens": settings.TASK_BUDGET_LLM_TOKENS,
+            "search_calls": settings.TASK_BUDGET_SEARCH_CALLS,
+            "crawl_pages": settings.TASK_BUDGET_CRAWL_PAGES,
+            "ocr_seconds": settings.TASK_BUDGET_OCR_SECONDS,
+        }
+        self.used: Dict[str, float] = {k: 0 for k in RESOURCES}
+        self._lock = threading.Lock()
+        self._warned = set()
+
+    def remaining(self, kind: str) -> float:
+        limit = self.limits.get(kind, 0)
+        if not limit:
+            return float("inf")
+        return max(0, limit - self.used[kind])
+
+    def fraction_left(self, kind: str) -> float:
+        limit = self.limits.get(kind, 0)
+        if not limit:
+            return 1.0
+        return self.remaining(kind) / limit
+
+    def exhausted(self, kind: str) -> bool:
+        return self.remaining(kind) <= 0
+
+    def acquire(self, kind: str, amount: float = 1) -> float:
+        """
+        预占资源，返回实际获批的数量 (可能少于申请量，耗尽时为 0)。
+        用于搜索次数、抓取页数等可预知的离散资源。
+        """
+        with self._lock:
+            granted = min(amount, self.remaining(kind))
+            self.used[kind] += granted
+        if granted < amount:
+            self._warn_exhausted(kind)
+        return granted
+
+    def consume(self, kind: str, amount: float):
+        """事后记账 (允许少量透支)，用于 token 数、OCR 秒数等只能事后得知的资源"""
+        with self._lock:
+            self.used[kind] += amount
+        if self.exhausted(kind):
+            self._warn_exhausted(kind)
+
+    def _warn_exhausted(self, kind: str):
+        if kind not in self._warned:
+            self._warned.add(kind)
+            print(f"💸 [Budget] Task {self.task_id} exhausted {kind} "
+                  f"({self.used[kind]:.0f}/{self.limits[kind]:.0f})")
+
+    def snapshot(self) -> dict:
+        return {
+            kind: {
+                "used": round(self.used[kind], 1),
+                "limit": self.limits.get(kind, 0) or None,
+                "remaining": None if not self.limits.get(kind) else round(self.remaining(kind), 1),
+            }
+            for kind in RESOURCES
+        }
+
+
+# --- 任务级注册表 (task_id -> budget) ---
+_budgets: Dict[str, ResourceBudget] = {}
+
+
+def create_budget(task_id: str) -> ResourceBudget:
+    budget = ResourceBudget(task_id)
+    _budgets[task_id] = budget
+    return budget
+
+
+def get_budget(task_id: Optional[str]) -> Optional[ResourceBudget]:
+    if not task_id:
+        return None
+    return _budgets.get(task_id)
+
+
+def release_budget(task_id: str, budget: Optional[ResourceBudget] = None):
+    if budget is None or _budgets.get(task_id) is budget:
+        _budgets.pop(task_id, None)
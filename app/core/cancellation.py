@@ -0,0 +1,138 @@
+# app/core/cancellation.py
+"""
+协作式取消 (Cooperative Cancellation)
+
+客户端断开或全局超时后，让仍在运行的 LLM 调用、浏览器页面和 OCR 线程尽快停下。
+每个研究任务 (task_id) 对应一个 CancellationToken：
+    - 异步代码通过 run_cancellable() 执行，取消时立即中断协程，释放 HTTP 连接 / 浏览器页面
+    - 线程池中的同步代码 (PDF/OCR) 在页与页之间检查 token.cancelled
+"""
+import asyncio
+import threading
+from typing import Awaitable, Dict, List, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+# 被取消的协程最多等待多久完成清理 (关闭页面、断开连接)
+CANCEL_GRACE_SEC = 5.0
+
+
+class TaskCancelledError(asyncio.CancelledError):
+    """
+    研究任务已被取消。
+    继承 CancelledError (BaseException)，避免被各模块的 `except Exception` 兜底逻辑吞掉。
+    """
+
+
+class CancellationToken:
+    """线程安全的取消令牌，可同时被事件循环和工作线程观察"""
+
+    def __init__(self, task_id: str):
+        self.task_id = task_id
+        self.reason: Optional[str] = None
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._waiters: List[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = []
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self, reason: str = "cancelled"):
+        """触发取消 (幂等，可在任意线程调用)"""
+        with self._lock:
+            if self._event.is_set():
+                return
+            self.reason = reason
+            self._event.set()
+            waiters, self._waiters = self._waiters, []
+
+        print(f"🛑 [Cancel] Task {self.task_id} cancelled: {reason}")
+        for loop, fut in waiters:
+            loop.call_soon_threadsafe(_resolve, fut)
+
+    def raise_if_cancelled(self):
+        if self._event.is_set():
+            raise TaskCancelledError(f"Task {self.task_id} cancelled: {self.reason}")
+
+    async def wait(self):
+        """挂起直到令牌被取消"""
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        with self._lock:
+            if self._event.is_set():
+                return
+            self._waiters.append((loop, fut))
+        try:
+            await fut
+        finally:
+            with self._lock:
+                if (loop, fut) in self._waiters:
+                    self._waiters.remove((loop, fut))
+
+    async def run(self, aw: Awaitable[T]) -> T:
+        """
+        执行协程；一旦令牌被取消，立即 cancel 该协程并抛出 TaskCancelledError
+        """
+        if self.cancelled and asyncio.iscoroutine(aw):
+            aw.close()
+        self.raise_if_cancelled()
+        task = asyncio.ensure_future(aw)
+        watcher = asyncio.ensure_future(self.wait())
+        try:
+            await asyncio.wait({task, watcher}, return_when=asyncio.FIRST_COMPLETED)
+        except asyncio.CancelledError:
+            task.cancel()
+            raise
+        finally:
+            watcher.cancel()
+
+        if task.done():
+            return task.result()
+
+        # 令牌已取消：中断协程，并给它有限的时间完成清理
+        task.cancel()
+        await asyncio.wait({task}, timeout=CANCEL_GRACE_SEC)
+        self.raise_if_cancelled()
+
+
+def _resolve(fut: asyncio.Future):
+    if not fut.done():
+        fut.set_result(None)
+
+
+# --- 任务级注册表 (task_id -> token) ---
+_tokens: Dict[str, CancellationToken] = {}
+
+
+def create_token(task_id: str) -> CancellationToken:
+    """为新的研究流创建令牌 (同一 thread_id 重新连接时替换旧令牌)"""
+    token = CancellationToken(task_id)
+    _tokens[task_id] = token
+    return token
+
+
+def get_token(task_id: Optional[str]) -> Optional[CancellationToken]:
+    if not task_id:
+        return None
+    return _tokens.get(task_id)
+
+
+def release_token(task_id: str, token: Optional[CancellationToken] = None):
+    """流结束后移除令牌；传入 token 时仅当它仍是当前令牌才移除"""
+    if token is None or _tokens.get(task_id) is token:
+        _tokens.pop(task_id, None)
+
+
+def raise_if_cancelled(task_id: Optional[str]):
+    token = get_token(task_id)
+    if token:
+        token.raise_if_cancelled()
+
+
+async def run_cancellable(aw: Awaitable[T], task_id: Optional[str]) -> T:
+    """在任务令牌的保护下执行协程；没有令牌时直接 await"""
+    token = get_token(task_id)
+    if token is None:
+        return await aw
+    return await token.run(aw)
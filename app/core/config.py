@@ -1,7 +1,7 @@
 # app/core/config.py
 from pydantic_settings import BaseSettings
 from pydantic import field_validator
-from typing import List, Union, Any
+from typing import Dict, List, Union, Any
 import os
 
 class Settings(BaseSettings):
@@ -30,12 +30,22 @@ class Settings(BaseSettings):
             return [k.strip() for k in v.split(",") if k.strip()]
         return v or []
 
+    # 🟢 Tavily Key 池：每个 Key 的月度额度 (credit，0 表示不限)、并发上限与限流冷却
+    TAVILY_KEY_STATE_PATH: str = "./data/tavily_keys.json"
+    TAVILY_MONTHLY_QUOTA: int = 1000
+    TAVILY_PER_KEY_CONCURRENCY: int = 4
+    TAVILY_KEY_COOLDOWN_SEC: int = 60
+    # 401/403 被拒的 Key 停用多久后再试探一次 (秒)
+    TAVILY_KEY_REVOKED_RETRY_SEC: int = 6 * 3600
+
     # 深度研究建议设为 5-10，因为我们有 OCR 了，能处理更多资料
     MAX_SEARCH_RESULTS: int = 6 
 
     # --- 模型配置 ---
     DEEPSEEK_API_KEY: str | None = None
     GLOBAL_TIMEOUT_SEC: int = 1200
+    # 🟢 软截止安全余量：按 GLOBAL_TIMEOUT_SEC * (1 - 余量) 规划各阶段，确保硬超时前已发布报告
+    DEADLINE_SAFETY_MARGIN: float = 0.1
 
     # 🟢 简化为两类模型配置
     # 用于推理任务 (Planner, Critic, MAD Debate)
@@ -46,6 +56,24 @@ class Settings(BaseSettings):
     # --- 高级配置 ---
     MAX_RECURSION_LIMIT: int = 25
 
+    # 🟢 共享 HTTP 连接池：高频主机使用独立连接池及其容量
+    HTTP_HOST_POOL_SIZES: Dict[str, int] = {
+        "api.tavily.com": 20,
+        "api.github.com": 10,
+        "export.arxiv.org": 4,
+        "arxiv.org": 8,
+    }
+    HTTP_KEEPALIVE_EXPIRY_SEC: float = 30.0
+
+    # 🟢 进程级 LLM 并发上限 (所有研究流共享，按优先级 + 任务公平排队)
+    LLM_MAX_CONCURRENCY: int = 8
+
+    # 🟢 单个研究任务的资源预算 (0 表示不限制)
+    TASK_BUDGET_LLM_TOKENS: int = 3_000_000
+    TASK_BUDGET_SEARCH_CALLS: int = 150
+    TASK_BUDGET_CRAWL_PAGES: int = 120
+    TASK_BUDGET_OCR_SECONDS: int = 900
+
     # 🟢 垂直搜索配置
     GITHUB_TOKEN: str | None = None # 强烈建议配置，否则每小时只能调 60 次
     
@@ -53,12 +81,115 @@ class Settings(BaseSettings):
     ENABLE_GITHUB: bool = True
     ENABLE_WIKI: bool = True
     
+    # 各平台的并发请求上限 (所有研究流共享)
+    PROVIDER_MAX_CONCURRENCY: Dict[str, int] = {
+        "arxiv": 2,
+        "github": 4,
+        "wiki": 6,
+    }
+
+    # 各平台的软/硬截止时间 (秒)：软截止后不再等待该平台 (请求继续在后台完成并写入缓存)，
+    # 硬截止后取消请求
+    PROVIDER_SOFT_DEADLINE_SEC: Dict[str, float] = {
+        "arxiv": 8.0,
+        "github": 6.0,
+        "wiki": 5.0,
+        "web": 10.0,
+    }
+    PROVIDER_HARD_DEADLINE_SEC: Dict[str, float] = {
+        "arxiv": 30.0,
+        "github": 15.0,
+        "wiki": 10.0,
+        "web": 20.0,
+    }
+
+    # arXiv 请求最小间隔 (秒，跨任务协调)：API 要求 >= 3 秒；全文 HTML/PDF 下载单独排队
+    ARXIV_API_INTERVAL_SEC: float = 3.0
+    ARXIV_FETCH_INTERVAL_SEC: float = 1.0
+
     # 混合搜索权重
     Result_Count_Arxiv: int = 3
     Result_Count_Github: int = 3
     Result_Count_Wiki: int = 2
     Result_Count_Web: int = 3
 
+    # 🟢 搜索结果选择器："bm25" 为本地重排序 (默认，无 LLM 调用)，"llm" 为模型挑选
+    SEARCH_SELECTOR: str = "bm25"
+    # 本地重排序：各平台先验权重与多样性惩罚系数
+    RERANK_SOURCE_PRIORS: Dict[str, float] = {
+        "arxiv": 1.1,
+        "github": 1.0,
+        "wiki": 0.85,
+        "web": 1.0,
+    }
+    RERANK_DIVERSITY: float = 0.3
+
+    # 🟢 搜索结果缓存 (跨任务共享，含 LLM 查询重写结果)
+    SEARCH_CACHE_ENABLED: bool = True
+    SEARCH_CACHE_PATH: str = "./data/search_cache.db"
+    # 各平台新鲜期 (秒)：论文/百科变化慢，网页与 GitHub 变化快
+    SEARCH_CACHE_TTL_SEC: Dict[str, int] = {
+        "arxiv": 7 * 86400,
+        "github": 86400,
+        "wiki": 7 * 86400,
+        "web": 6 * 3600,
+        "rewrite": 30 * 86400,
+    }
+    # 过期后仍可先返回旧结果、后台刷新的窗口 (stale-while-revalidate)
+    SEARCH_CACHE_STALE_SEC: int = 3 * 86400
+
+    # 🟢 静态快速通道：先直接 GET 并提取正文，正文少于阈值 (字符) 或页面依赖 JS 时才用浏览器渲染
+    STATIC_FETCH_ENABLED: bool = True
+    STATIC_MIN_TEXT_CHARS: int = 1500
+
+    # 🟢 PDF 下载：流式写入，超过内存阈值 (MB) 后落盘到临时文件，超过上限 (MB) 时放弃
+    PDF_MAX_DOWNLOAD_MB: int = 150
+    PDF_SPOOL_MEMORY_MB: int = 8
+
+    # 🟢 大型 PDF 文字层并行提取：页数达到阈值时按页段分给多个进程；
+    # 开启相关页筛选后，大文档只保留开头几页、目录标题命中的章节与命中任务关键词的页面
+    PDF_TEXT_WORKERS: int = min(4, os.cpu_count() or 1)
+    PDF_PARALLEL_MIN_PAGES: int = 150
+    PDF_RELEVANT_PAGES_ONLY: bool = False
+
+    # 🟢 OCR 进程池：工作进程数 (每个进程常驻一份 PaddleOCR 模型，0 表示进程内串行)、
+    # 每次提交给工作进程的页数、识别阶段的批大小
+    OCR_WORKERS: int = 2
+    OCR_BATCH_PAGES: int = 4
+    OCR_REC_BATCH_NUM: int = 16
+    # 单个 PDF 最多 OCR 的页数 (0 表示不限，所有扫描页都识别)；超出后只识别命中财务等关键词的页面
+    OCR_MAX_PAGES: int = 0
+    # 扫描页分诊：跳过空白页/纯图片页，按估计字号选择渲染倍数 (大写字母/汉字渲染高度约为该像素数)，只识别文本区域
+    OCR_TRIAGE_ENABLED: bool = True
+    OCR_TARGET_GLYPH_PX: int = 14
+    # OCR 结果缓存：按 文档哈希 + 页码 (及渲染图像哈希) 持久化识别出的文本行与置信度
+    OCR_CACHE_ENABLED: bool = True
+    OCR_CACHE_PATH: str = "./data/ocr_cache.db"
+
+    # 🟢 常驻浏览器池 (crawl4ai)：浏览器数、每个浏览器的并发页面数，
+    # 累计服务页数或内存 (MB，需 psutil) 超限后回收重建；0 表示不按该条件回收
+    BROWSER_POOL_SIZE: int = 2
+    BROWSER_PAGES_PER_BROWSER: int = 4
+    BROWSER_RECYCLE_AFTER_PAGES: int = 100
+    BROWSER_MAX_RSS_MB: int = 1500
+
+    # 🟢 跨任务抓取账本：规范 URL -> 内容哈希 -> 抓取时间，正文按内容哈希存储
+    FETCH_LEDGER_PATH: str = "./data/fetch_ledger.db"
+    CONTENT_STORE_DIR: str = "./data/content"
+    # 账本记录的新鲜期 (秒)，期内的资源不再重新抓取；0 表示永久有效
+    FETCH_LEDGER_TTL_SEC: int = 7 * 86400
+    # 🟢 按来源类型的新鲜期 (秒)，未列出的来源使用 FETCH_LEDGER_TTL_SEC；
+    #    过期后带 ETag / Last-Modified 发起条件请求，未变化时只需一次 304
+    FETCH_FRESHNESS_SEC: Dict[str, int] = {
+        "web_page": 86400,
+        "text_document": 86400,
+        "json_document": 3600,
+        "github_readme": 86400,
+        "pdf_document": 30 * 86400,
+        "docx_document": 30 * 86400,
+        "arxiv_html": 30 * 86400,
+    }
+
     class Config:
         env_file = ".env"
         extra = "ignore"
@@ -67,5 +198,9 @@ settings = Settings()
 
 os.makedirs(os.path.dirname(settings.CHECKPOINT_DB_PATH), exist_ok=True)
 os.makedirs(settings.TASK_STORAGE_DIR, exist_ok=True)
+os.makedirs(os.path.dirname(settings.SEARCH_CACHE_PATH), exist_ok=True)
+os.makedirs(os.path.dirname(settings.TAVILY_KEY_STATE_PATH), exist_ok=True)
+os.makedirs(os.path.dirname(settings.FETCH_LEDGER_PATH), exist_ok=True)
+os.makedirs(os.path.dirname(settings.OCR_CACHE_PATH), exist_ok=True)
 if settings.SAVE_REPORT_TO_FILE:
     os.makedirs(settings.REPORT_OUTPUT_DIR, exist_ok=True)
\ No newline at end of file
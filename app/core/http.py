@@ -0,0 +1,145 @@
+# app/core/http.py
+"""
+应用级共享 HTTP 客户端 (连接池)
+
+此前 Tavily 搜索与 PDF 下载每次调用都新建 httpx.AsyncClient，
+每个请求都要重新做 DNS + TCP + TLS 握手。这里按用途 (profile) 维护长连接池：
+
+    - 启用 HTTP/2 (安装了 h2 时)，同一主机的并发请求复用一条连接
+    - 每种用途独立的 connect/read 超时
+    - 高频主机 (HTTP_HOST_POOL_SIZES) 使用独立且按需定容的连接池
+    - 由 FastAPI lifespan 统一关闭；stats() 暴露连接复用情况，便于压测时核对
+"""
+import weakref
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+import httpx
+
+from app.core.config import settings
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+    print("⚠️ h2 not installed. HTTP/2 disabled, falling back to HTTP/1.1 keep-alive.")
+
+DEFAULT_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (compatible; ApexBridge-DeepResearch/1.0)",
+}
+
+# 各用途的超时与连接池配置
+HTTP_PROFILES: Dict[str, dict] = {
+    # 搜索 / 平台 API：响应小，快速失败
+    "api": {
+        "timeout": httpx.Timeout(15.0, connect=5.0),
+        "max_connections": 50,
+        "max_keepalive": 20,
+    },
+    # 大文件下载 (PDF 等)：读超时放宽
+    "download": {
+        "timeout": httpx.Timeout(60.0, connect=10.0),
+        "max_connections": 20,
+        "max_keepalive": 10,
+    },
+    # 普通网页抓取
+    "page": {
+        "timeout": httpx.Timeout(20.0, connect=5.0),
+        "max_connections": 40,
+        "max_keepalive": 20,
+    },
+}
+
+
+class _ClientStats:
+    """通过 response hook 统计请求数与连接复用次数"""
+
+    def __init__(self):
+        self.requests = 0
+        self.reused = 0
+        self.http2 = 0
+        # 见过的连接 (底层网络流)：弱引用，连接关闭释放后自动移出；
+        # 不用 id()，避免释放后地址被新连接复用而误计为"复用"
+        self._streams: "weakref.WeakSet" = weakref.WeakSet()
+
+    @property
+    def open_connections(self) -> int:
+        """仍存活的连接数 (连接池关闭或回收连接后随之减少)"""
+        return len(self._streams)
+
+    async def on_response(self, response: httpx.Response):
+        self.requests += 1
+        if response.http_version == "HTTP/2":
+            self.http2 += 1
+        stream = response.extensions.get("network_stream")
+        if stream is not None:
+            if stream in self._streams:
+                self.reused += 1
+            else:
+                self._streams.add(stream)
+
+
+class HttpClientRegistry:
+    def __init__(self):
+        self._clients: Dict[Tuple[str, Optional[str]], httpx.AsyncClient] = {}
+        self._stats: Dict[Tuple[str, Optional[str]], _ClientStats] = {}
+
+    def get(self, profile: str = "api", url: str = None) -> httpx.AsyncClient:
+        """
+        获取共享客户端 (懒加载)
+
+        Args:
+            profile: 用途，见 HTTP_PROFILES
+            url: 目标地址；其主机配置在 HTTP_HOST_POOL_SIZES 中时使用该主机的专属连接池
+        """
+        host = urlsplit(url).hostname if url else None
+        if host not in settings.HTTP_HOST_POOL_SIZES:
+            host = None
+        key = (profile, host)
+
+        client = self._clients.get(key)
+        if client is None or client.is_closed:
+            client = self._build(profile, host)
+            self._clients[key] = client
+        return client
+
+    def _build(self, profile: str, host: Optional[str]) -> httpx.AsyncClient:
+        conf = HTTP_PROFILES[profile]
+        max_connections = settings.HTTP_HOST_POOL_SIZES[host] if host else conf["max_connections"]
+        stats = self._stats.setdefault((profile, host), _ClientStats())
+        return httpx.AsyncClient(
+            http2=HTTP2_AVAILABLE,
+            timeout=conf["timeout"],
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=min(conf["max_keepalive"], max_connections),
+                keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY_SEC,
+            ),
+            headers=DEFAULT_HEADERS,
+            follow_redirects=True,
+            event_hooks={"response": [stats.on_response]},
+        )
+
+    async def aclose(self):
+        """关闭所有连接池 (FastAPI lifespan 退出时调用)"""
+        for client in self._clients.values():
+            await client.aclose()
+        self._clients.clear()
+
+    def stats(self) -> dict:
+        result = {}
+        for profile, host in self._clients:
+            s = self._stats[(profile, host)]
+            result[f"{profile}:{host or '*'}"] = {
+                "requests": s.requests,
+                "reused_connections": s.reused,
+                "reuse_ratio": round(s.reused / s.requests, 3) if s.requests else 0.0,
+                "http2_responses": s.http2,
+                "open_connections": s.open_connections,
+            }
+        return {"http2_available": HTTP2_AVAILABLE, "clients": result}
+
+
+# 进程级单例
+http_clients = HttpClientRegistry()
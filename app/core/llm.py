@@ -1,35 +1,63 @@
-from litellm import completion
+from litellm import acompletion
 import os
 from dotenv import load_dotenv
 
+from app.core.cancellation import run_cancellable
+from app.core.budget import get_budget
+from app.core.llm_scheduler import llm_scheduler
+
 # 加载 .env 环境变量
 load_dotenv()
 
 async def simple_llm_call(
     prompt: str, 
     model: str = "deepseek/deepseek-chat", # 默认改为 DeepSeek V3
-    temperature: float = 0.7
+    temperature: float = 0.7,
+    task_id: str = None,
+    priority: str = "interactive"
 ) -> str:
     """
     通用 LLM 调用接口，支持 DeepSeek, OpenAI, Claude, Ollama 等
+
+    Args:
+        task_id: 所属研究任务。任务被取消时，进行中的请求会被立即中断
+                 (抛出 TaskCancelledError，不会被下面的异常兜底吞掉)；
+                 同时按 usage.total_tokens 扣减该任务的 token 预算
+        priority: 调度优先级。critical (Planner/Critic 关键路径) > interactive > batch (批量抽取/核查)，
+                  同一优先级内按 task_id 公平分配全局并发槽位
     """
     
     # 打印当前使用的模型，方便调试
     print(f"🤖 [LLM Call] Model: {model}")
 
+    # 🟢 任务 token 预算耗尽：与调用失败走同一条降级路径
+    budget = get_budget(task_id)
+    if budget and budget.exhausted("llm_tokens"):
+        return f"Error generation response with {model}. Details: LLM token budget exhausted"
+
     try:
         # LiteLLM 会自动根据 model 前缀识别供应商
         # deepseek/deepseek-chat -> 自动映射到 DeepSeek API
         # ollama/deepseek-r1 -> 自动映射到本地 Ollama
         
-        response = completion(
-            model=model,
-            messages=[{"role": "user", "content": prompt}],
-            temperature=temperature,
-            # 如果是 DeepSeek API，不需要手动设 base_url，LiteLLM 内置了支持
-            # 如果是 Ollama，LiteLLM 默认连接 http://localhost:11434
-        )
+        # 🟢 使用异步接口：既不阻塞事件循环，取消时也能真正断开 HTTP 请求
+        # 排队等待全局槽位的过程同样可被取消
+        async def scheduled_completion():
+            async with llm_scheduler.slot(task_id, priority, cost=max(1.0, len(prompt) / 4000)):
+                return await acompletion(
+                    model=model,
+                    messages=[{"role": "user", "content": prompt}],
+                    temperature=temperature,
+                    # 如果是 DeepSeek API，不需要手动设 base_url，LiteLLM 内置了支持
+                    # 如果是 Ollama，LiteLLM 默认连接 http://localhost:11434
+                )
+
+        response = await run_cancellable(scheduled_completion(), task_id)
         
+        if budget:
+            usage = getattr(response, "usage", None)
+            budget.consume("llm_tokens", getattr(usage, "total_tokens", 0) or len(prompt) // 4)
+
         return response.choices[0].message.content
         
     except Exception as e:
@@ -45,4 +73,4 @@ async def simple_llm_call(
 #    model="ollama/deepseek-r1"
 #
 # 3. OpenAI:
-#    model="gpt-4o"
\ No newline at end of file
+#    model="gpt-4o"
@@ -0,0 +1,110 @@
+# app/core/llm_scheduler.py
+"""
+进程级 LLM 公平调度器 (Fair-share LLM Scheduler)
+
+所有研究流共享同一份模型供应商配额。如果各自独立调用 simple_llm_call，
+某个任务的核查扇出 (每任务 5 并发) 会占满配额，而另一个任务的 Planner 只能排队。
+
+调度策略：
+    1. 优先级类别之间严格优先：critical (Planner / Critic 等关键路径) > interactive > batch (批量抽取/核查)
+    2. 同一类别内部按 task_id 做加权公平排队 (WFQ)：
+       每个请求的虚拟完成时间 = max(类别虚拟时钟, 该任务上一个请求的完成时间) + 成本 / 任务权重
+       虚拟完成时间最小者先获得并发槽位，因此扇出再多的任务也只能拿到自己的份额
+"""
+import asyncio
+import itertools
+import heapq
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional, Tuple
+
+from app.core.config import settings
+
+PRIORITY_CLASSES = ("critical", "interactive", "batch")
+
+
+class FairShareScheduler:
+    def __init__(self, max_concurrency: int):
+        self.max_concurrency = max_concurrency
+        self._active = 0
+        # (类别序号, 虚拟完成时间, 序列号, 虚拟开始时间, future)
+        self._queue: List[Tuple[int, float, int, float, asyncio.Future]] = []
+        self._seq = itertools.count()
+        self._virtual_clock: Dict[int, float] = {i: 0.0 for i in range(len(PRIORITY_CLASSES))}
+        self._last_finish: Dict[Tuple[int, str], float] = {}
+        self._weights: Dict[str, float] = {}
+        self._dispatched: Dict[str, int] = {p: 0 for p in PRIORITY_CLASSES}
+
+    def set_weight(self, task_id: str, weight: float):
+        """调整任务的公平份额 (默认 1.0，权重越大获得的槽位越多)"""
+        self._weights[task_id] = max(weight, 0.01)
+
+    def forget(self, task_id: str):
+        """任务结束后清理其调度状态"""
+        self._weights.pop(task_id, None)
+        for key in [k for k in self._last_finish if k[1] == task_id]:
+            del self._last_finish[key]
+
+    async def acquire(self, task_id: Optional[str], priority: str = "interactive", cost: float = 1.0):
+        rank = PRIORITY_CLASSES.index(priority) if priority in PRIORITY_CLASSES else 1
+        flow = task_id or "__anonymous__"
+
+        # 计算该请求在所属类别中的虚拟完成时间
+        start = max(self._virtual_clock[rank], self._last_finish.get((rank, flow), 0.0))
+        finish = start + cost / self._weights.get(flow, 1.0)
+        self._last_finish[(rank, flow)] = finish
+
+        if self._active < self.max_concurrency and not self._queue:
+            self._grant(rank, start, priority)
+            return
+
+        fut = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._queue, (rank, finish, next(self._seq), start, fut))
+        self._dispatch()
+        try:
+            await fut
+        except asyncio.CancelledError:
+            # 已分配到槽位但调用方同时被取消：归还槽位
+            if fut.done() and not fut.cancelled():
+                self.release()
+            raise
+
+    def release(self):
+        self._active -= 1
+        self._dispatch()
+
+    def _grant(self, rank: int, start: float, priority: str):
+        self._active += 1
+        self._virtual_clock[rank] = max(self._virtual_clock[rank], start)
+        self._dispatched[priority] += 1
+
+    def _dispatch(self):
+        while self._queue and self._active < self.max_concurrency:
+            rank, _, _, start, fut = heapq.heappop(self._queue)
+            if fut.done():  # 排队期间已被取消
+                continue
+            self._grant(rank, start, PRIORITY_CLASSES[rank])
+            fut.set_result(None)
+
+    @asynccontextmanager
+    async def slot(self, task_id: Optional[str], priority: str = "interactive", cost: float = 1.0):
+        await self.acquire(task_id, priority, cost)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def snapshot(self) -> dict:
+        waiting = {p: 0 for p in PRIORITY_CLASSES}
+        for rank, _, _, _, fut in self._queue:
+            if not fut.done():
+                waiting[PRIORITY_CLASSES[rank]] += 1
+        return {
+            "active": self._active,
+            "max_concurrency": self.max_concurrency,
+            "waiting": waiting,
+            "dispatched": dict(self._dispatched),
+        }
+
+
+# 进程级单例
+llm_scheduler = FairShareScheduler(settings.LLM_MAX_CONCURRENCY)
@@ -18,7 +18,7 @@ class MADFramework:
     """
     
     @staticmethod
-    async def conduct_debate(topic: str, context: str) -> DebateResult:
+    async def conduct_debate(topic: str, context: str, task_id: str = None) -> DebateResult:
         """
         执行一轮标准的辩论：正方 vs 反方 -> 法官裁决
         """
@@ -28,12 +28,16 @@ class MADFramework:
         # 使用 Reasoning 模型以保证逻辑性
         task_affirmative = simple_llm_call(
             ResearchPrompts.debate_argument(topic, "正方 (支持/肯定)", context),
-            model=settings.MODEL_REASONING
+            model=settings.MODEL_REASONING,
+            task_id=task_id,
+            priority="batch"
         )
 
         task_negative = simple_llm_call(
             ResearchPrompts.debate_argument(topic, "反方 (反对/怀疑)", context),
-            model=settings.MODEL_REASONING
+            model=settings.MODEL_REASONING,
+            task_id=task_id,
+            priority="batch"
         )
         
         # 并发执行
@@ -44,7 +48,7 @@ class MADFramework:
         
         # 2. 法官裁决 (Judge)
         judge_prompt = ResearchPrompts.debate_judgment(topic, arg_aff, arg_neg)
-        judge_response = await simple_llm_call(judge_prompt, model=settings.MODEL_REASONING)
+        judge_response = await simple_llm_call(judge_prompt, model=settings.MODEL_REASONING, task_id=task_id, priority="batch")
 
         result = parse_json_safe(judge_response)
         if result:
@@ -496,5 +496,34 @@ class ResearchPrompts:
         """).strip()
 
 
+    @staticmethod
+    def search_query_batch_optimization(task_descriptions: List[str]) -> str:
+        """[搜索者] 批量将多个研究任务转换为各平台的专用搜索词 (一次调用)"""
+        task_list = "\n".join(f"[{i}] {desc}" for i, desc in enumerate(task_descriptions))
+        return dedent(f"""
+            你是一个搜索专家。下面是一批研究任务，请为**每个任务**分别生成不同搜索平台的**最优化搜索关键词**。
+
+            【任务列表】：
+            {task_list}
+
+            【转换规则】：
+            1. **ArXiv** (学术论文): 必须翻译成**英文**，使用学术术语。去掉"2024"等时间限制（论文库可能搜不到最新的），只搜核心概念。
+            2. **GitHub** (开源代码): 必须翻译成**英文**，关注框架、工具、Dataset、Awesome列表。
+            3. **Wikipedia** (百科全书): 提取核心**实体名词**（Entity），尽量短，不要句子。
+            4. **Web** (通用搜索): 可以保留中文，或者是经过优化的组合关键词（如 "Market size filetype:pdf"）。
+
+            【输出格式】：
+            严格返回 JSON 列表，每个任务一个对象，id 与任务编号一致，不要遗漏任何任务：
+            [
+                {{
+                    "id": 0,
+                    "arxiv": "Mobile AI Agent optimization",
+                    "github": "mobile-agent-framework",
+                    "wiki": "Intelligent agent",
+                    "web": "2024 全球移动端AI Agent 市场规模 报告 filetype:pdf"
+                }}
+            ]
+        """).strip()
+
 # 实例化（如果需要单例，或者直接用静态方法）
 prompts = ResearchPrompts()
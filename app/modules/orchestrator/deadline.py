@@ -0,0 +1,139 @@
+# app/modules/orchestrator/deadline.py
+"""
+截止时间感知的降级调度 (Deadline-aware Degradation)
+
+GLOBAL_TIMEOUT_SEC 原本是"全有或全无"：超时即报错、没有任何报告。
+DeadlinePlanner 把总时长按阶段切分 (clarify -> plan -> search -> analyse -> critique -> publish)，
+持续监控已用时间；当剩余时间不足以按原计划完成后续阶段时，逐级降级：
+
+    L1 FEWER_SOURCES : 每个任务少选几个来源
+    L2 NO_OCR        : 不再对扫描件做 OCR
+    L3 NO_MAD        : 争议断言不再升级到多智能体辩论
+    L4 NO_CRITIC     : 跳过 Critic 迭代，直接发布
+
+每个阶段只能使用自己的份额加上前序阶段节省下来的时间，后续阶段的预留时间不会被侵占；
+某阶段时间耗尽时 (should_wrap_up) 立即收尾，因此始终能在截止前产出报告。
+"""
+import time
+from enum import IntEnum
+from typing import Dict, Optional
+
+from app.core.config import settings
+
+
+class DegradeLevel(IntEnum):
+    NORMAL = 0
+    FEWER_SOURCES = 1
+    NO_OCR = 2
+    NO_MAD = 3
+    NO_CRITIC = 4
+
+
+# 各阶段占总时长的比例 (search 与 analyse 是大头；publish 预留足够时间保证出报告)
+PHASE_WEIGHTS: Dict[str, float] = {
+    "clarify": 0.03,
+    "plan": 0.07,
+    "search": 0.40,
+    "analyse": 0.30,
+    "critique": 0.08,
+    "publish": 0.12,
+}
+PHASE_ORDER = list(PHASE_WEIGHTS.keys())
+
+# 当前阶段可用时间 / 计划时间 低于阈值时进入对应级别
+_LEVEL_THRESHOLDS = [
+    (0.5, DegradeLevel.NORMAL),
+    (0.3, DegradeLevel.FEWER_SOURCES),
+    (0.15, DegradeLevel.NO_OCR),
+    (0.05, DegradeLevel.NO_MAD),
+]
+
+
+class DeadlinePlanner:
+    """单个研究任务的时间预算"""
+
+    def __init__(self, task_id: str, total_sec: float, safety_margin: float = None):
+        margin = settings.DEADLINE_SAFETY_MARGIN if safety_margin is None else safety_margin
+        self.task_id = task_id
+        self.total_sec = total_sec
+        # 留出安全余量，保证软截止先于 GLOBAL_TIMEOUT_SEC 的硬超时
+        self.budget_sec = total_sec * (1 - margin)
+        self.started_at = time.monotonic()
+        self.level = DegradeLevel.NORMAL
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started_at
+
+    def remaining(self) -> float:
+        return max(0.0, self.budget_sec - self.elapsed())
+
+    def allotment(self, phase: str) -> float:
+        """阶段的计划时长 (秒)"""
+        return self.budget_sec * PHASE_WEIGHTS[phase]
+
+    def reserve_after(self, phase: str) -> float:
+        """为该阶段之后所有阶段预留的时间"""
+        later = PHASE_ORDER[PHASE_ORDER.index(phase) + 1:]
+        return sum(self.allotment(p) for p in later)
+
+    def headroom(self, phase: str) -> float:
+        """当前阶段 (含循环中的重复执行) 还能使用的时间"""
+        return self.remaining() - self.reserve_after(phase)
+
+    def should_wrap_up(self, phase: str) -> bool:
+        """该阶段已无可用时间，应立即收尾，把时间留给后续阶段"""
+        return self.headroom(phase) <= 0
+
+    def evaluate(self, phase: str) -> DegradeLevel:
+        """根据当前阶段的剩余时间计算降级级别"""
+        ratio = self.headroom(phase) / max(self.allotment(phase), 1e-6)
+        level = DegradeLevel.NO_CRITIC
+        for threshold, candidate in _LEVEL_THRESHOLDS:
+            if ratio >= threshold:
+                level = candidate
+                break
+
+        if level != self.level:
+            print(f"⏳ [Deadline] {phase}: {self.remaining():.0f}s left, "
+                  f"level {self.level.name} -> {level.name}")
+            self.level = level
+        return level
+
+    def snapshot(self) -> dict:
+        return {
+            "elapsed_sec": round(self.elapsed(), 1),
+            "remaining_sec": round(self.remaining(), 1),
+            "level": self.level.name,
+        }
+
+
+# --- 任务级注册表 (task_id -> planner) ---
+_planners: Dict[str, DeadlinePlanner] = {}
+
+
+def create_planner(task_id: str, total_sec: float) -> DeadlinePlanner:
+    planner = DeadlinePlanner(task_id, total_sec)
+    _planners[task_id] = planner
+    return planner
+
+
+def get_planner(task_id: Optional[str]) -> Optional[DeadlinePlanner]:
+    if not task_id:
+        return None
+    return _planners.get(task_id)
+
+
+def release_planner(task_id: str, planner: Optional[DeadlinePlanner] = None):
+    if planner is None or _planners.get(task_id) is planner:
+        _planners.pop(task_id, None)
+
+
+def degrade_level(task_id: Optional[str], phase: str) -> DegradeLevel:
+    """便捷函数：没有注册 planner 时 (如离线调用) 视为不降级"""
+    planner = get_planner(task_id)
+    return planner.evaluate(phase) if planner else DegradeLevel.NORMAL
+
+
+def should_wrap_up(task_id: Optional[str], phase: str) -> bool:
+    planner = get_planner(task_id)
+    return planner.should_wrap_up(phase) if planner else False
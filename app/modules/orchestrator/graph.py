@@ -7,8 +7,11 @@ from app.core.config import settings
 from app.core.utils import parse_json_safe
 from app.modules.orchestrator.state import ResearchState
 from app.modules.orchestrator.dag import DAGManager, TaskStatus
-from app.modules.perception.search import search_generic as search_tool
+from app.modules.orchestrator.deadline import DegradeLevel, degrade_level, should_wrap_up
+from app.core.budget import get_budget
+from app.modules.perception.search import search_generic_batch
 from app.modules.perception.crawler import crawl_urls
+from app.modules.perception.reranker import select_urls
 from app.core.llm import simple_llm_call
 # 引入新的文件存储
 from app.modules.knowledge.file_store import FileKnowledgeStore
@@ -39,6 +42,43 @@ def _match_sections(section_title: str, label: str) -> bool:
     """模糊匹配章节标题"""
     return _normalize_title(section_title) == _normalize_title(label)
 
+# 🟢 各阶段依赖的预算资源：任一耗尽即视为该阶段应收尾
+_PHASE_RESOURCES = {
+    "search": ("search_calls", "crawl_pages", "llm_tokens"),
+    "analyse": ("llm_tokens",),
+    "publish": ("llm_tokens",),
+}
+
+def _should_wrap_up(state: ResearchState, phase: str) -> bool:
+    """截止时间已到或该阶段依赖的资源预算耗尽时，当前阶段应立即收尾"""
+    if should_wrap_up(state["task_id"], phase):
+        return True
+    budget = get_budget(state["task_id"])
+    return bool(budget) and any(budget.exhausted(k) for k in _PHASE_RESOURCES.get(phase, ()))
+
+def _degrade_level(state: ResearchState, phase: str) -> DegradeLevel:
+    """综合截止时间与资源预算余量的降级级别"""
+    level = degrade_level(state["task_id"], phase)
+    budget = get_budget(state["task_id"])
+    if not budget:
+        return level
+    if min(budget.fraction_left("search_calls"), budget.fraction_left("crawl_pages")) < 0.2:
+        level = max(level, DegradeLevel.FEWER_SOURCES)
+    if budget.exhausted("ocr_seconds"):
+        level = max(level, DegradeLevel.NO_OCR)
+    llm_left = budget.fraction_left("llm_tokens")
+    if llm_left < 0.1:
+        level = max(level, DegradeLevel.NO_CRITIC)
+    elif llm_left < 0.2:
+        level = max(level, DegradeLevel.NO_MAD)
+    return level
+
+def _merge_sections_locally(topic: str, outline: list, section_drafts: dict) -> str:
+    """LLM 预算耗尽时的兜底合并：按大纲顺序直接拼接章节草稿"""
+    ordered = [t for t in outline if t in section_drafts] + [t for t in section_drafts if t not in outline]
+    sections = "\n\n".join(f"## {title}\n\n{section_drafts[title]}" for title in ordered)
+    return f"# {topic}\n\n{sections}"
+
 def log_step(step_name: str, content: dict):
     print(f"\n🚀 [Step: {step_name}]")
     try:
@@ -57,7 +97,7 @@ async def node_clarifier(state: ResearchState):
     print("--- [Clarifier] Checking Ambiguity ---")
     if state.get("clarified_intent"): return {}
     prompt = prompts.clarification_check(state["task"])
-    response = await simple_llm_call(prompt, model=settings.MODEL_REASONING)
+    response = await simple_llm_call(prompt, model=settings.MODEL_REASONING, task_id=state["task_id"], priority="critical")
     result = parse_json_safe(response)
     
     if result and not result.get("is_clear", True):
@@ -79,13 +119,16 @@ async def node_planner(state: ResearchState):
     current_outline = state.get("outline", [])
     if not current_outline:
         print("📝 [Planner] Generating Research Outline...")
-        outline_resp = await simple_llm_call(prompts.outline_generation(state["task"], intent), model=model_to_use)
+        outline_resp = await simple_llm_call(prompts.outline_generation(state["task"], intent), model=model_to_use, task_id=state["task_id"], priority="critical")
         current_outline = parse_json_safe(outline_resp) or []
         print(f"📑 Outline: {current_outline}")
     
+    # 🟢 截止时间：搜索阶段已无剩余时间时，不再重规划和派发新任务，直接进入写作
+    wrap_up = _should_wrap_up(state, "search")
+
     # 2. 任务生成
     has_feedback = False
-    if state["reflection_logs"]:
+    if state["reflection_logs"] and not wrap_up:
         last_log = state["reflection_logs"][-1]
         if last_log.get("score", 0) < 8.0:
             print(f"🔄 [Planner] Replanning based on critique...")
@@ -103,7 +146,9 @@ async def node_planner(state: ResearchState):
                     feedback_str = f"批评: {last_log.get('critique')}\n建议: {last_log.get('adjustment')}"
                     resp = await simple_llm_call(
                         prompts.planner_section_retry(focus_section, feedback_str),
-                        model=settings.MODEL_REASONING
+                        model=settings.MODEL_REASONING,
+                        task_id=state["task_id"],
+                        priority="critical"
                     )
                     new_tasks = parse_json_safe(resp) or []
                     for t in new_tasks:
@@ -120,7 +165,7 @@ async def node_planner(state: ResearchState):
                 # 🟢 通用重规划
                 feedback_str = f"批评: {last_log.get('critique')}\n建议: {last_log.get('adjustment')}"
                 plan_str = json.dumps(dag.to_state(), ensure_ascii=False)
-                resp = await simple_llm_call(prompts.planner_dag_replanning(intent, plan_str, feedback_str), model=model_to_use)
+                resp = await simple_llm_call(prompts.planner_dag_replanning(intent, plan_str, feedback_str), model=model_to_use, task_id=state["task_id"], priority="critical")
                 new_tasks = parse_json_safe(resp) or []
                 # 防御性处理
                 if isinstance(new_tasks, list):
@@ -131,7 +176,7 @@ async def node_planner(state: ResearchState):
     if not dag.tasks and not has_feedback:
         print("📝 [Planner] Generating Tasks from Outline...")
         plan_str = json.dumps(dag.to_state(), ensure_ascii=False)
-        resp = await simple_llm_call(prompts.planner_tasks_from_outline(intent, current_outline, plan_str), model=model_to_use)
+        resp = await simple_llm_call(prompts.planner_tasks_from_outline(intent, current_outline, plan_str), model=model_to_use, task_id=state["task_id"], priority="critical")
         new_tasks = parse_json_safe(resp) or []
 
         # 防御性处理：确保 new_tasks 是字典列表
@@ -145,6 +190,11 @@ async def node_planner(state: ResearchState):
             for t in valid_tasks:
                 dag.add_task(t["id"], t["description"], dependencies=t.get("dependencies", []), related_section=t.get("related_section"))
             
+    if wrap_up:
+        for t in dag.tasks.values():
+            if t.status == TaskStatus.PENDING:
+                dag.skip_task(t.id, reason="Deadline or search budget reached")
+
     ready_tasks = dag.get_ready_tasks()
     current_queries = [t.description for t in ready_tasks]
     for t in ready_tasks: dag.set_task_running(t.id)
@@ -152,6 +202,15 @@ async def node_planner(state: ResearchState):
     log_step("Planner", {"outline": current_outline, "plan": dag.to_state()})
     return {"outline": current_outline, "plan": dag.to_state(), "search_queries": current_queries}
 
+async def _select_with_llm(state: ResearchState, description: str, raw_results: list, num_select: int) -> list:
+    """由 LLM 从搜索结果中挑选链接 (SEARCH_SELECTOR=llm 时使用)"""
+    snippets = "\n".join([f"[{i}] {r['url']}\n    {r['snippet'][:100]}..." for i, r in enumerate(raw_results)])
+    select_resp = await simple_llm_call(prompts.search_result_selection(description, snippets, num_select=num_select), model=settings.MODEL_CHAT, task_id=state["task_id"])
+    selected_urls = parse_json_safe(select_resp)
+    if not isinstance(selected_urls, list) or not selected_urls:
+        selected_urls = [r["url"] for r in raw_results]
+    return selected_urls[:num_select]
+
 async def node_search_execute(state: ResearchState):
     print("🔄 [Search Node] Entered...", flush=True)
     dag = DAGManager(state["plan"])
@@ -167,24 +226,47 @@ async def node_search_execute(state: ResearchState):
     # 🟢 初始化映射表（保留之前的映射，支持增量添加）
     file_map = state.get("file_section_map", {}).copy()
 
-    for task in running_tasks:
-        print(f"🔍 Task: {task.description}")
+    # 🟢 批量搜索：一次 LLM 调用完成本波所有任务的查询重写，所有平台请求并发执行
+    if _should_wrap_up(state, "search"):
+        batch_results = [[] for _ in running_tasks]
+    else:
         try:
-            raw_results = await search_tool(task.description)
+            batch_results = await search_generic_batch(
+                [t.description for t in running_tasks],
+                task_id=state["task_id"]
+            )
         except Exception as e:
-            dag.fail_task(task.id, str(e))
+            for task in running_tasks:
+                dag.fail_task(task.id, str(e))
+            return {"plan": dag.to_state()}
+
+    for task, raw_results in zip(running_tasks, batch_results):
+        # 🟢 截止时间感知：时间不足时跳过剩余任务，并逐级减少来源数、关闭 OCR
+        if _should_wrap_up(state, "search"):
+            dag.skip_task(task.id, reason="Deadline or search budget reached")
             continue
+        level = _degrade_level(state, "search")
+        num_select = 3 if level == DegradeLevel.NORMAL else (2 if level < DegradeLevel.NO_MAD else 1)
+
+        print(f"🔍 Task: {task.description}")
 
         if not raw_results:
             dag.complete_task(task.id, "No results found")
             continue
 
-        snippets = "\n".join([f"[{i}] {r['url']}\n    {r['snippet'][:100]}..." for i, r in enumerate(raw_results)])
-        select_resp = await simple_llm_call(prompts.search_result_selection(task.description, snippets, num_select=3), model=settings.MODEL_CHAT)
-        selected_urls = parse_json_safe(select_resp) or [r["url"] for r in raw_results[:3]]
+        # 🟢 默认使用本地重排序 (BM25 + 先验 + 多样性)，省去每个任务一次 LLM 往返
+        if settings.SEARCH_SELECTOR == "llm":
+            selected_urls = await _select_with_llm(state, task.description, raw_results, num_select)
+        else:
+            selected_urls = select_urls(task.description, raw_results, num_select)
 
         print(f"🎯 [Selector] Selected: {selected_urls}")
-        crawl_results = await crawl_urls(selected_urls)
+        crawl_results = await crawl_urls(
+            selected_urls,
+            task_id=state["task_id"],
+            allow_ocr=level < DegradeLevel.NO_OCR,
+            focus=task.description
+        )
 
         if crawl_results:
             collected_docs.extend(crawl_results)
@@ -242,6 +324,10 @@ async def node_analyst(state: ResearchState):
 
     # 🟢 核心逻辑：按章节逐个攻破
     for section_title in target_sections:
+        # 截止时间：写作阶段时间耗尽时停止阅读新资料，用已有笔记合并成稿
+        if _should_wrap_up(state, "analyse"):
+            print(f"⏳ [Analyst] Out of time/budget, skipping remaining sections from: {section_title}")
+            break
         print(f"  Writing Section: {section_title}")
 
         # 1. 筛选属于当前章节的文件 (三层优先级，使用模糊匹配)
@@ -259,6 +345,8 @@ async def node_analyst(state: ResearchState):
         # 3. 增量阅读该章节
         section_notes = ""
         for i, file_path in enumerate(relevant_files):
+            if _should_wrap_up(state, "analyse"):
+                break
             doc_content = kb.read_file(file_path)
             if not doc_content:
                 continue
@@ -269,7 +357,7 @@ async def node_analyst(state: ResearchState):
 
             # 调用 LLM 更新该章节的笔记
             prompt = prompts.analyst_section_writing(section_title, section_notes, doc_content)
-            section_notes = await simple_llm_call(prompt, model=settings.MODEL_CHAT)
+            section_notes = await simple_llm_call(prompt, model=settings.MODEL_CHAT, task_id=state["task_id"])
 
         # 4. 生成该章节的最终文本
         if section_notes:
@@ -279,14 +367,28 @@ async def node_analyst(state: ResearchState):
     print("  Merging all sections...")
     topic = state.get("clarified_intent", state["task"])
 
-    full_report = await simple_llm_call(
-        prompts.analyst_merge_sections(topic, outline, section_drafts),
-        model=settings.MODEL_CHAT
-    )
-
-    # 6. 统一的事实核查
-    print("  Running verification...")
-    verified_report = await VerificationAgent.verify_report(full_report)
+    if _should_wrap_up(state, "publish"):
+        # LLM 预算已耗尽：本地拼接，避免把错误文本当成报告
+        full_report = _merge_sections_locally(topic, outline, section_drafts)
+    else:
+        full_report = await simple_llm_call(
+            prompts.analyst_merge_sections(topic, outline, section_drafts),
+            model=settings.MODEL_CHAT,
+            task_id=state["task_id"]
+        )
+
+    # 6. 统一的事实核查 (时间紧张时跳过 MAD 辩论，时间耗尽时跳过核查)
+    if _should_wrap_up(state, "analyse"):
+        print("⏳ [Analyst] Out of time/budget, skipping verification")
+        verified_report = full_report + "\n\n---\n> ⚠️ **注意**：受时间或资源预算限制，本报告未经自动化事实核查。"
+    else:
+        print("  Running verification...")
+        level = _degrade_level(state, "analyse")
+        verified_report = await VerificationAgent.verify_report(
+            full_report,
+            task_id=state["task_id"],
+            allow_debate=level < DegradeLevel.NO_MAD
+        )
 
     return {
         "draft_report": verified_report,
@@ -302,7 +404,7 @@ async def node_critic(state: ResearchState):
     section_drafts = state.get("section_drafts", {})
 
     prompt = prompts.critic_evaluation(topic, draft, section_drafts)
-    resp = await simple_llm_call(prompt, model=settings.MODEL_REASONING)
+    resp = await simple_llm_call(prompt, model=settings.MODEL_REASONING, task_id=state["task_id"], priority="critical")
 
     default_eval = {
         "score": 5,
@@ -354,9 +456,13 @@ async def node_publisher(state: ResearchState):
 
     # Publisher 的工作是：格式化、润色、增加前言/目录
     # 我们将 draft 作为核心上下文传给 LLM
-    prompt = prompts.publisher_final_report(topic, draft)
-    
-    final_report = await simple_llm_call(prompt, model=settings.MODEL_CHAT)
+    # 🟢 截止时间已到：跳过润色，直接发布已核查的草稿，保证有报告产出
+    if _should_wrap_up(state, "publish"):
+        print("⏳ [Publisher] Out of time/budget, publishing draft without polishing")
+        final_report = draft
+    else:
+        prompt = prompts.publisher_final_report(topic, draft)
+        final_report = await simple_llm_call(prompt, model=settings.MODEL_CHAT, task_id=state["task_id"])
     
     # 保存
     saved_path = save_markdown_report(state["task"], final_report)
@@ -380,12 +486,24 @@ def route_planner(state: ResearchState) -> str:
     print("   -> Fallback to 'analyst'")
     return "analyst"
 
+def route_analyst(state: ResearchState) -> str:
+    """🟢 时间不足时跳过 Critic 评审，直接发布"""
+    if _degrade_level(state, "critique") >= DegradeLevel.NO_CRITIC:
+        print("⏳ [Router] Deadline/budget pressure -> skipping Critic, going to Publisher")
+        return "publisher"
+    return "critic"
+
 def route_critic(state: ResearchState) -> str:
     """支持章节级重试的路由 - 关键修复：避免死循环"""
     if state["iteration_count"] >= state["max_iterations"]:
         print("🛑 Max iterations reached -> Publisher")
         return "publisher"
 
+    # 🟢 截止时间临近：不再进行新一轮 Critic 迭代
+    if _degrade_level(state, "critique") >= DegradeLevel.NO_CRITIC:
+        print("⏳ [Router] Deadline/budget pressure -> Publisher")
+        return "publisher"
+
     # 防御性检查：防止 reflection_logs 为空
     if not state.get("reflection_logs"):
         print("⚠️ No reflection logs found -> Publisher")
@@ -417,7 +535,7 @@ def build_graph():
     workflow.add_edge("clarifier", "planner")
     workflow.add_conditional_edges("planner", route_planner, {"searcher": "searcher", "analyst": "analyst"})
     workflow.add_edge("searcher", "planner")
-    workflow.add_edge("analyst", "critic")
+    workflow.add_conditional_edges("analyst", route_analyst, {"critic": "critic", "publisher": "publisher"})
     workflow.add_conditional_edges("critic", route_critic, {"planner": "planner", "publisher": "publisher"})
     workflow.add_edge("publisher", END)
     return workflow
\ No newline at end of file
@@ -0,0 +1,139 @@
+# app/modules/perception/arxiv_provider.py
+"""
+arXiv 检索与全文获取 (进程级共享客户端)
+
+arXiv 要求 API 调用之间至少间隔 3 秒；各任务各自建客户端时这个间隔无法跨任务协调，
+并发研究流很容易触发限流。此外搜索结果原本直接给 PDF 链接，被选中的论文一律下载 PDF，
+扫描件还要 OCR。本模块：
+
+    - 所有请求经过协调队列 (_RateGate)：API 与全文下载各自按最小间隔排队，跨任务生效
+    - 搜索只返回摘要页链接 (arxiv.org/abs/ID) 与元数据 (作者、分类、日期、摘要)
+    - 论文被选中并进入抓取阶段后，才获取全文：优先 arXiv 由 LaTeX 生成的 HTML 版本，
+      没有 HTML 版本时再交给 PDF 解析器
+"""
+import asyncio
+import re
+import time
+import xml.etree.ElementTree as ET
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit
+
+from app.core.config import settings
+from app.core.http import http_clients
+from app.modules.perception.html_extract import html_to_markdown
+
+ARXIV_API_URL = "https://export.arxiv.org/api/query"
+ARXIV_SITE_URL = "https://arxiv.org"
+_ATOM_NS = {"atom": "http://www.w3.org/2005/Atom", "arxiv": "http://arxiv.org/schemas/atom"}
+
+# 新式编号 2301.01234(v2)，旧式编号 hep-th/9901001(v1)
+_ID_RE = re.compile(r"^(\d{4}\.\d{4,5}|[a-z\-]+(?:\.[A-Z]{2})?/\d{7})(v\d+)?$")
+# HTML 全文过短说明转换失败 (只有标题/报错页)，回退到 PDF
+_MIN_HTML_CHARS = 2000
+
+
+def parse_arxiv_url(url: str) -> Optional[str]:
+    """识别 arxiv.org 的 abs/pdf/html 链接，返回论文编号"""
+    parts = urlsplit(url)
+    if parts.hostname not in ("arxiv.org", "www.arxiv.org", "export.arxiv.org"):
+        return None
+    match = re.match(r"^/(?:abs|pdf|html)/(.+?)(?:\.pdf)?/?$", parts.path)
+    if not match or not _ID_RE.match(match.group(1)):
+        return None
+    return match.group(1)
+
+
+def _clean_text(text: Optional[str]) -> str:
+    return re.sub(r"\s+", " ", text or "").strip()
+
+
+class _RateGate:
+    """保证相邻两次请求的发起时间至少间隔 interval 秒 (FIFO 排队)"""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._lock = asyncio.Lock()
+        self._last = 0.0
+
+    async def wait(self):
+        async with self._lock:
+            delay = self._last + self.interval - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self._last = time.monotonic()
+
+
+class ArxivClient:
+    def __init__(self, api_interval: float, fetch_interval: float):
+        self._api_gate = _RateGate(api_interval)
+        self._fetch_gate = _RateGate(fetch_interval)
+        self.stats: Dict[str, int] = {"searches": 0, "html_fulltext": 0, "html_missing": 0}
+
+    def _parse_feed(self, xml_text: str) -> List[Dict]:
+        root = ET.fromstring(xml_text)
+        results = []
+        for entry in root.findall("atom:entry", _ATOM_NS):
+            abs_url = entry.findtext("atom:id", "", _ATOM_NS).replace("http://", "https://")
+            published = entry.findtext("atom:published", "", _ATOM_NS)[:10]
+            summary = _clean_text(entry.findtext("atom:summary", "", _ATOM_NS))
+            authors = [_clean_text(a.findtext("atom:name", "", _ATOM_NS)) for a in entry.findall("atom:author", _ATOM_NS)]
+            if len(authors) > 5:
+                authors = authors[:5] + ["et al."]
+            categories = [c.get("term") for c in entry.findall("atom:category", _ATOM_NS) if c.get("term")]
+            results.append({
+                # 🟢 先给摘要页链接，被选中后由 crawl_urls 获取全文 (HTML 优先，PDF 兜底)
+                "url": abs_url,
+                "title": f"[arXiv] {_clean_text(entry.findtext('atom:title', '', _ATOM_NS))}",
+                "snippet": (
+                    f"Published: {published}\n"
+                    f"Authors: {', '.join(authors)}\n"
+                    f"Categories: {', '.join(categories[:4])}\n"
+                    f"Abstract: {summary[:500]}..."
+                ),
+                "source": "arxiv"
+            })
+        return results
+
+    async def search(self, query: str, limit: int) -> List[Dict]:
+        await self._api_gate.wait()
+        client = http_clients.get("api", ARXIV_API_URL)
+        resp = await client.get(ARXIV_API_URL, params={
+            "search_query": query,
+            "max_results": limit,
+            "sortBy": "relevance",
+        })
+        resp.raise_for_status()
+        self.stats["searches"] += 1
+        return self._parse_feed(resp.text)
+
+    async def fetch_html(self, arxiv_id: str) -> Optional[str]:
+        """
+        获取 arXiv 由 LaTeX 源生成的 HTML 全文 (Markdown)；
+        论文没有 HTML 版本时返回 None，由调用方回退到 PDF
+        """
+        url = f"{ARXIV_SITE_URL}/html/{arxiv_id}"
+        await self._fetch_gate.wait()
+        client = http_clients.get("page", url)
+        resp = await client.get(url)
+        if resp.status_code == 404 or "html" not in resp.headers.get("content-type", ""):
+            self.stats["html_missing"] += 1
+            return None
+        resp.raise_for_status()
+        text = html_to_markdown(resp.text)
+        if len(text) < _MIN_HTML_CHARS:
+            self.stats["html_missing"] += 1
+            return None
+        self.stats["html_fulltext"] += 1
+        return text
+
+    @staticmethod
+    def pdf_url(arxiv_id: str) -> str:
+        return f"{ARXIV_SITE_URL}/pdf/{arxiv_id}"
+
+    async def wait_for_download(self):
+        """PDF 下载同样经过全文队列，避免多个任务同时从 arxiv.org 拉取"""
+        await self._fetch_gate.wait()
+
+
+# 进程级单例
+arxiv_client = ArxivClient(settings.ARXIV_API_INTERVAL_SEC, settings.ARXIV_FETCH_INTERVAL_SEC)
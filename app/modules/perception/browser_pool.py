@@ -0,0 +1,265 @@
+# app/modules/perception/browser_pool.py
+"""
+常驻无头浏览器池 (crawl4ai)
+
+crawl_urls 原先每次调用都 `async with AsyncWebCrawler()`，每个研究任务、每次核查抓取
+都要启动并关闭一次 Chromium (数秒)。这里在应用启动时创建固定数量的浏览器实例并常驻：
+
+    - 每个浏览器同时打开的页面数有上限，超出时排队
+    - 浏览器累计服务 BROWSER_RECYCLE_AFTER_PAGES 个页面，或浏览器进程内存超过
+      BROWSER_MAX_RSS_MB 时进入回收：不再分配新页面，现有页面结束后关闭并重建
+    - 抓取时出现浏览器崩溃/断连类错误时，立即重建该实例。crawl4ai 的 arun 会吞掉异常、
+      返回 success=False 的结果，调用方需通过 report_failure 把错误信息交给浏览器池判断
+
+于是单次抓取的额外开销只剩页面导航本身。
+
+回收粒度是整个浏览器而不是浏览器上下文 (context)：crawl4ai 在内部按抓取配置缓存并复用 context
+(自带 LRU 淘汰)，没有公开的接口单独关闭或重建某个 context；绕过它直接操作 Playwright
+对象会依赖其私有实现。整机重建的启动开销 (数秒) 每 BROWSER_RECYCLE_AFTER_PAGES 个页面
+才发生一次，且在回收中的实例排空后于后台进行，其余实例照常接收页面，不在抓取的关键路径上。
+"""
+import asyncio
+import re
+from contextlib import asynccontextmanager
+from typing import List, Optional
+
+from crawl4ai import AsyncWebCrawler
+
+from app.core.config import settings
+
+# 内存监控为可选能力
+try:
+    import psutil
+    PSUTIL_AVAILABLE = True
+except ImportError:
+    PSUTIL_AVAILABLE = False
+
+# 表示浏览器进程已不可用的错误信息
+_CRASH_RE = re.compile(r"target (page, context or browser )?(has been )?closed|browser has been closed|"
+                       r"browser.*(crashed|disconnected)|connection closed|not connected", re.IGNORECASE)
+
+# 浏览器启动失败后的重试间隔 (秒)，以及借用页面时等待浏览器就绪的上限
+_RESTART_BACKOFF_SEC = 5.0
+_READY_TIMEOUT_SEC = 60.0
+
+
+def _child_pids() -> set:
+    """当前进程的直接子进程 (不含本应用自己的 Python 工作进程，如 OCR / PDF 进程池)"""
+    if not PSUTIL_AVAILABLE:
+        return set()
+    try:
+        me = psutil.Process()
+        own_name = me.name()
+        pids = set()
+        for child in me.children(recursive=False):
+            try:
+                if child.name() != own_name:
+                    pids.add(child.pid)
+            except psutil.Error:
+                continue
+        return pids
+    except psutil.Error:
+        return set()
+
+
+class _BrowserSlot:
+    def __init__(self, index: int, max_pages: int):
+        self.index = index
+        self.crawler: Optional[AsyncWebCrawler] = None
+        self.pages = asyncio.Semaphore(max_pages)
+        self.ready = asyncio.Event()
+        self.inflight = 0
+        self.served = 0
+        self.draining = False
+        self.restarting = False
+        self.pids: set = set()
+
+    async def start(self, spawn_lock: asyncio.Lock):
+        # crawl4ai 不公开浏览器进程号，只能对比启动前后的子进程：
+        # 启动过程必须串行 (含并发的重建)，否则各实例会把彼此的进程都算作自己的
+        async with spawn_lock:
+            before = _child_pids()
+            crawler = AsyncWebCrawler(verbose=False)
+            await crawler.start()
+            self.pids = _child_pids() - before
+        self.crawler = crawler
+        self.served = 0
+        self.draining = False
+        self.ready.set()
+
+    async def close(self):
+        self.ready.clear()
+        crawler, self.crawler = self.crawler, None
+        self.pids = set()
+        if crawler is not None:
+            try:
+                await crawler.close()
+            except Exception as e:
+                print(f"⚠️ [BrowserPool] Browser #{self.index} close error: {e}")
+
+    def rss_mb(self) -> float:
+        """浏览器进程树的常驻内存 (需要 psutil)"""
+        if not PSUTIL_AVAILABLE or not self.pids:
+            return 0.0
+        total = 0
+        for pid in self.pids:
+            try:
+                proc = psutil.Process(pid)
+                total += proc.memory_info().rss
+                total += sum(c.memory_info().rss for c in proc.children(recursive=True))
+            except psutil.Error:
+                continue
+        return total / (1024 * 1024)
+
+
+class BrowserPool:
+    def __init__(self, size: int, pages_per_browser: int, recycle_after: int, max_rss_mb: float):
+        self.size = max(1, size)
+        self.pages_per_browser = max(1, pages_per_browser)
+        self.recycle_after = recycle_after
+        self.max_rss_mb = max_rss_mb
+        self._slots: List[_BrowserSlot] = []
+        self._start_lock: Optional[asyncio.Lock] = None
+        self._spawn_lock: Optional[asyncio.Lock] = None
+        self._restarts: set = set()
+        self.stats = {"pages": 0, "restarts": 0, "crash_restarts": 0}
+
+    @property
+    def started(self) -> bool:
+        return bool(self._slots)
+
+    async def start(self):
+        """启动全部浏览器 (FastAPI lifespan 启动时调用；未调用时在首次抓取时懒启动)"""
+        if self._start_lock is None:
+            self._start_lock = asyncio.Lock()
+            self._spawn_lock = asyncio.Lock()
+        async with self._start_lock:
+            if self._slots:
+                return
+            self._slots = [_BrowserSlot(i, self.pages_per_browser) for i in range(self.size)]
+            results = await asyncio.gather(*[s.start(self._spawn_lock) for s in self._slots], return_exceptions=True)
+            for slot, result in zip(self._slots, results):
+                if isinstance(result, Exception):
+                    print(f"❌ [BrowserPool] Browser #{slot.index} failed to start: {result}")
+                    self._schedule_restart(slot)
+            print(f"🌐 [BrowserPool] Started {self.size} browsers x {self.pages_per_browser} pages")
+
+    async def close(self):
+        for task in list(self._restarts):
+            task.cancel()
+        await asyncio.gather(*[s.close() for s in self._slots], return_exceptions=True)
+        self._slots = []
+
+    def _pick(self) -> _BrowserSlot:
+        ready = [s for s in self._slots if s.ready.is_set() and not s.draining]
+        candidates = ready or [s for s in self._slots if not s.restarting] or self._slots
+        return min(candidates, key=lambda s: s.inflight)
+
+    @asynccontextmanager
+    async def page(self):
+        """
+        借用一个浏览器用于单个页面抓取：
+            async with browser_pool.page() as crawler:
+                result = await crawler.arun(url=...)
+        """
+        if not self.started:
+            await self.start()
+        slot = self._pick()
+        # 选中即计入 (含排队中的请求)，并发借用时才能均匀分布到各浏览器
+        slot.inflight += 1
+        served = False
+        try:
+            async with slot.pages:
+                # 浏览器可能正在重建 (回收或崩溃后)，等待其就绪
+                while not slot.ready.is_set():
+                    await asyncio.wait_for(slot.ready.wait(), _READY_TIMEOUT_SEC)
+                served = True
+                try:
+                    yield slot.crawler
+                except Exception as e:
+                    self._check_crash(slot, str(e))
+                    raise
+        finally:
+            slot.inflight -= 1
+            if served:
+                slot.served += 1
+                self.stats["pages"] += 1
+            self._maybe_recycle(slot)
+
+    def report_failure(self, crawler: AsyncWebCrawler, message: str):
+        """
+        回报一次失败的抓取 (arun 返回 success=False 时的 error_message)；
+        属于浏览器崩溃/断连时，该实例进入回收，页面归还后重建
+        """
+        for slot in self._slots:
+            if slot.crawler is crawler:
+                self._check_crash(slot, message)
+                return
+
+    def _check_crash(self, slot: _BrowserSlot, message: str):
+        if message and _CRASH_RE.search(message) and not slot.draining:
+            self.stats["crash_restarts"] += 1
+            slot.draining = True
+            print(f"💥 [BrowserPool] Browser #{slot.index} crashed ({message[:200]}), restarting")
+
+    def _maybe_recycle(self, slot: _BrowserSlot):
+        if not slot.draining:
+            if self.recycle_after and slot.served >= self.recycle_after:
+                slot.draining = True
+                print(f"♻️ [BrowserPool] Browser #{slot.index} served {slot.served} pages, recycling")
+            elif self.max_rss_mb and slot.rss_mb() > self.max_rss_mb:
+                slot.draining = True
+                print(f"♻️ [BrowserPool] Browser #{slot.index} exceeded {self.max_rss_mb:.0f} MB, recycling")
+        # 等最后一个页面结束再重建，避免关闭仍在使用的浏览器
+        if slot.draining and slot.inflight == 0 and not slot.restarting:
+            self.stats["restarts"] += 1
+            self._schedule_restart(slot)
+
+    def _schedule_restart(self, slot: _BrowserSlot):
+        if slot.restarting:
+            return
+        slot.restarting = True
+        # 同步清除就绪标志：此后借用该实例的请求会等待重建完成
+        slot.ready.clear()
+        task = asyncio.create_task(self._restart(slot))
+        self._restarts.add(task)
+        task.add_done_callback(self._restarts.discard)
+
+    async def _restart(self, slot: _BrowserSlot):
+        try:
+            await slot.close()
+            while True:
+                try:
+                    await slot.start(self._spawn_lock)
+                    return
+                except Exception as e:
+                    print(f"❌ [BrowserPool] Browser #{slot.index} failed to start: {e}, "
+                          f"retrying in {_RESTART_BACKOFF_SEC:.0f}s")
+                    await asyncio.sleep(_RESTART_BACKOFF_SEC)
+        finally:
+            slot.restarting = False
+
+    def snapshot(self) -> dict:
+        return {
+            **self.stats,
+            "browsers": [
+                {
+                    "index": s.index,
+                    "alive": s.ready.is_set(),
+                    "inflight": s.inflight,
+                    "served": s.served,
+                    "draining": s.draining,
+                    "rss_mb": round(s.rss_mb(), 1),
+                }
+                for s in self._slots
+            ],
+        }
+
+
+# 进程级单例
+browser_pool = BrowserPool(
+    size=settings.BROWSER_POOL_SIZE,
+    pages_per_browser=settings.BROWSER_PAGES_PER_BROWSER,
+    recycle_after=settings.BROWSER_RECYCLE_AFTER_PAGES,
+    max_rss_mb=settings.BROWSER_MAX_RSS_MB,
+)
@@ -0,0 +1,302 @@
+# app/modules/perception/content_router.py
+"""
+按内容类型分派抓取结果 (Content-Type 嗅探路由)
+
+crawl_urls 原本只看 URL 是否以 .pdf 结尾：没有后缀的 PDF 链接 (如 arxiv.org/pdf/ID)
+被送进浏览器渲染，而以 .pdf 结尾的 HTML 页面先被完整下载、被 %PDF 校验拒绝，再渲染一次。
+
+这里对每个 URL 只发起一次流式请求：读取响应头与前几 KB 后判断真实类型
+(文件魔数优先于 Content-Type，Content-Type 优先于 URL 后缀)，随后把同一个响应流
+交给对应的处理器继续读取，整个资源只下载一次。
+
+处理器可扩展：register_handler(kind, handler)。本模块内置 html / text / json / docx，
+PDF 处理器由 crawler 注册 (依赖 PyMuPDF / OCR)。处理器返回 None 表示无法提取，
+其中 html (以及请求失败) 由调用方决定是否升级到无头浏览器。
+
+再验证：调用方可以带上账本中记录的 ETag / Last-Modified 发起条件请求，
+资源未变化时服务器只返回 304 (kind = "not_modified")，不读取也不解析任何响应体。
+"""
+import asyncio
+import io
+import json
+import re
+import zipfile
+import xml.etree.ElementTree as ET
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.http import http_clients
+from app.modules.perception.html_extract import extract_page
+
+# 嗅探读取的字节数 (PDF 规范允许文件头出现在前 1024 字节内)
+_SNIFF_BYTES = 4096
+# 各类型允许读取的最大响应体；超出时放弃 (静态页面过大多半不是普通文章页)
+_MAX_BYTES = {
+    "html": 5 * 1024 * 1024,
+    "text": 5 * 1024 * 1024,
+    "json": 5 * 1024 * 1024,
+    "docx": 30 * 1024 * 1024,
+}
+# 单个资源提取出的正文上限，防止单个文档撑爆内存
+MAX_CONTENT_CHARS = 200000
+
+_DOCX_MIME = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+_HTML_MIMES = {"text/html", "application/xhtml+xml"}
+_HTML_SNIFF_RE = re.compile(rb"^\s*(<!--.*?-->\s*)*<(!doctype\s+html|html|head|body|title|meta|div|script)[\s>]",
+                            re.IGNORECASE | re.DOTALL)
+_META_CHARSET_RE = re.compile(rb"<meta[^>]+charset=[\"']?([\w\-]+)", re.IGNORECASE)
+_UTF8_BOM = b"\xef\xbb\xbf"
+
+# 各类型路由次数 (error = 请求失败或非 200，not_modified = 条件请求返回 304)
+router_stats: Dict[str, int] = {
+    "html": 0, "pdf": 0, "text": 0, "json": 0, "docx": 0, "unknown": 0, "error": 0, "not_modified": 0,
+}
+
+
+def response_validators(headers) -> Dict[str, Optional[str]]:
+    """响应头中的缓存校验器 (ETag / Last-Modified)，供下次条件请求使用"""
+    return {"etag": headers.get("etag"), "last_modified": headers.get("last-modified")}
+
+
+def conditional_headers(validators: Optional[Dict]) -> Dict[str, str]:
+    """由已记录的校验器构造条件请求头"""
+    headers = {}
+    if validators and validators.get("etag"):
+        headers["If-None-Match"] = validators["etag"]
+    if validators and validators.get("last_modified"):
+        headers["If-Modified-Since"] = validators["last_modified"]
+    return headers
+
+
+class FetchedResource:
+    """已完成嗅探、尚未读取完的响应：处理器从这里继续读取同一个响应流"""
+
+    def __init__(self, url: str, kind: str, content_type: str, head: bytes, stream: AsyncIterator[bytes],
+                 content_length: Optional[int] = None, validators: Optional[Dict] = None):
+        self.url = url
+        self.kind = kind
+        self.content_type = content_type
+        self.head = head
+        # 服务器声明的响应体大小 (未声明或非法时为 None)，处理器可据此提前放弃
+        self.content_length = content_length
+        # 响应携带的 ETag / Last-Modified
+        self.validators = validators or {"etag": None, "last_modified": None}
+        self._stream = stream
+
+    async def chunks(self) -> AsyncIterator[bytes]:
+        """依次产出已嗅探的头部与剩余响应体"""
+        if self.head:
+            yield self.head
+        async for chunk in self._stream:
+            yield chunk
+
+    async def read(self, max_bytes: Optional[int] = None) -> Optional[bytes]:
+        """读取完整响应体；超过 max_bytes 时停止读取并返回 None"""
+        buffer = bytearray()
+        async for chunk in self.chunks():
+            buffer.extend(chunk)
+            if max_bytes and len(buffer) > max_bytes:
+                print(f"⚠️ [Router] {self.kind} body exceeds {max_bytes // (1024 * 1024)} MB, skipped: {self.url}")
+                return None
+        return bytes(buffer)
+
+    def decode(self, body: bytes) -> str:
+        """按 Content-Type / <meta charset> 声明的编码解码，默认 UTF-8 (有 UTF-8 BOM 时以 BOM 为准)"""
+        if body.startswith(_UTF8_BOM):
+            return body[len(_UTF8_BOM):].decode("utf-8", errors="replace")
+        match = re.search(r"charset=([\w\-]+)", self.content_type, re.IGNORECASE)
+        charset = match.group(1) if match else None
+        if not charset and self.kind == "html":
+            meta = _META_CHARSET_RE.search(self.head)
+            charset = meta.group(1).decode("ascii", "ignore") if meta else None
+        try:
+            return body.decode(charset or "utf-8", errors="replace")
+        except LookupError:
+            return body.decode("utf-8", errors="replace")
+
+
+Handler = Callable[[FetchedResource, Dict], Awaitable[Optional[Dict]]]
+_handlers: Dict[str, Handler] = {}
+
+
+def register_handler(kind: str, handler: Handler):
+    """注册 (或替换) 某种内容类型的处理器"""
+    _handlers[kind] = handler
+    router_stats.setdefault(kind, 0)
+
+
+def sniff_kind(content_type: str, head: bytes, url: str = "") -> str:
+    """
+    判断资源的真实类型：文件魔数 > 字节特征 > Content-Type > URL 后缀
+    返回 html / pdf / text / json / docx / unknown
+    """
+    mime = content_type.split(";")[0].strip().lower()
+    # 带 UTF-8 BOM 的 HTML (常见于 Windows 编辑器导出的页面) 去掉 BOM 再匹配字节特征
+    if head.startswith(_UTF8_BOM):
+        head = head[len(_UTF8_BOM):]
+    if b"%PDF-" in head[:1024]:
+        return "pdf"
+    if head.startswith(b"PK\x03\x04"):
+        # Office 文档都是 zip 包，只有声明为 Word 或以 .docx 结尾时才按 docx 解析
+        if mime == _DOCX_MIME or url.lower().split("?")[0].endswith(".docx"):
+            return "docx"
+        return "unknown"
+    if _HTML_SNIFF_RE.match(head[:1024]):
+        return "html"
+    if mime in _HTML_MIMES:
+        return "html"
+    if mime == "application/json" or mime.endswith("+json"):
+        return "json"
+    if mime.startswith("text/") or mime in ("application/xml", "application/x-tex"):
+        return "text"
+    if not mime and url.lower().split("?")[0].endswith((".txt", ".md", ".csv")):
+        return "text"
+    return "unknown"
+
+
+@asynccontextmanager
+async def open_resource(url: str, profile: str = "page", validators: Optional[Dict] = None):
+    """
+    发起流式 GET 并完成嗅探：
+        async with open_resource(url) as resource:   # 请求失败或非 200 时为 None
+            body = await resource.read()
+
+    传入 validators 时发起条件请求；服务器返回 304 时 resource.kind 为 "not_modified" (没有响应体)
+    """
+    client = http_clients.get(profile, url)
+    async with client.stream("GET", url, headers=conditional_headers(validators)) as response:
+        if response.status_code == 304 and validators:
+            yield FetchedResource(str(response.url), "not_modified", "", b"", response.aiter_bytes(),
+                                  validators=response_validators(response.headers))
+            return
+        if response.status_code != 200:
+            print(f"⚠️ [Router] HTTP {response.status_code}: {url}")
+            yield None
+            return
+        stream = response.aiter_bytes()
+        head = bytearray()
+        async for chunk in stream:
+            head.extend(chunk)
+            if len(head) >= _SNIFF_BYTES:
+                break
+        content_type = response.headers.get("content-type", "")
+        length = response.headers.get("content-length", "")
+        kind = sniff_kind(content_type, bytes(head), str(response.url))
+        yield FetchedResource(str(response.url), kind, content_type, bytes(head), stream,
+                              content_length=int(length) if length.isdigit() else None,
+                              validators=response_validators(response.headers))
+
+
+async def route_url(
+    url: str, context: Optional[Dict] = None, profile: str = "page", validators: Optional[Dict] = None,
+) -> Tuple[str, Optional[Dict], Dict]:
+    """
+    抓取单个 URL 并交给对应处理器
+
+    Args:
+        validators: 上次抓取记录的 {"etag", "last_modified"}；提供时发起条件请求
+
+    Returns:
+        (kind, result, validators)：result 为 {"url", "content", "source"} 或 None；
+        kind 为 "error" 表示请求失败或非 200，"not_modified" 表示资源未变化 (304)；
+        validators 为本次响应携带的 ETag / Last-Modified (请求失败时为空)
+    """
+    try:
+        async with open_resource(url, profile, validators) as resource:
+            if resource is None:
+                router_stats["error"] += 1
+                return "error", None, {}
+            router_stats[resource.kind] = router_stats.get(resource.kind, 0) + 1
+            if resource.kind == "not_modified":
+                return resource.kind, None, resource.validators
+            handler = _handlers.get(resource.kind)
+            if handler is None:
+                print(f"⏭️ [Router] Unsupported content ({resource.content_type or 'unknown'}): {url}")
+                return resource.kind, None, resource.validators
+            result = await handler(resource, context or {})
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        print(f"⚠️ [Router] Fetch failed {url}: {e}")
+        router_stats["error"] += 1
+        return "error", None, {}
+    if result:
+        # 保留调用方给出的原始 URL (账本与引用都以此为准)
+        result["url"] = url
+    return resource.kind, result, resource.validators
+
+
+# ---------------------------------------------------------------- 内置处理器
+
+async def _handle_html(resource: FetchedResource, context: Dict) -> Optional[Dict]:
+    # 静态通道关闭时不读取响应体，直接交给浏览器
+    if not settings.STATIC_FETCH_ENABLED:
+        return None
+    body = await resource.read(_MAX_BYTES["html"])
+    if body is None:
+        return None
+    # HTML 解析是纯 CPU 工作，放入线程池避免阻塞事件循环
+    page = await asyncio.to_thread(extract_page, resource.decode(body))
+    if page["js_required"] or len(page["markdown"]) < settings.STATIC_MIN_TEXT_CHARS:
+        return None
+    return {"url": resource.url, "content": page["markdown"][:MAX_CONTENT_CHARS], "source": "web_page"}
+
+
+async def _handle_text(resource: FetchedResource, context: Dict) -> Optional[Dict]:
+    body = await resource.read(_MAX_BYTES["text"])
+    text = resource.decode(body).strip() if body else ""
+    if not text:
+        return None
+    return {"url": resource.url, "content": text[:MAX_CONTENT_CHARS], "source": "text_document"}
+
+
+async def _handle_json(resource: FetchedResource, context: Dict) -> Optional[Dict]:
+    body = await resource.read(_MAX_BYTES["json"])
+    if not body:
+        return None
+    text = resource.decode(body)
+    try:
+        # 重新缩进，便于 LLM 阅读；中文保持原样
+        text = json.dumps(json.loads(text), ensure_ascii=False, indent=2)
+    except ValueError:
+        pass
+    return {"url": resource.url, "content": f"```json\n{text[:MAX_CONTENT_CHARS]}\n```", "source": "json_document"}
+
+
+_W_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+
+def docx_to_markdown(data: bytes) -> str:
+    """从 .docx (word/document.xml) 提取段落文本，标题样式转为 Markdown 标题"""
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        root = ET.fromstring(archive.read("word/document.xml"))
+    lines: List[str] = []
+    for para in root.iter(f"{_W_NS}p"):
+        text = "".join(t.text or "" for t in para.iter(f"{_W_NS}t")).strip()
+        if not text:
+            continue
+        style = para.find(f"{_W_NS}pPr/{_W_NS}pStyle")
+        level = re.match(r"heading\s*(\d)", (style.get(f"{_W_NS}val", "") if style is not None else ""), re.IGNORECASE)
+        lines.append(f"{'#' * int(level.group(1))} {text}" if level else text)
+    return "\n\n".join(lines)
+
+
+async def _handle_docx(resource: FetchedResource, context: Dict) -> Optional[Dict]:
+    body = await resource.read(_MAX_BYTES["docx"])
+    if not body:
+        return None
+    try:
+        text = await asyncio.to_thread(docx_to_markdown, body)
+    except (zipfile.BadZipFile, KeyError, ET.ParseError) as e:
+        print(f"❌ [DOCX] Failed to parse {resource.url}: {e}")
+        return None
+    if not text:
+        return None
+    return {"url": resource.url, "content": text[:MAX_CONTENT_CHARS], "source": "docx_document"}
+
+
+register_handler("html", _handle_html)
+register_handler("text", _handle_text)
+register_handler("json", _handle_json)
+register_handler("docx", _handle_docx)
@@ -1,23 +1,25 @@
 # app/modules/perception/crawler.py
 import asyncio
-import httpx
 import fitz  # PyMuPDF
-import numpy as np
-import cv2
 import logging
-from crawl4ai import AsyncWebCrawler
-from typing import List, Dict
+import os
+import tempfile
+from typing import List, Dict, Optional, Tuple, Union
 
-# 尝试导入 PaddleOCR
-PADDLE_AVAILABLE = False
-try:
-    from paddleocr import PaddleOCR
-    PADDLE_AVAILABLE = True
-except ImportError:
-    print("⚠️ PaddleOCR not installed. Scanning features disabled.")
-
-# 全局 OCR 引擎单例 (懒加载)
-_ocr_engine = None
+from app.core.cancellation import CancellationToken, get_token, raise_if_cancelled
+from app.core.budget import ResourceBudget, get_budget
+from app.core.config import settings
+from app.modules.perception.github_provider import github_client, parse_repo_url
+from app.modules.perception.arxiv_provider import arxiv_client, parse_arxiv_url
+from app.modules.perception.fetch_ledger import fetch_ledger
+from app.modules.perception.browser_pool import browser_pool
+from app.modules.perception.content_router import FetchedResource, register_handler, route_url, MAX_CONTENT_CHARS
+from app.modules.perception.url_canon import canonicalize_url
+from app.modules.perception.ocr_service import ocr_service
+from app.modules.perception.ocr_cache import ocr_cache, document_hash, image_hash
+from app.modules.perception.page_triage import triage_page, render_regions
+from app.modules.perception.pdf_parallel import pdf_extractor
+from app.modules.perception.reranker import tokenize
 
 # 关键词触发器：包含这些关键词的页面即使超过 15 页也需要 OCR
 OCR_KEYWORD_TRIGGERS = [
@@ -26,14 +28,6 @@ OCR_KEYWORD_TRIGGERS = [
     "analysis", "revenue", "profit", "income", "balance sheet", "cash flow"
 ]
 
-def get_ocr_engine():
-    global _ocr_engine
-    if _ocr_engine is None and PADDLE_AVAILABLE:
-        print("👁️ [System] Loading PaddleOCR Model (This may take time)...")
-        # use_angle_cls=True 自动纠正方向, lang="ch" 支持中英文
-        _ocr_engine = PaddleOCR(use_angle_cls=True, lang="ch")
-    return _ocr_engine
-
 def _page_needs_ocr(text: str) -> bool:
     """判断页面是否可能包含需要 OCR 的关键信息（基于关键词）"""
     if len(text.strip()) >= 50:
@@ -42,157 +36,418 @@ def _page_needs_ocr(text: str) -> bool:
     text_lower = text.lower()
     return any(kw.lower() in text_lower for kw in OCR_KEYWORD_TRIGGERS)
 
-def process_pdf_sync(pdf_bytes: bytes, url: str) -> str:
+def process_pdf_sync(
+    pdf_source: Union[bytes, str],
+    url: str,
+    cancel_token: Optional[CancellationToken] = None,
+    allow_ocr: bool = True,
+    budget: Optional[ResourceBudget] = None,
+    focus: Optional[str] = None
+) -> Tuple[str, bool]:
     """
     [同步函数] PDF 处理核心逻辑：PyMuPDF + PaddleOCR 混合策略
     将在线程池中运行，避免阻塞 Async 事件循环。
+    线程无法被强制中断，因此每处理完一页都会检查 cancel_token，任务取消后立即停止。
+    allow_ocr=False 时 (时间预算紧张) 只提取文字层，扫描页直接跳过。
+    budget 不为空时，OCR 耗时计入任务的 ocr_seconds 预算，耗尽后不再 OCR。
+    pdf_source 为字节串 (小文件) 或本地文件路径 (大文件落盘后由 PyMuPDF 按需读取，不整体载入内存)。
+    focus 为研究关注点 (任务描述)；开启 PDF_RELEVANT_PAGES_ONLY 时，大文档只保留与之相关的页面。
+
+    返回 (正文, 是否降级)：因取消、关闭 OCR 或 OCR 预算耗尽而缺页的结果属于降级结果，
+    按研究关注点筛掉部分页面的结果同样不完整 (其他任务的关注点不同)；
+    二者都只供本次任务使用，不写入跨任务的抓取账本。
     """
     try:
-        doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+        if isinstance(pdf_source, str):
+            doc = fitz.open(pdf_source, filetype="pdf")
+        else:
+            doc = fitz.open(stream=pdf_source, filetype="pdf")
     except Exception as e:
         print(f"❌ [PDF] Failed to open: {e}")
-        return ""
+        return "", False
 
     full_text = []
-    ocr = get_ocr_engine()
+    ocr_enabled = allow_ocr and ocr_service.available
     total_pages = len(doc)
     
     print(f"📄 [PDF] Processing {total_pages} pages from {url}...")
 
-    # 限制处理页数，防止几百页的财报把 OCR 跑死 (根据需求调整，比如前20页核心内容)
-    # 如果您真的"不在乎时间"，可以把这个限制去掉或调大
-    MAX_OCR_PAGES = 15 
+    # 限制 OCR 页数 (OCR_MAX_PAGES，0 表示不限)：超出后只识别命中关键词的页面
+    max_ocr_pages = settings.OCR_MAX_PAGES
+
+    ocr_pages = []
+    skipped = 0
+    degraded = False
+    # 🟢 大文档按页段分给多个进程并行提取，结果按页码顺序流式返回
+    terms = list(dict.fromkeys(tokenize(focus))) if focus else []
+    pages = pdf_extractor.iter_pages(doc, pdf_source, terms, cancel_token, settings.PDF_RELEVANT_PAGES_ONLY)
+    for i, text in pages:
+        # 🟢 协作式取消：页与页之间检查，避免任务结束后继续占用 CPU
+        if cancel_token and cancel_token.cancelled:
+            print(f"🛑 [PDF] Cancelled at page {i+1}/{total_pages}: {url}")
+            pages.close()
+            degraded = True
+            break
 
-    for i, page in enumerate(doc):
-        # 1. 尝试直接提取文本 (极快)
-        text = page.get_text()
+        # 1. 文字层 (极快)；与研究关注点无关的页面直接跳过 (不 OCR)
+        if text is None:
+            skipped += 1
+            full_text.append("")
+            continue
         
         # 2. 密度检测：如果文字极少，判定为扫描件/图片
-        needs_ocr = len(text.strip()) < 50 and PADDLE_AVAILABLE
-        # 关键词触发：即使超过 15 页，包含关键信息的页面仍需 OCR
-        keyword_trigger = _page_needs_ocr(text) if not needs_ocr else needs_ocr
-
-        if needs_ocr:
-            if i < MAX_OCR_PAGES or keyword_trigger:
+        if len(text.strip()) < 50 and ocr_enabled:
+            # 关键词触发：即使超过页数上限，包含关键信息的页面仍需 OCR
+            keyword_trigger = bool(max_ocr_pages) and _page_needs_ocr(text)
+            if not max_ocr_pages or i < max_ocr_pages or keyword_trigger:
                 trigger_note = " (keyword triggered)" if keyword_trigger else ""
-                print(f"   🔍 [OCR] Page {i+1}/{total_pages} is image-based{trigger_note}. Scanning...")
-                try:
-                    # 渲染为高分辨率图片 (zoom=2) 提升识别率
-                    pix = page.get_pixmap(matrix=fitz.Matrix(2, 2))
-                    
-                    # 转换 PyMuPDF(Pix) -> Numpy(OpenCV)
-                    img_data = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.h, pix.w, pix.n)
-                    
-                    # 颜色空间转换
-                    if pix.n == 4:
-                        img_data = cv2.cvtColor(img_data, cv2.COLOR_RGBA2RGB)
-                    elif pix.n == 3:
-                        pass # RGB
-                    else:
-                        img_data = cv2.cvtColor(img_data, cv2.COLOR_GRAY2RGB)
-
-                    # 执行 OCR
-                    result = ocr.ocr(img_data, cls=True)
-                    
-                    # 解析结果
-                    ocr_lines = []
-                    if result and result[0]:
-                        for line in result[0]:
-                            # line 结构: [[box], (text, score)]
-                            txt = line[1][0]
-                            ocr_lines.append(txt)
-                    
-                    ocr_text = "\n".join(ocr_lines)
-                    text = f"\n--- [Page {i+1} OCR Scan] ---\n{ocr_text}\n"
-                    
-                except Exception as e:
-                    print(f"⚠️ [OCR] Failed on page {i+1}: {e}")
+                print(f"   🔍 [OCR] Page {i+1}/{total_pages} is image-based{trigger_note}. Queued for scanning...")
+                ocr_pages.append(i)
             else:
-                # 只有非关键词触发的页面才跳过 OCR
-                if not keyword_trigger:
-                    text = "\n[OCR Skipped: Page limit reached]\n"
+                text = "\n[OCR Skipped: Page limit reached]\n"
+        elif len(text.strip()) < 50 and not allow_ocr:
+            # 截止时间临近关闭了 OCR：扫描页没有内容
+            degraded = True
         
         full_text.append(text)
+
+    # 3. 扫描页先查 OCR 缓存 (同一文档再次出现时不渲染、不识别)，其余交给 OCR 进程池
+    if ocr_pages and not (cancel_token and cancel_token.cancelled):
+        use_cache = settings.OCR_CACHE_ENABLED
+        doc_digest = document_hash(pdf_source) if use_cache else None
+        cached = ocr_cache.get_pages(doc_digest, ocr_pages) if use_cache else {}
+        for i, lines in cached.items():
+            full_text[i] = _format_ocr_page(i, lines)
+        if cached:
+            print(f"   💾 [OCR] {len(cached)}/{len(ocr_pages)} scanned pages served from cache")
+
+        done = set(cached)
+        # 分诊判定为空白/纯图片而未送识别的页面 (不算失败)
+        triage_skipped = set()
+        image_digests = {}
+        # 每页可能拆成多个文本区域分别识别：页码 -> 区域数 / 已完成区域的识别结果
+        region_counts, region_lines = {}, {}
+
+        def finish_page(i, lines):
+            full_text[i] = _format_ocr_page(i, lines)
+            done.add(i)
+            if use_cache:
+                ocr_cache.put(doc_digest, i, image_digests.get(i), lines)
+
+        def rendered_regions():
+            for i in ocr_pages:
+                if i in cached:
+                    continue
+                try:
+                    # 🟢 分诊：空白页与纯图片页不渲染、不识别；文本页按字号选分辨率，只渲染文本区域
+                    triage = triage_page(doc[i])
+                    if triage["kind"] != "text":
+                        print(f"   ⏭️ [OCR] Page {i+1} looks {triage['kind']}, skipped")
+                        triage_skipped.add(i)
+                        continue
+                    images = render_regions(doc[i], triage)
+                    if not images:
+                        triage_skipped.add(i)
+                        continue
+                except Exception as e:
+                    print(f"⚠️ [OCR] Failed to render page {i+1}: {e}")
+                    continue
+                if use_cache:
+                    # 文档哈希未命中 (如重新保存过的同一文档)：渲染结果相同的页面仍可复用
+                    digest = image_digests[i] = "+".join(image_hash(image) for image in images)
+                    lines = ocr_cache.get_by_image(digest)
+                    if lines is not None:
+                        finish_page(i, lines)
+                        continue
+                region_counts[i], region_lines[i] = len(images), {}
+                for r, image in enumerate(images):
+                    yield (i, r), image
+
+        for (i, r), lines in ocr_service.run(rendered_regions(), cancel_token=cancel_token, budget=budget):
+            region_lines[i][r] = lines
+            if len(region_lines[i]) == region_counts[i]:
+                # 区域已按阅读顺序排列，依次拼接
+                finish_page(i, [line for r in sorted(region_lines[i]) for line in region_lines[i][r]])
+        # 🟢 未完成识别的页面 (预算耗尽、取消、渲染失败、识别批次失败、多区域页面缺区域) 都是缺页：
+        #    标注原因，并把整份结果标记为降级，不写入跨任务账本
+        budget_exhausted = budget and budget.exhausted("ocr_seconds")
+        missing = [i for i in ocr_pages if i not in done and i not in triage_skipped and i < len(full_text)]
+        for i in missing:
+            full_text[i] = ("\n[OCR Skipped: OCR budget exhausted]\n" if budget_exhausted
+                            else f"\n[OCR Failed: Page {i+1}]\n")
+        if missing:
+            print(f"   ⚠️ [OCR] {len(missing)}/{len(ocr_pages)} scanned pages were not recognised")
+            degraded = True
+        if cancel_token and cancel_token.cancelled:
+            degraded = True
     
-    return "\n\n".join(full_text)
+    doc.close()
+    if skipped:
+        print(f"   ✂️ [PDF] Kept {total_pages - skipped}/{total_pages} pages relevant to the research focus")
+        degraded = True
+        full_text = [t for t in full_text if t]
+        full_text.append(f"\n[Pages Skipped: {skipped} pages not related to the research focus]\n")
+    return "\n\n".join(full_text), degraded
 
-async def extract_pdf_content(url: str) -> str:
-    """下载并解析 PDF"""
-    print(f"⬇️ [PDF] Downloading: {url}")
+def _format_ocr_page(i: int, lines) -> str:
+    ocr_text = "\n".join(text for text, _ in lines)
+    return f"\n--- [Page {i+1} OCR Scan] ---\n{ocr_text}\n"
+
+async def _spool_pdf(resource: FetchedResource) -> Optional[Union[bytes, str]]:
+    """
+    流式接收 PDF：不超过 PDF_SPOOL_MEMORY_MB 的留在内存，更大的边下载边写入临时文件。
+    超过 PDF_MAX_DOWNLOAD_MB 时立即停止下载。返回字节串或临时文件路径 (调用方负责删除)。
+    """
+    max_bytes = settings.PDF_MAX_DOWNLOAD_MB * 1024 * 1024
+    memory_limit = settings.PDF_SPOOL_MEMORY_MB * 1024 * 1024
+    # 服务器声明的大小已超上限时一个字节也不多读
+    if resource.content_length and resource.content_length > max_bytes:
+        print(f"⚠️ [PDF] {resource.content_length / 1048576:.0f} MB exceeds {settings.PDF_MAX_DOWNLOAD_MB} MB limit, skipped: {resource.url}")
+        return None
+    # 文件头校验：嗅探阶段已确认 %PDF 魔数，这里防御非路由调用
+    if b"%PDF-" not in resource.head[:1024]:
+        return None
+
+    buffer = bytearray()
+    spool = None
+    size = 0
+    completed = False
     try:
-        async with httpx.AsyncClient(verify=False, follow_redirects=True, timeout=60.0) as client:
-            response = await client.get(url)
-            # 处理部分服务器返回 403 的情况，模拟 UA
-            if response.status_code != 200:
-                response = await client.get(url, headers={"User-Agent": "Mozilla/5.0"})
-            
-            response.raise_for_status()
-            
-            # 检查是否真的是 PDF
-            if b"%PDF" not in response.content[:10]:
-                return None 
-
-            # 🟢 关键：将繁重的 PDF 处理放入线程池
-            return await asyncio.to_thread(process_pdf_sync, response.content, url)
+        async for chunk in resource.chunks():
+            size += len(chunk)
+            if size > max_bytes:
+                print(f"⚠️ [PDF] Download exceeds {settings.PDF_MAX_DOWNLOAD_MB} MB limit, aborted: {resource.url}")
+                return None
+            if spool is None and size > memory_limit:
+                spool = tempfile.NamedTemporaryFile(prefix="apex_pdf_", suffix=".pdf", delete=False)
+                spool.write(buffer)
+                buffer = bytearray()
+            if spool is not None:
+                # 写入的是页缓存，单块 (数十 KB) 写入不会明显阻塞事件循环
+                spool.write(chunk)
+            else:
+                buffer.extend(chunk)
+        completed = True
+    finally:
+        if spool is not None:
+            spool.close()
+            # 超限、下载出错或任务取消时删除不完整的临时文件
+            if not completed:
+                os.unlink(spool.name)
+    return spool.name if spool is not None else bytes(buffer)
 
-    except Exception as e:
-        print(f"❌ [PDF] Download error {url}: {e}")
+async def _handle_pdf(resource: FetchedResource, context: Dict) -> Optional[Dict]:
+    """PDF 处理器：流式下载 (大文件落盘) 后在线程池中解析 (文字层 + OCR)"""
+    print(f"⬇️ [PDF] Downloading: {resource.url}")
+    pdf_source = await _spool_pdf(resource)
+    if not pdf_source:
+        return None
+    try:
+        # 🟢 关键：将繁重的 PDF 处理放入线程池；信号量限制同时解析/OCR 的文档数 (CPU 密集型)
+        async with context.get("pdf_sem") or asyncio.Semaphore(1):
+            content, degraded = await asyncio.to_thread(
+                process_pdf_sync, pdf_source, resource.url,
+                context.get("cancel_token"), context.get("allow_ocr", True), context.get("budget"),
+                context.get("focus"),
+            )
+    finally:
+        if isinstance(pdf_source, str):
+            os.unlink(pdf_source)
+    if not content:
         return None
+    result = {"url": resource.url, "content": content, "source": "pdf_document"}
+    if degraded:
+        # 缺页的结果不能当作完整文档提供给其他任务
+        result["degraded"] = True
+    return result
+
+register_handler("pdf", _handle_pdf)
+
+# 各抓取层级的命中统计
+crawl_stats: Dict[str, int] = {"static": 0, "escalated": 0, "browser": 0, "revalidated": 0, "changed": 0}
 
-async def crawl_urls(urls: List[str]) -> List[Dict]:
-    """智能混合爬虫入口"""
+async def render_in_browser(url: str) -> Optional[Dict]:
+    """crawl4ai 常驻浏览器池渲染 (静态通道拿不到正文时使用)"""
+    crawl_stats["browser"] += 1
+    # 简单重试 (每次重新借用浏览器：崩溃的实例会被换掉)
+    for _ in range(2):
+        try:
+            async with browser_pool.page() as crawler:
+                res = await crawler.arun(
+                    url=url, 
+                    bypass_cache=True, 
+                    word_count_threshold=50,
+                    delay_before_return_html=1.0, # 给 JS 一点时间
+                    timeout=30000
+                )
+                if not res.success:
+                    # arun 会吞掉浏览器崩溃等异常，只在 error_message 中体现
+                    browser_pool.report_failure(crawler, res.error_message or "")
+            if res.success:
+                # 限制单页长度，防止单个网页 5MB 文本撑爆内存
+                return {"url": url, "content": res.markdown[:MAX_CONTENT_CHARS], "source": "web_page"}
+        except Exception: pass  # 取消 (CancelledError) 需继续向上传播
+    return None
+
+async def crawl_urls(urls: List[str], task_id: str = None, allow_ocr: bool = True, focus: str = None) -> List[Dict]:
+    """
+    智能混合爬虫入口
+
+    Args:
+        task_id: 所属研究任务。任务取消时中断下载与页面渲染，并通知 OCR 线程停止
+        allow_ocr: 是否对扫描版 PDF 执行 OCR (截止时间临近时由调度器关闭)
+        focus: 研究关注点 (任务描述)，用于大型 PDF 的相关页筛选
+    """
     if not urls: return []
+    raise_if_cancelled(task_id)
+    token = get_token(task_id)
 
-    print(f"🕷️ [Smart Crawler] Processing {len(urls)} URLs...")
-    
+    # 🟢 按规范 URL 去重，并在任何网络/浏览器工作之前查询抓取账本：
+    #    新鲜期内已抓取过的资源 (可能来自其他任务) 直接读取本地正文；
+    #    已过期但记录了 ETag / Last-Modified 的资源稍后发起条件请求再验证
     results = []
-    pdf_urls = [u for u in urls if u.lower().endswith(".pdf")]
-    web_urls = [u for u in urls if not u.lower().endswith(".pdf")]
+    pending, seen = [], set()
+    stale: Dict[str, Dict] = {}
+    for u in urls:
+        key = canonicalize_url(u)
+        if key in seen:
+            continue
+        seen.add(key)
+        known = fetch_ledger.lookup(u)
+        if known and known["fresh"]:
+            results.append({"url": u, "content": known["content"], "source": known["source"] or "web_page"})
+        else:
+            if known:
+                stale[u] = known
+            pending.append(u)
+    if results:
+        print(f"📒 [Smart Crawler] {len(results)} URLs already fetched, reusing stored content")
+    urls = pending
+    from_ledger = len(results)
+    if not urls: return results
+
+    # 🟢 抓取页数预算：只抓取预算允许的前 N 个 URL
+    budget = get_budget(task_id)
+    if budget:
+        allowed = int(budget.acquire("crawl_pages", len(urls)))
+        if allowed < len(urls):
+            print(f"💸 [Smart Crawler] Crawl budget allows {allowed}/{len(urls)} URLs")
+            urls = urls[:allowed]
+        if not urls: return results
+
+    print(f"🕷️ [Smart Crawler] Processing {len(urls)} URLs...")
     
-    # 1. 处理 PDF (限制并发，防止 CPU 爆炸)
-    if pdf_urls:
-        print(f"📄 Found {len(pdf_urls)} PDFs. Queueing OCR...")
-        # 信号量控制同时进行的 OCR 任务数 (CPU密集型)
-        sem = asyncio.Semaphore(2) 
-        
-        async def safe_pdf_task(u):
-            async with sem:
-                content = await extract_pdf_content(u)
-                if content:
-                    return {"url": u, "content": content, "source": "pdf_document"}
+    # 🟢 GitHub 仓库主页：直接通过 API 读取 README，无需启动浏览器
+    #    (有校验器的过期记录来自内容路由，仍走路由做条件请求)
+    repo_urls = [u for u in urls if parse_repo_url(u) and u not in stale]
+    # 🟢 arXiv 论文：优先取 HTML 全文，没有时才下载 PDF
+    arxiv_urls = [u for u in urls if parse_arxiv_url(u) and u not in stale]
+    # 🟢 其余 URL 不再按 .pdf 后缀猜类型，由内容路由嗅探后分派
+    routed_urls = [u for u in urls if u not in repo_urls + arxiv_urls]
+    # 信号量控制同时进行的 PDF 解析/OCR 任务数 (CPU密集型)
+    pdf_sem = asyncio.Semaphore(2)
+    route_context = {"cancel_token": token, "allow_ocr": allow_ocr, "budget": budget, "pdf_sem": pdf_sem, "focus": focus}
+    # 本次响应携带的 ETag / Last-Modified，写入账本供下次再验证
+    validators: Dict[str, Dict] = {}
+
+    # 0. 处理 GitHub 仓库 (README 原始 Markdown)
+    if repo_urls:
+        print(f"💻 Found {len(repo_urls)} GitHub repos. Fetching READMEs via API...")
+
+        async def readme_task(u):
+            owner, repo = parse_repo_url(u)
+            try:
+                readme = await github_client.fetch_readme(owner, repo)
+            except Exception as e:
+                print(f"⚠️ [GitHub] README fetch failed {owner}/{repo}: {e}")
                 return None
+            if readme:
+                return {"url": u, "content": f"# {owner}/{repo}\n\n{readme[:200000]}", "source": "github_readme"}
+            return None
 
-        pdf_results = await asyncio.gather(*[safe_pdf_task(u) for u in pdf_urls])
-        
-        for i, res in enumerate(pdf_results):
+        repo_jobs = asyncio.gather(*[readme_task(u) for u in repo_urls])
+        repo_results = await token.run(repo_jobs) if token else await repo_jobs
+
+        for i, res in enumerate(repo_results):
             if res:
                 results.append(res)
             else:
-                # 假如解析失败，可能是伪装的 HTML，丢回 Web 队列
-                web_urls.append(pdf_urls[i])
-
-    # 2. 处理 Web 页面 (crawl4ai)
-    if web_urls:
-        print(f"🌐 [Crawl4AI] Crawling {len(web_urls)} web pages...")
-        async with AsyncWebCrawler(verbose=True) as crawler:
-            async def process_web(url):
-                # 简单重试
-                for _ in range(2):
-                    try:
-                        res = await crawler.arun(
-                            url=url, 
-                            bypass_cache=True, 
-                            word_count_threshold=50,
-                            delay_before_return_html=1.0, # 给 JS 一点时间
-                            timeout=30000
-                        )
-                        if res.success:
-                            # 限制单页长度，防止单个网页 5MB 文本撑爆内存
-                            return {"url": url, "content": res.markdown[:200000], "source": "web_page"}
-                    except: pass
+                # API 失败 (限流且无缓存) 时回退到抓取仓库页面
+                routed_urls.append(repo_urls[i])
+    
+    # 0.5 处理 arXiv 论文 (HTML 全文 -> PDF 兜底)
+    if arxiv_urls:
+        print(f"📚 Found {len(arxiv_urls)} arXiv papers. Fetching full text...")
+
+        async def arxiv_task(u):
+            arxiv_id = parse_arxiv_url(u)
+            try:
+                text = await arxiv_client.fetch_html(arxiv_id)
+            except Exception as e:
+                print(f"⚠️ [arXiv] HTML fetch failed {arxiv_id}: {e}")
+                text = None
+            if text:
+                return {"url": u, "content": text[:200000], "source": "arxiv_html"}
+            await arxiv_client.wait_for_download()
+            _, res, _ = await route_url(arxiv_client.pdf_url(arxiv_id), route_context, profile="download")
+            if res:
+                return {**res, "url": u}
+            return None
+
+        arxiv_jobs = asyncio.gather(*[arxiv_task(u) for u in arxiv_urls])
+        arxiv_results = await token.run(arxiv_jobs) if token else await arxiv_jobs
+
+        for i, res in enumerate(arxiv_results):
+            if res:
+                results.append(res)
+            else:
+                # 全文都拿不到时，至少抓取摘要页
+                routed_urls.append(arxiv_urls[i])
+
+    # 1. 其余资源：一次流式请求嗅探真实类型，交给 PDF / HTML / 文本 / JSON / DOCX 处理器
+    if routed_urls:
+        print(f"🌐 [Smart Crawler] Fetching {len(routed_urls)} URLs (content-type routed, browser on demand)...")
+
+        async def process_url(url):
+            known = stale.get(url)
+            kind, result, fresh_validators = await route_url(url, route_context, validators=known)
+            if kind == "not_modified":
+                # 🟢 资源未变化：一次 304 即可沿用账本中的正文 (304 可能不带校验器，沿用旧值)
+                crawl_stats["revalidated"] += 1
+                validators[url] = {
+                    "etag": fresh_validators.get("etag") or known["etag"],
+                    "last_modified": fresh_validators.get("last_modified") or known["last_modified"],
+                }
+                return {"url": url, "content": known["content"], "source": known["source"] or "web_page"}
+            if known:
+                crawl_stats["changed"] += 1
+            # 浏览器渲染的页面同样记录静态响应的校验器，下次可以用 304 跳过渲染
+            validators[url] = fresh_validators
+            if result:
+                if kind == "html":
+                    crawl_stats["static"] += 1
+                return result
+            # 🟢 只有 HTML (正文不足 / 依赖 JS) 与请求失败的 URL 才升级到浏览器；
+            #    PDF 解析失败或不支持的二进制内容，浏览器同样无能为力
+            if kind not in ("html", "error"):
                 return None
-            
-            web_results = await asyncio.gather(*[process_web(u) for u in web_urls])
-            results.extend([r for r in web_results if r])
+            if kind == "html" and settings.STATIC_FETCH_ENABLED:
+                crawl_stats["escalated"] += 1
+            return await render_in_browser(url)
+
+        # 🟢 在令牌保护下运行：取消时中断页面渲染 (浏览器常驻，不随任务关闭)
+        routed_jobs = asyncio.gather(*[process_url(u) for u in routed_urls])
+        routed_results = await token.run(routed_jobs) if token else await routed_jobs
+        results.extend([r for r in routed_results if r])
+
+    # 🟢 新抓取 (或再验证) 的资源写入账本，供后续任务跳过；降级结果 (缺页) 只供本次任务使用
+    for r in results[from_ledger:]:
+        if r.pop("degraded", False):
+            print(f"⏭️ [Ledger] Degraded result not recorded: {r['url']}")
+            continue
+        try:
+            fetch_ledger.record(r["url"], r["content"], r["source"], **validators.get(r["url"], {}))
+        except Exception as e:
+            print(f"⚠️ [Ledger] Record failed {r['url']}: {e}")
 
     return results
\ No newline at end of file
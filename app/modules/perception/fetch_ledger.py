@@ -0,0 +1,134 @@
+# app/modules/perception/fetch_ledger.py
+"""
+跨任务抓取账本 (Fetch Ledger)
+
+FileKnowledgeStore 只能在完整下载、渲染之后按内容 MD5 去重，重复资源的网络与浏览器开销已经付出。
+账本记录 规范 URL -> 内容哈希 -> 抓取时间，正文按内容哈希存放在内容寻址目录中 (相同内容只存一份)：
+
+    - crawl_urls 在发起任何网络请求前先查账本，新鲜期内的资源直接从本地读取正文
+    - 抓取成功后写入账本，供之后的任务 (包括其他研究任务) 复用
+    - 新鲜期按来源类型配置 (FETCH_FRESHNESS_SEC)：网页较短，PDF / arXiv 全文较长
+    - 同时记录响应的 ETag / Last-Modified：过了新鲜期的记录不直接作废，而是由调用方发起条件请求再验证，
+      资源未变化时只花费一次 304，沿用本地正文并刷新抓取时间
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+
+from app.core.config import settings
+from app.modules.perception.url_canon import canonicalize_url
+
+
+class ContentStore:
+    """内容寻址存储：content/<哈希前两位>/<sha256>.md"""
+
+    def __init__(self, root_dir: str):
+        self.root_dir = root_dir
+        os.makedirs(root_dir, exist_ok=True)
+
+    def _path(self, content_hash: str) -> str:
+        return os.path.join(self.root_dir, content_hash[:2], f"{content_hash}.md")
+
+    def put(self, content: str) -> str:
+        content_hash = hashlib.sha256(content.encode("utf-8")).hexdigest()
+        path = self._path(content_hash)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(content)
+            os.replace(tmp_path, path)
+        return content_hash
+
+    def get(self, content_hash: str) -> Optional[str]:
+        try:
+            with open(self._path(content_hash), "r", encoding="utf-8") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+
+class FetchLedger:
+    def __init__(self, db_path: str, content_dir: str):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL;")
+        self._conn.execute("PRAGMA synchronous=NORMAL;")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS fetches (
+                canonical_url TEXT PRIMARY KEY,
+                url           TEXT NOT NULL,
+                content_hash  TEXT NOT NULL,
+                source        TEXT,
+                fetched_at    REAL NOT NULL,
+                etag          TEXT,
+                last_modified TEXT
+            )
+        """)
+        # 旧版本账本没有校验器列，补上 (已有记录视为没有校验器)
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(fetches)")}
+        for column in ("etag", "last_modified"):
+            if column not in columns:
+                self._conn.execute(f"ALTER TABLE fetches ADD COLUMN {column} TEXT")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_fetches_hash ON fetches (content_hash)")
+        self._conn.commit()
+        self.store = ContentStore(content_dir)
+        self.stats: Dict[str, int] = {"hit": 0, "stale": 0, "miss": 0, "recorded": 0}
+
+    @staticmethod
+    def freshness(source: Optional[str]) -> int:
+        """某类来源的新鲜期 (秒)；未单独配置的来源使用 FETCH_LEDGER_TTL_SEC，0 表示永久有效"""
+        return settings.FETCH_FRESHNESS_SEC.get(source or "", settings.FETCH_LEDGER_TTL_SEC)
+
+    def lookup(self, url: str, max_age: float = None) -> Optional[Dict]:
+        """
+        查询账本，返回 {"url", "content", "source", "fetched_at", "fresh", "etag", "last_modified"} 或 None
+
+            - 新鲜期内 (默认按来源类型的新鲜期)：fresh=True，可直接使用
+            - 已过期但记录了 ETag / Last-Modified：fresh=False，调用方应带校验器发起条件请求再验证
+            - 已过期且没有校验器、或正文已不在本地：None
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT url, content_hash, source, fetched_at, etag, last_modified FROM fetches WHERE canonical_url=?",
+                (canonicalize_url(url),)
+            ).fetchone()
+        if not row:
+            self.stats["miss"] += 1
+            return None
+        max_age = self.freshness(row[2]) if max_age is None else max_age
+        fresh = not max_age or time.time() - row[3] <= max_age
+        if not fresh and not (row[4] or row[5]):
+            self.stats["miss"] += 1
+            return None
+        content = self.store.get(row[1])
+        if content is None:
+            self.stats["miss"] += 1
+            return None
+        self.stats["hit" if fresh else "stale"] += 1
+        return {
+            "url": row[0], "content": content, "source": row[2], "fetched_at": row[3],
+            "fresh": fresh, "etag": row[4], "last_modified": row[5],
+        }
+
+    def record(self, url: str, content: str, source: str = None,
+               etag: str = None, last_modified: str = None) -> str:
+        """记录一次成功抓取 (或一次 304 再验证)，返回内容哈希"""
+        content_hash = self.store.put(content)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO fetches "
+                "(canonical_url, url, content_hash, source, fetched_at, etag, last_modified) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (canonicalize_url(url), url, content_hash, source, time.time(), etag, last_modified)
+            )
+            self._conn.commit()
+        self.stats["recorded"] += 1
+        return content_hash
+
+
+# 进程级单例
+fetch_ledger = FetchLedger(settings.FETCH_LEDGER_PATH, settings.CONTENT_STORE_DIR)
@@ -0,0 +1,191 @@
+# app/modules/perception/github_provider.py
+"""
+GitHub 检索与 README 直取
+
+未鉴权时 GitHub API 每小时只有 60 次额度，而仓库链接此前还要交给 Chromium 完整渲染
+才能读到 README。本模块：
+
+    - 对 API 响应按 URL 保存 ETag，再次请求时带 If-None-Match；
+      304 不计入主速率限制，直接复用本地缓存的响应体 (SQLite 持久化，重启后仍有效)
+    - 记录 X-RateLimit-Remaining / Reset，额度耗尽期间不再发请求，有缓存则返回旧响应
+    - 通过 contents API 直接获取 README 原始 Markdown，crawl_urls 对仓库链接不再启动浏览器
+"""
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlencode, urlsplit
+
+from app.core.config import settings
+from app.core.http import http_clients
+
+GITHUB_API_URL = "https://api.github.com"
+
+# github.com 下不是 "用户/仓库" 的一级路径
+_RESERVED_OWNERS = {
+    "about", "collections", "customer-stories", "enterprise", "events", "explore",
+    "features", "login", "marketplace", "notifications", "orgs", "pricing",
+    "pulls", "issues", "search", "settings", "sponsors", "topics", "trending",
+}
+_NAME_RE = re.compile(r"^[A-Za-z0-9_.-]+$")
+
+
+def parse_repo_url(url: str) -> Optional[Tuple[str, str]]:
+    """
+    识别 GitHub 仓库主页链接，返回 (owner, repo)；
+    仓库内的具体文件/Issue 等链接返回 None (仍交给网页抓取)
+    """
+    parts = urlsplit(url)
+    if parts.hostname not in ("github.com", "www.github.com"):
+        return None
+    segments = [s for s in parts.path.split("/") if s]
+    if len(segments) == 4 and segments[2] == "tree":
+        segments = segments[:2]  # 分支主页同样展示 README
+    if len(segments) != 2 or segments[0].lower() in _RESERVED_OWNERS:
+        return None
+    owner, repo = segments[0], segments[1].removesuffix(".git")
+    if not (_NAME_RE.match(owner) and _NAME_RE.match(repo)):
+        return None
+    return owner, repo
+
+
+class _EtagStore:
+    """URL -> (ETag, 响应体) 的持久化存储"""
+
+    def __init__(self, db_path: str):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL;")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS github_etags (
+                key        TEXT PRIMARY KEY,
+                etag       TEXT NOT NULL,
+                body       TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        """)
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[Tuple[str, str]]:
+        with self._lock:
+            row = self._conn.execute("SELECT etag, body FROM github_etags WHERE key=?", (key,)).fetchone()
+        return (row[0], row[1]) if row else None
+
+    def set(self, key: str, etag: str, body: str):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO github_etags (key, etag, body, updated_at) VALUES (?, ?, ?, ?)",
+                (key, etag, body, time.time())
+            )
+            self._conn.commit()
+
+
+class GitHubClient:
+    def __init__(self, db_path: str):
+        self._etags = _EtagStore(db_path)
+        # 各额度类别 (core / search / ...) 独立计数：X-RateLimit-Resource -> (剩余次数, 重置时间)
+        self._rate: Dict[str, Tuple[int, float]] = {}
+        self.stats: Dict[str, int] = {"requests": 0, "not_modified": 0, "rate_limited": 0}
+
+    def _headers(self, accept: str) -> Dict[str, str]:
+        headers = {"Accept": accept, "X-GitHub-Api-Version": "2022-11-28"}
+        # 鉴权 (强烈建议配置 Token，否则限制极严)
+        if settings.GITHUB_TOKEN:
+            headers["Authorization"] = f"Bearer {settings.GITHUB_TOKEN}"
+        return headers
+
+    def _cache_key(self, url: str, accept: str) -> str:
+        # 不同 Token 看到的内容可能不同 (私有仓库)，按 Token 指纹区分
+        token = hashlib.sha256((settings.GITHUB_TOKEN or "").encode()).hexdigest()[:8]
+        return f"{token}|{accept}|{url}"
+
+    @staticmethod
+    def _resource(path: str) -> str:
+        """请求计入的额度类别：搜索接口单独限流 (每分钟 10-30 次)，其余计入 core"""
+        if path.startswith("/search/code"):
+            return "code_search"
+        return "search" if path.startswith("/search/") else "core"
+
+    def _rate_limited(self, resource: str) -> bool:
+        remaining, reset = self._rate.get(resource, (None, 0.0))
+        return remaining == 0 and time.time() < reset
+
+    def _record_rate_limit(self, resp, resource: str) -> str:
+        """记录响应所属类别的剩余额度，返回该类别"""
+        resource = resp.headers.get("x-ratelimit-resource", resource)
+        try:
+            self._rate[resource] = (
+                int(resp.headers["x-ratelimit-remaining"]), float(resp.headers["x-ratelimit-reset"])
+            )
+        except (KeyError, ValueError):
+            pass
+        return resource
+
+    async def get(self, path: str, params: Dict = None,
+                  accept: str = "application/vnd.github+json") -> Optional[str]:
+        """
+        条件 GET：返回响应体文本；404 返回 None。
+        额度耗尽时返回缓存的旧响应 (没有缓存则抛出异常)。
+        """
+        url = f"{GITHUB_API_URL}{path}"
+        if params:
+            url = f"{url}?{urlencode(sorted(params.items()))}"
+        key = self._cache_key(url, accept)
+        cached = self._etags.get(key)
+        resource = self._resource(path)
+
+        if self._rate_limited(resource):
+            self.stats["rate_limited"] += 1
+            if cached:
+                return cached[1]
+            reset = self._rate[resource][1]
+            raise RuntimeError(f"GitHub {resource} rate limit exhausted until "
+                               f"{time.strftime('%H:%M:%S', time.localtime(reset))}")
+
+        headers = self._headers(accept)
+        if cached:
+            headers["If-None-Match"] = cached[0]
+
+        client = http_clients.get("api", GITHUB_API_URL)
+        resp = await client.get(url, headers=headers)
+        self.stats["requests"] += 1
+        resource = self._record_rate_limit(resp, resource)
+
+        if resp.status_code == 304 and cached:
+            self.stats["not_modified"] += 1
+            return cached[1]
+        if resp.status_code == 404:
+            return None
+        if resp.status_code in (403, 429) and self._rate_limited(resource):
+            self.stats["rate_limited"] += 1
+            if cached:
+                return cached[1]
+        resp.raise_for_status()
+
+        etag = resp.headers.get("etag")
+        if etag:
+            self._etags.set(key, etag, resp.text)
+        return resp.text
+
+    async def search_repositories(self, query: str, limit: int) -> List[Dict]:
+        body = await self.get("/search/repositories", {
+            "q": query, "sort": "stars", "order": "desc", "per_page": limit,
+        })
+        items = json.loads(body).get("items", []) if body else []
+        return [{
+            "url": repo["html_url"],
+            "title": f"[GitHub] {repo['full_name']} ({repo['stargazers_count']}⭐)",
+            "snippet": f"Language: {repo.get('language')}\nDescription: {repo.get('description')}\n(Readme will be crawled)",
+            "source": "github"
+        } for repo in items[:limit]]
+
+    async def fetch_readme(self, owner: str, repo: str) -> Optional[str]:
+        """通过 contents API 获取仓库 README 的原始 Markdown，没有 README 时返回 None"""
+        return await self.get(f"/repos/{owner}/{repo}/readme", accept="application/vnd.github.raw+json")
+
+
+# 进程级单例 (ETag 与搜索缓存共用一个 SQLite 文件)
+github_client = GitHubClient(settings.SEARCH_CACHE_PATH)
@@ -0,0 +1,205 @@
+# app/modules/perception/html_extract.py
+"""
+轻量 HTML -> Markdown 转换 (仅依赖标准库)
+
+用于无需浏览器渲染的静态页面 (arXiv 的 HTML 全文、百科、文档站等)：
+保留标题层级、段落、列表、表格行与公式 (取 MathML 的 alttext)，
+丢弃脚本、样式、导航、页眉页脚等噪声。
+
+extract_page 额外做正文提取：优先取 <article> / <main> / 常见正文容器中的内容，
+并剔除侧栏、评论、分享按钮等样板区块；同时给出"是否依赖 JS 渲染"的判断，
+供抓取器决定是否需要升级到无头浏览器。
+"""
+import re
+from html.parser import HTMLParser
+from typing import Dict, List, Optional
+
+# 整个子树都丢弃的标签
+_SKIP_TAGS = {"script", "style", "noscript", "svg", "nav", "header", "footer", "form", "button", "template", "iframe"}
+# 块级标签：前后换行
+_BLOCK_TAGS = {
+    "p", "div", "section", "article", "main", "blockquote", "pre", "figure", "figcaption",
+    "table", "tr", "ul", "ol", "dl", "dt", "dd", "br", "hr", "caption",
+}
+_HEADINGS = {"h1": 1, "h2": 2, "h3": 3, "h4": 4, "h5": 5, "h6": 6}
+# 不会有闭合标签的空元素
+_VOID_TAGS = {"br", "hr", "img", "input", "meta", "link", "source", "wbr", "col", "area", "base", "embed"}
+
+# 正文提取：样板区块与正文容器的 class/id 特征
+_BOILERPLATE_RE = re.compile(
+    r"(^|[\s_-])(nav|navbar|menu|sidebar|side-bar|breadcrumbs?|footer|comments?|cookie|banner|"
+    r"advert|ads?|share|social|related|recommend|popup|modal|subscribe|newsletter)([\s_-]|$)",
+    re.IGNORECASE,
+)
+_CONTENT_RE = re.compile(
+    r"(mw-content-text|article-body|article-content|post-content|post-body|entry-content|"
+    r"main-content|markdown-body|rich-text|ltx_document)",
+    re.IGNORECASE,
+)
+# 单页应用的挂载点
+_SPA_ROOT_RE = re.compile(r'<div[^>]+id=["\'](root|app|__next|__nuxt)["\'][^>]*>\s*</div>', re.IGNORECASE)
+_NOSCRIPT_JS_RE = re.compile(r"<noscript[^>]*>[^<]*(enable|requires?|turn on)[^<]*javascript", re.IGNORECASE)
+
+
+class _MarkdownBuilder(HTMLParser):
+    def __init__(self, main_content: bool = False):
+        super().__init__(convert_charrefs=True)
+        self.main_content = main_content
+        self.parts: List[str] = []
+        self.main_parts: List[str] = []
+        self.title: Optional[str] = None
+        self.scripts = 0
+        # 正在跳过的子树：起始标签名 + 同名标签嵌套深度
+        self._skip_tag: Optional[str] = None
+        self._skip_depth = 0
+        # 正文容器：起始标签名 + 同名标签嵌套深度
+        self._main_tag: Optional[str] = None
+        self._main_depth = 0
+        self._main_found = False
+        self._in_title = False
+        self._math_depth = 0
+
+    def _emit(self, text: str):
+        self.parts.append(text)
+        if self._main_tag:
+            self.main_parts.append(text)
+
+    def _newline(self, count: int = 1):
+        self._emit("\n" * count)
+
+    def _should_skip(self, tag: str, attrs: Dict[str, str]) -> bool:
+        if tag in _SKIP_TAGS or attrs.get("aria-hidden") == "true":
+            return True
+        if self.main_content:
+            if tag == "aside" or attrs.get("role") in ("navigation", "banner", "contentinfo", "complementary"):
+                return True
+            marker = f"{attrs.get('id', '')} {attrs.get('class', '')}"
+            if _BOILERPLATE_RE.search(marker) and not _CONTENT_RE.search(marker):
+                return True
+        return False
+
+    def _is_main(self, tag: str, attrs: Dict[str, str]) -> bool:
+        if tag in ("article", "main") or attrs.get("role") == "main":
+            return True
+        return bool(_CONTENT_RE.search(f"{attrs.get('id', '')} {attrs.get('class', '')}"))
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "script":
+            self.scripts += 1
+        if self._skip_tag:
+            if tag == self._skip_tag:
+                self._skip_depth += 1
+            return
+        attrs = {k: v or "" for k, v in attrs}
+        if self._should_skip(tag, attrs):
+            if tag not in _VOID_TAGS:
+                self._skip_tag, self._skip_depth = tag, 1
+            return
+
+        if self._main_tag:
+            if tag == self._main_tag:
+                self._main_depth += 1
+        elif self.main_content and not self._main_found and self._is_main(tag, attrs):
+            self._main_tag, self._main_depth, self._main_found = tag, 1, True
+
+        if tag == "title":
+            self._in_title = True
+        elif tag == "math":
+            # LaTeXML / MathJax 输出的 MathML：用 alttext 保留原始 LaTeX
+            if self._math_depth == 0 and attrs.get("alttext"):
+                self._emit(f" ${attrs['alttext'].strip()}$ ")
+            self._math_depth += 1
+        elif tag in _HEADINGS:
+            self._newline(2)
+            self._emit("#" * _HEADINGS[tag] + " ")
+        elif tag == "li":
+            self._newline()
+            self._emit("- ")
+        elif tag in ("td", "th"):
+            self._emit(" | ")
+        elif tag in _BLOCK_TAGS:
+            self._newline(2 if tag in ("p", "table", "pre", "blockquote") else 1)
+
+    def handle_endtag(self, tag):
+        if self._skip_tag:
+            if tag == self._skip_tag:
+                self._skip_depth -= 1
+                if self._skip_depth == 0:
+                    self._skip_tag = None
+            return
+        if tag == "title":
+            self._in_title = False
+        elif tag == "math":
+            self._math_depth = max(0, self._math_depth - 1)
+        elif tag in _HEADINGS:
+            self._newline(2)
+        elif tag in _BLOCK_TAGS:
+            self._newline()
+
+        if self._main_tag and tag == self._main_tag:
+            self._main_depth -= 1
+            if self._main_depth == 0:
+                self._main_tag = None
+
+    def handle_data(self, data):
+        if self._in_title:
+            self.title = (self.title or "") + data.strip()
+            return
+        if self._skip_tag or self._math_depth:
+            return
+        self._emit(re.sub(r"\s+", " ", data))
+
+
+def _tidy(text: str) -> str:
+    lines = [re.sub(r"[ \t]{2,}", " ", line).strip() for line in text.splitlines()]
+    text = "\n".join(lines)
+    return re.sub(r"\n{3,}", "\n\n", text).strip()
+
+
+def _parse(html: str, main_content: bool) -> _MarkdownBuilder:
+    builder = _MarkdownBuilder(main_content=main_content)
+    try:
+        builder.feed(html)
+        builder.close()
+    except Exception as e:
+        # HTMLParser 对畸形文档较宽容，这里兜底保留已解析的部分
+        print(f"⚠️ [HTML] Parse error: {e}")
+    return builder
+
+
+def _with_title(body: str, title: Optional[str]) -> str:
+    if title and not body.startswith("# "):
+        return f"# {title}\n\n{body}"
+    return body
+
+
+def html_to_markdown(html: str) -> str:
+    """把 HTML 转为近似 Markdown 的纯文本"""
+    builder = _parse(html, main_content=False)
+    return _with_title(_tidy("".join(builder.parts)), builder.title)
+
+
+def extract_page(html: str, min_main_chars: int = 500) -> Dict:
+    """
+    正文提取
+
+    Returns:
+        {
+            "title": 页面标题,
+            "markdown": 正文 (找到足够长的正文容器时只取容器内容，否则取剔除样板后的全文),
+            "js_required": 页面是否看起来依赖 JS 渲染 (SPA 挂载点 / noscript 提示 / 脚本多而文字少)
+        }
+    """
+    builder = _parse(html, main_content=True)
+    main_text = _tidy("".join(builder.main_parts))
+    body = main_text if len(main_text) >= min_main_chars else _tidy("".join(builder.parts))
+
+    # 服务端渲染的页面同样可能带 noscript 提示，只有文字偏少时才认为依赖 JS
+    spa_markers = bool(_SPA_ROOT_RE.search(html) or _NOSCRIPT_JS_RE.search(html))
+    js_required = (spa_markers and len(body) < 2000) \
+        or (builder.scripts >= 5 and len(body) < 200 * builder.scripts ** 0.5)
+    return {
+        "title": builder.title,
+        "markdown": _with_title(body, builder.title),
+        "js_required": js_required,
+    }
@@ -0,0 +1,104 @@
+# app/modules/perception/ocr_cache.py
+"""
+OCR 结果缓存 (跨任务持久化)
+
+同一批扫描版 PDF (年报、标准文件等) 会在不同任务、不同主题中反复出现，
+每次都要把所有图片页按 2 倍分辨率重新渲染、重新 OCR。这里按页缓存识别结果 (文本行 + 置信度)：
+
+    - 主键：文档哈希 (PDF 字节的 sha256) + 页码。同一份文档再次出现时，扫描页既不渲染也不 OCR
+    - 辅助键：渲染图像哈希。文档被重新保存/加了封面导致文档哈希变化时，
+      只要页面渲染结果完全相同，仍可跳过 OCR (只需渲染)
+"""
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+from app.core.config import settings
+
+OcrLine = Tuple[str, float]
+
+_HASH_CHUNK = 1024 * 1024
+
+
+def document_hash(pdf_source: Union[bytes, str]) -> str:
+    """PDF 文档哈希：字节串直接计算，文件路径分块读取 (不整体载入内存)"""
+    digest = hashlib.sha256()
+    if isinstance(pdf_source, str):
+        with open(pdf_source, "rb") as f:
+            for block in iter(lambda: f.read(_HASH_CHUNK), b""):
+                digest.update(block)
+    else:
+        digest.update(pdf_source)
+    return digest.hexdigest()
+
+
+def image_hash(image) -> str:
+    """渲染图像哈希 (含尺寸，避免不同分辨率的同一页碰撞)"""
+    digest = hashlib.blake2b(digest_size=20)
+    digest.update(repr(image.shape).encode())
+    digest.update(memoryview(image).cast("B") if image.flags["C_CONTIGUOUS"] else image.tobytes())
+    return digest.hexdigest()
+
+
+class OcrCache:
+    def __init__(self, db_path: str):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL;")
+        self._conn.execute("PRAGMA synchronous=NORMAL;")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS ocr_pages (
+                doc_hash    TEXT NOT NULL,
+                page_index  INTEGER NOT NULL,
+                image_hash  TEXT,
+                lines       TEXT NOT NULL,
+                created_at  REAL NOT NULL,
+                PRIMARY KEY (doc_hash, page_index)
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_ocr_pages_image ON ocr_pages (image_hash)")
+        self._conn.commit()
+        self.stats: Dict[str, int] = {"doc_hits": 0, "image_hits": 0, "misses": 0, "stored": 0}
+
+    def get_pages(self, doc_hash: str, page_indices: Iterable[int]) -> Dict[int, List[OcrLine]]:
+        """按 文档哈希 + 页码 批量查询，返回 {页码: [(文本, 置信度), ...]}"""
+        page_indices = list(page_indices)
+        if not page_indices:
+            return {}
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT page_index, lines FROM ocr_pages WHERE doc_hash=? "
+                f"AND page_index IN ({','.join('?' * len(page_indices))})",
+                (doc_hash, *page_indices)
+            ).fetchall()
+        self.stats["doc_hits"] += len(rows)
+        return {index: [tuple(line) for line in json.loads(lines)] for index, lines in rows}
+
+    def get_by_image(self, image_digest: str) -> Optional[List[OcrLine]]:
+        """按渲染图像哈希查询 (文档哈希未命中时使用)"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT lines FROM ocr_pages WHERE image_hash=? LIMIT 1", (image_digest,)
+            ).fetchone()
+        if not row:
+            self.stats["misses"] += 1
+            return None
+        self.stats["image_hits"] += 1
+        return [tuple(line) for line in json.loads(row[0])]
+
+    def put(self, doc_hash: str, page_index: int, image_digest: Optional[str], lines: List[OcrLine]):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO ocr_pages (doc_hash, page_index, image_hash, lines, created_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (doc_hash, page_index, image_digest, json.dumps(lines, ensure_ascii=False), time.time())
+            )
+            self._conn.commit()
+        self.stats["stored"] += 1
+
+
+# 进程级单例
+ocr_cache = OcrCache(settings.OCR_CACHE_PATH)
@@ -0,0 +1,241 @@
+# app/modules/perception/ocr_service.py
+"""
+OCR 进程池服务 (PaddleOCR)
+
+原先 process_pdf_sync 在默认线程池里逐页调用同一个全局 PaddleOCR 实例：受 GIL 限制，
+且 PaddleOCR 本身不是线程安全的，整个进程同一时刻实际上只能识别约一页；
+asyncio.Semaphore(2) 也只约束单次 crawl_urls 调用内的 PDF 数。
+
+这里改为进程级共享的 OCR 服务：
+
+    - 固定数量的工作进程 (OCR_WORKERS)，每个进程启动时预加载一次模型
+    - 所有任务、所有 PDF 的待识别页面进入同一个进程池队列，按页扇出到各工作进程
+    - 每次提交 OCR_BATCH_PAGES 页 (减少进程间往返)，识别阶段按 OCR_REC_BATCH_NUM 批量推理
+    - 提交窗口有上限：调用方边渲染边提交，避免几百页的扫描件一次性渲染进内存
+    - 多页批次失败 (某张图像出错、工作进程崩溃) 时逐页重试一次，避免一页拖累整批
+    - 统计每个工作进程的识别页数、忙碌时长与 pages/sec
+
+OCR_WORKERS=0 时退化为进程内单实例 (加锁串行)，适合内存紧张的部署。
+"""
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import get_context
+from typing import Dict, Hashable, Iterable, Iterator, List, Optional, Tuple
+
+from app.core.config import settings
+
+# 尝试导入 PaddleOCR
+PADDLE_AVAILABLE = False
+try:
+    from paddleocr import PaddleOCR
+    PADDLE_AVAILABLE = True
+except ImportError:
+    print("⚠️ PaddleOCR not installed. Scanning features disabled.")
+
+# 一行识别结果：(文本, 置信度)
+OcrLine = Tuple[str, float]
+
+# ---------------------------------------------------------------- 工作进程侧
+
+# 每个进程 (含 OCR_WORKERS=0 时的主进程) 各自持有一个引擎
+_engine = None
+
+
+def _load_engine():
+    global _engine
+    if _engine is None:
+        print(f"👁️ [OCR] Loading PaddleOCR model in process {os.getpid()} (This may take time)...")
+        # use_angle_cls=True 自动纠正方向, lang="ch" 支持中英文
+        _engine = PaddleOCR(
+            use_angle_cls=True, lang="ch", show_log=False,
+            rec_batch_num=settings.OCR_REC_BATCH_NUM,
+        )
+    return _engine
+
+
+def _init_worker():
+    """进程池 initializer：工作进程启动时即加载模型，首个任务无需等待"""
+    _load_engine()
+
+
+def _ocr_batch(images: list) -> Tuple[int, List[List[OcrLine]], float]:
+    """识别一批页面图像，返回 (进程号, 每页的行列表, 耗时秒)"""
+    engine = _load_engine()
+    started = time.perf_counter()
+    pages = []
+    for image in images:
+        result = engine.ocr(image, cls=True)
+        # line 结构: [[box], (text, score)]
+        pages.append([(line[1][0], float(line[1][1])) for line in (result[0] if result and result[0] else [])])
+    return os.getpid(), pages, time.perf_counter() - started
+
+
+# ---------------------------------------------------------------- 主进程侧
+
+class _WorkerStats:
+    def __init__(self):
+        self.pages = 0
+        self.batches = 0
+        self.busy_sec = 0.0
+
+
+class OcrService:
+    def __init__(self, workers: int, batch_pages: int):
+        self.workers = max(0, workers)
+        self.batch_pages = max(1, batch_pages)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        # OCR_WORKERS=0 时进程内引擎不是线程安全的，串行调用
+        self._inline_lock = threading.Lock()
+        self._workers: Dict[int, _WorkerStats] = {}
+        self.stats = {"pages": 0, "batches": 0, "failed_batches": 0, "retried_pages": 0, "failed_pages": 0,
+                      "pool_restarts": 0}
+
+    @property
+    def available(self) -> bool:
+        return PADDLE_AVAILABLE
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                print(f"👁️ [OCR] Starting {self.workers} OCR worker processes")
+                # spawn：主进程已有事件循环与各类线程，fork 出的子进程状态不可靠
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=get_context("spawn"), initializer=_init_worker,
+                )
+            return self._executor
+
+    def _submit(self, images: list) -> Future:
+        if self.workers == 0:
+            future: Future = Future()
+            try:
+                with self._inline_lock:
+                    future.set_result(_ocr_batch(images))
+            except Exception as e:
+                future.set_exception(e)
+            return future
+        try:
+            return self._get_executor().submit(_ocr_batch, images)
+        except BrokenProcessPool:
+            # 工作进程异常退出 (如 OOM) 后进程池不可再用，重建一次
+            self._reset()
+            return self._get_executor().submit(_ocr_batch, images)
+
+    def _reset(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+            self.stats["pool_restarts"] += 1
+        if executor is not None:
+            print("💥 [OCR] Worker pool broken, restarting")
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _record(self, pid: int, pages: int, elapsed: float):
+        with self._lock:
+            worker = self._workers.setdefault(pid, _WorkerStats())
+            worker.pages += pages
+            worker.batches += 1
+            worker.busy_sec += elapsed
+            self.stats["pages"] += pages
+            self.stats["batches"] += 1
+
+    def run(
+        self,
+        images: Iterable[Tuple[Hashable, object]],
+        cancel_token=None,
+        budget=None,
+    ) -> Iterator[Tuple[Hashable, List[OcrLine]]]:
+        """
+        识别一组页面图像 (同步，供线程池中的 PDF 解析调用)
+
+        Args:
+            images: (页面标识, RGB ndarray) 的可迭代对象；按需拉取，调用方可以边渲染边提交
+            cancel_token: 任务取消后不再提交新批次
+            budget: 提交前检查 ocr_seconds 预算，完成后按工作进程实际耗时计入
+
+        Yields:
+            (页面标识, [(文本, 置信度), ...])，按完成顺序产出；
+            因取消、预算耗尽或识别失败 (逐页重试后仍失败) 而未产出的页面由调用方处理
+        """
+        source = iter(images)
+        max_inflight = max(1, self.workers) * 2
+        # 批次 -> [(页面标识, 图像)]；保留图像以便失败后逐页重试
+        inflight: Dict[Future, List[Tuple[Hashable, object]]] = {}
+        exhausted = False
+
+        def stopped() -> bool:
+            return bool((cancel_token and cancel_token.cancelled) or (budget and budget.exhausted("ocr_seconds")))
+
+        def fill():
+            nonlocal exhausted
+            while not exhausted and len(inflight) < max_inflight:
+                if stopped():
+                    exhausted = True
+                    return
+                batch = []
+                for key, image in source:
+                    batch.append((key, image))
+                    if len(batch) >= self.batch_pages:
+                        break
+                if not batch:
+                    exhausted = True
+                    return
+                inflight[self._submit([image for _, image in batch])] = batch
+
+        fill()
+        while inflight:
+            done, _ = wait(list(inflight), return_when=FIRST_COMPLETED)
+            for future in done:
+                batch = inflight.pop(future)
+                try:
+                    pid, pages, elapsed = future.result()
+                except Exception as e:
+                    self.stats["failed_batches"] += 1
+                    print(f"⚠️ [OCR] Batch of {len(batch)} pages failed: {e}")
+                    if isinstance(e, BrokenProcessPool) and self._executor is not None and self._executor._broken:
+                        self._reset()
+                    if len(batch) > 1 and not stopped():
+                        # 逐页重试：只有真正出错的那一页会再次失败
+                        self.stats["retried_pages"] += len(batch)
+                        for item in batch:
+                            inflight[self._submit([item[1]])] = [item]
+                    else:
+                        self.stats["failed_pages"] += len(batch)
+                    continue
+                self._record(pid, len(pages), elapsed)
+                if budget:
+                    budget.consume("ocr_seconds", elapsed)
+                yield from zip((key for key, _ in batch), pages)
+            fill()
+
+    def shutdown(self):
+        """关闭工作进程 (FastAPI lifespan 退出时调用)"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            workers = {
+                str(pid): {
+                    "pages": w.pages,
+                    "batches": w.batches,
+                    "busy_sec": round(w.busy_sec, 1),
+                    "pages_per_sec": round(w.pages / w.busy_sec, 2) if w.busy_sec else 0.0,
+                }
+                for pid, w in self._workers.items()
+            }
+        return {
+            "available": self.available,
+            "workers": self.workers,
+            "batch_pages": self.batch_pages,
+            **self.stats,
+            "per_worker": workers,
+        }
+
+
+# 进程级单例
+ocr_service = OcrService(settings.OCR_WORKERS, settings.OCR_BATCH_PAGES)
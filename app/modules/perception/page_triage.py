@@ -0,0 +1,160 @@
+# app/modules/perception/page_triage.py
+"""
+扫描页分诊与自适应渲染 (OCR 前置)
+
+原先每个文字层稀少的页面都按固定 2 倍分辨率整页渲染、整页 OCR，空白页、装饰页、
+纯插图页也不例外。这里先用 72 dpi 灰度预览做廉价分诊 (NumPy / OpenCV 向量化计算)：
+
+    1. 像素方差 + 墨迹占比：几乎没有墨迹的页面判为空白页，直接跳过
+    2. 连通域：在二值图上统计"字形大小"的连通域。字形很少且大片墨迹不属于字形
+       (照片、插图) 时判为纯图片页，跳过；字形少但没有大片图像的页面 (封面、章节标题、
+       单行数字) 仍按文本页识别，只渲染其文本区域
+    3. 字形高度：取字形连通域高度的高分位数估计大写字母/汉字高度 (中位数对拉丁文只是 x 高度)，
+       选择让其渲染到 ~OCR_TARGET_GLYPH_PX 像素高的缩放倍数 (大字号少渲染像素，小字号提高分辨率)
+    4. 文本区域：把字形连通域膨胀成文本块，只渲染并识别这些区域；区域覆盖大半页面时整页渲染
+
+分诊不确定时一律按整页 2 倍渲染处理，宁可多识别也不漏识别。
+"""
+from typing import Dict, List
+
+import cv2
+import fitz  # PyMuPDF
+import numpy as np
+
+from app.core.config import settings
+
+# 预览分辨率 (1.0 = 72 dpi，预览像素与页面坐标 (pt) 一一对应)
+_PREVIEW_ZOOM = 1.0
+# 空白页：灰度方差与墨迹占比阈值
+_BLANK_VARIANCE = 20.0
+_BLANK_INK_RATIO = 0.001
+# 字形连通域的尺寸范围 (预览像素) 与判定为文字页所需的最少数量
+_GLYPH_MIN_HEIGHT = 3
+_GLYPH_MAX_HEIGHT = 60
+_GLYPH_MAX_WIDTH = 200
+_GLYPH_MIN_AREA = 6
+# 字形少于该数量、且非字形墨迹占页面比例超过阈值时判为纯图片页
+_MIN_GLYPHS = 20
+_IMAGE_INK_RATIO = 0.05
+# 估计字高所用的分位数：高于 x 高度，接近大写字母 / 汉字的高度
+_GLYPH_HEIGHT_PERCENTILE = 90
+# 渲染缩放范围 (原先固定为 2)
+_MIN_ZOOM = 1.0
+_MAX_ZOOM = 3.0
+_DEFAULT_ZOOM = 2.0
+# 文本区域超过该数量或覆盖超过该比例时整页渲染 (避免碎片化)
+_MAX_REGIONS = 6
+_FULL_PAGE_COVERAGE = 0.6
+
+# 分诊统计：各类页面数，以及文本页实际渲染像素与整页 2 倍渲染像素 (跳过的页面不计入)
+triage_stats: Dict[str, float] = {
+    "blank": 0, "image": 0, "text": 0, "rendered_pixels": 0, "baseline_pixels": 0,
+}
+
+
+def triage_snapshot() -> Dict[str, float]:
+    """分诊统计 + 文本页的渲染像素比例 (相对原先的整页 2 倍渲染)"""
+    baseline = triage_stats["baseline_pixels"]
+    return {
+        **triage_stats,
+        "text_pixel_ratio": round(triage_stats["rendered_pixels"] / baseline, 3) if baseline else 0.0,
+    }
+
+
+def _preview(page) -> np.ndarray:
+    pix = page.get_pixmap(matrix=fitz.Matrix(_PREVIEW_ZOOM, _PREVIEW_ZOOM), colorspace=fitz.csGRAY, alpha=False)
+    return np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.h, pix.w)
+
+
+def _regions(glyph_mask: np.ndarray, glyph_height: float) -> List[tuple]:
+    """把字形膨胀成文本块，返回 (x0, y0, x1, y1) 预览像素坐标"""
+    kernel = cv2.getStructuringElement(
+        cv2.MORPH_RECT, (max(3, int(glyph_height * 2)), max(3, int(glyph_height * 2)))
+    )
+    blocks = cv2.dilate(glyph_mask, kernel)
+    count, _, stats, _ = cv2.connectedComponentsWithStats(blocks, connectivity=8)
+    pad = int(glyph_height)
+    h, w = glyph_mask.shape
+    boxes = []
+    for x, y, bw, bh, _ in stats[1:count]:
+        boxes.append((max(0, x - pad), max(0, y - pad), min(w, x + bw + pad), min(h, y + bh + pad)))
+    return sorted(boxes, key=lambda b: (b[1], b[0]))
+
+
+def triage_page(page) -> Dict:
+    """
+    分诊单个扫描页
+
+    Returns:
+        {
+            "kind": "blank" | "image" | "text",
+            "zoom": 渲染缩放倍数,
+            "clips": 需要渲染识别的页面区域 (fitz.Rect 列表，按阅读顺序)，
+            "glyphs": 字形连通域数量, "ink_ratio": 墨迹占比
+        }
+    """
+    result = _classify(page)
+    triage_stats[result["kind"]] += 1
+    return result
+
+
+def _classify(page) -> Dict:
+    full = {"kind": "text", "zoom": _DEFAULT_ZOOM, "clips": [page.rect], "glyphs": -1, "ink_ratio": -1.0}
+    if not settings.OCR_TRIAGE_ENABLED:
+        return full
+    try:
+        gray = _preview(page)
+    except Exception as e:
+        print(f"⚠️ [Triage] Preview failed: {e}")
+        return full
+
+    # 1. 空白页：整体几乎没有明暗变化
+    variance = float(gray.var())
+    _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+    ink_ratio = float(np.count_nonzero(binary)) / binary.size
+    if variance < _BLANK_VARIANCE or ink_ratio < _BLANK_INK_RATIO:
+        return {**full, "kind": "blank", "clips": [], "ink_ratio": ink_ratio, "glyphs": 0}
+
+    # 2. 字形连通域：尺寸落在字形范围内的连通域 (向量化筛选)
+    count, labels, stats, _ = cv2.connectedComponentsWithStats(binary, connectivity=8)
+    widths, heights, areas = stats[1:, cv2.CC_STAT_WIDTH], stats[1:, cv2.CC_STAT_HEIGHT], stats[1:, cv2.CC_STAT_AREA]
+    is_glyph = (
+        (heights >= _GLYPH_MIN_HEIGHT) & (heights <= _GLYPH_MAX_HEIGHT)
+        & (widths <= _GLYPH_MAX_WIDTH) & (areas >= _GLYPH_MIN_AREA)
+    )
+    glyphs = int(is_glyph.sum())
+    figure_ratio = float(areas[~is_glyph].sum()) / binary.size
+    if glyphs == 0 or (glyphs < _MIN_GLYPHS and figure_ratio > _IMAGE_INK_RATIO):
+        return {**full, "kind": "image", "clips": [], "ink_ratio": ink_ratio, "glyphs": glyphs}
+
+    # 3. 由字高 (大写字母 / 汉字高度) 选择渲染倍数
+    glyph_height = float(np.percentile(heights[is_glyph], _GLYPH_HEIGHT_PERCENTILE))
+    zoom = float(np.clip(settings.OCR_TARGET_GLYPH_PX / (glyph_height / _PREVIEW_ZOOM), _MIN_ZOOM, _MAX_ZOOM))
+
+    # 4. 文本区域：只保留字形连通域 (剔除插图、边框、噪点) 后膨胀成块
+    glyph_labels = np.flatnonzero(is_glyph) + 1
+    glyph_mask = np.isin(labels, glyph_labels).astype(np.uint8) * 255
+    boxes = _regions(glyph_mask, glyph_height)
+    covered = sum((x1 - x0) * (y1 - y0) for x0, y0, x1, y1 in boxes) / gray.size
+    if not boxes or len(boxes) > _MAX_REGIONS or covered > _FULL_PAGE_COVERAGE:
+        clips = [page.rect]
+    else:
+        scale = 1 / _PREVIEW_ZOOM
+        origin = page.rect.tl
+        clips = [
+            fitz.Rect(x0 * scale, y0 * scale, x1 * scale, y1 * scale) + (origin.x, origin.y, origin.x, origin.y)
+            for x0, y0, x1, y1 in boxes
+        ]
+    return {"kind": "text", "zoom": zoom, "clips": clips, "glyphs": glyphs, "ink_ratio": ink_ratio}
+
+
+def render_regions(page, triage: Dict) -> List[np.ndarray]:
+    """按分诊结果渲染文本区域 (RGB)，供 OCR 使用"""
+    matrix = fitz.Matrix(triage["zoom"], triage["zoom"])
+    images = []
+    for clip in triage["clips"]:
+        pix = page.get_pixmap(matrix=matrix, clip=clip, colorspace=fitz.csRGB, alpha=False)
+        images.append(np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.h, pix.w, 3))
+        triage_stats["rendered_pixels"] += pix.w * pix.h
+    triage_stats["baseline_pixels"] += int(page.rect.width * _DEFAULT_ZOOM) * int(page.rect.height * _DEFAULT_ZOOM)
+    return images
@@ -0,0 +1,281 @@
+# app/modules/perception/pdf_parallel.py
+"""
+大型 PDF 文字层并行提取
+
+几百页的文字版 PDF (年报、标准、综述) 原本在单个线程里逐页 page.get_text()，
+提取期间持有 GIL，整份文档只能串行处理。这里：
+
+    - 页数达到 PDF_PARALLEL_MIN_PAGES 时，按页段切分给多个工作进程，
+      每个进程从同一个本地文件独立打开文档 (不在进程间传递 PDF 字节)
+    - 结果按页码顺序流式产出：前面的页段完成即可交给调用方，无需等待整份文档
+    - 可选相关页筛选 (PDF_RELEVANT_PAGES_ONLY)：结合目录 (outline) 标题与研究关注点的关键词，
+      只保留开头几页、标题命中的章节以及正文命中关键词的页面。中文关注点按二字切分，
+      "研究"、"分析"这类词几乎每页都有：抽样估计各关键词在本文档中的页频 (即 BM25 IDF 中的 df)，
+      去掉泛用词与高频词；相邻二字 (如 "电池"/"池供") 同时命中只算一个词
+
+页数较少时仍在当前线程串行提取 (进程往返反而更慢)。工作进程异常退出 (如畸形 PDF 导致
+MuPDF 崩溃) 时重建进程池，当前文档余下的页面改为串行提取。
+
+进程池的启动成本：工作函数在只依赖 PyMuPDF 的 app.pdf_worker 中，以 `uvicorn main:app` 启动时
+工作进程只导入它。但以 `python main.py` 启动时 multiprocessing 会在每个工作进程里按路径重新执行
+主模块 (即导入整个应用，约数秒)，而 Python 3.11 的 forkserver 并不会真正预加载 "__main__"。
+这时让 forkserver 先导入一次应用模块，工作进程由其 fork 而来，重新执行主模块时导入全部命中缓存。
+另外进程池在后台线程中启动，就绪前到来的大文档照常串行提取，启动成本不落在任何文档的关键路径上。
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import get_all_start_methods, get_context
+from typing import Dict, Iterator, List, Optional, Sequence, Set, Tuple, Union
+
+from app.core.config import settings
+from app.pdf_worker import extract_range as _extract_range, hit_terms as _hit_terms
+
+# 相关页筛选时总是保留的开头页数 (封面、摘要、目录)
+_LEAD_PAGES = 3
+# 每个页段的页数范围
+_MIN_CHUNK = 16
+_MAX_CHUNK = 64
+# 估计关键词页频时抽样的页数；命中超过该比例抽样页的关键词区分不了页面，不参与筛选
+_TERM_SAMPLE_PAGES = 32
+_MAX_TERM_PAGE_RATIO = 0.5
+# 研究任务描述中常见、但不代表具体主题的词
+_GENERIC_TERMS = {
+    "研究", "分析", "报告", "情况", "问题", "影响", "相关", "进行", "发展", "主要", "目前", "以及",
+    "research", "analysis", "analyze", "report", "overview", "study", "impact", "trend", "trends",
+}
+
+pdf_text_stats: Dict[str, float] = {
+    "documents": 0, "parallel_documents": 0, "pages": 0, "skipped_pages": 0, "busy_sec": 0.0,
+    "pool_restarts": 0,
+}
+
+
+def select_terms(doc, terms: Sequence[str]) -> List[str]:
+    """去掉泛用词以及在本文档抽样页中过于常见的关键词"""
+    terms = [t for t in terms if t not in _GENERIC_TERMS]
+    total = len(doc)
+    if not terms or not total:
+        return terms
+    step = max(1, total // _TERM_SAMPLE_PAGES)
+    sample = range(0, total, step)
+    df = [0] * len(terms)
+    for i in sample:
+        for n in _hit_terms(doc[i].get_text(), terms):
+            df[n] += 1
+    return [t for t, count in zip(terms, df) if count <= len(sample) * _MAX_TERM_PAGE_RATIO]
+
+
+def distinct_hits(terms: Sequence[str], hits: Sequence[int]) -> int:
+    """
+    命中的关注词数
+
+    中文按二字切分时相邻二元组共享一个字 ("电池供应" -> 电池/池供/供应)，
+    与上一个计入的二元组重叠的命中不再计数，一个词组不会被算成多个词。
+    """
+    count, last = 0, None
+    for n in hits:
+        term = terms[n]
+        if (last is not None and n == last + 1 and not term.isascii()
+                and len(term) == 2 and terms[last][-1] == term[0]):
+            continue
+        count, last = count + 1, n
+    return count
+
+
+def outline_pages(doc, terms: Sequence[str]) -> Set[int]:
+    """目录标题命中关键词的章节所覆盖的页码 (0 起)"""
+    selected: Set[int] = set()
+    if not terms:
+        return selected
+    toc = doc.get_toc(simple=True)
+    total = len(doc)
+    for n, (level, title, page) in enumerate(toc):
+        if page < 1 or not _hit_terms(title, terms):
+            continue
+        # 章节范围：到下一个同级或更高级标题为止
+        end = total
+        for next_level, _, next_page in toc[n + 1:]:
+            if next_level <= level and next_page >= page:
+                end = next_page - 1
+                break
+        selected.update(range(page - 1, max(page, end)))
+    return selected
+
+
+def _preload_modules() -> List[str]:
+    """forkserver 服务进程预先导入的模块"""
+    modules = [_extract_range.__module__]
+    main = sys.modules["__main__"]
+    if getattr(main, "__spec__", None) is None and getattr(main, "__file__", None):
+        # 以脚本启动：工作进程会重新执行主模块，先导入它所依赖的应用模块
+        modules += sorted(name for name in sys.modules if name == "app" or name.startswith("app."))
+    return modules
+
+
+class ParallelPdfExtractor:
+    def __init__(self, workers: int, min_pages: int):
+        self.workers = max(0, workers)
+        self.min_pages = min_pages
+        self._executor: Optional[ProcessPoolExecutor] = None
+        # 后台启动进程池时提交的空任务：全部完成即表示工作进程已就绪
+        self._warming: Optional[List[Future]] = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                print(f"📑 [PDF] Starting {self.workers} text extraction processes")
+                # forkserver：服务进程预先导入一次，工作进程由其 fork 而来，不必各自重新导入
+                # (spawn 下每个进程都要数秒)；也不会继承主进程的线程与锁
+                if "forkserver" in get_all_start_methods():
+                    context = get_context("forkserver")
+                    context.set_forkserver_preload(_preload_modules())
+                else:
+                    context = get_context("spawn")
+                self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+            return self._executor
+
+    @property
+    def ready(self) -> bool:
+        """工作进程是否已启动完成"""
+        warming = self._warming
+        return bool(warming) and all(f.done() and not f.exception() for f in warming)
+
+    def warm_up(self):
+        """在后台线程中启动全部工作进程 (不阻塞调用方)；重复调用无副作用"""
+        with self._lock:
+            if self._warming is not None or self.workers == 0:
+                return
+            self._warming = []
+
+        def start():
+            try:
+                executor = self._get_executor()
+                # 每个空任务在没有空闲进程时触发启动一个新进程
+                self._warming = [executor.submit(_hit_terms, "", ()) for _ in range(self.workers)]
+            except Exception as e:
+                print(f"⚠️ [PDF] Failed to start text extraction processes: {e}")
+                self._warming = None
+
+        threading.Thread(target=start, name="pdf-pool-warmup", daemon=True).start()
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+            self._warming = None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _reset(self, broken: ProcessPoolExecutor):
+        """工作进程异常退出后进程池不可再用：丢弃，下次使用时重建"""
+        with self._lock:
+            if self._executor is not broken:
+                # 其他文档已经重建过
+                return
+            self._executor = None
+            self._warming = None
+            pdf_text_stats["pool_restarts"] += 1
+        print("💥 [PDF] Text extraction pool broken, restarting")
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    def iter_pages(
+        self,
+        doc,
+        pdf_source: Union[bytes, str],
+        terms: Sequence[str] = (),
+        cancel_token=None,
+        relevant_only: bool = False,
+    ) -> Iterator[Tuple[int, Optional[str]]]:
+        """
+        按页码顺序产出 (页码, 文字层)；被相关页筛选跳过的页面产出 (页码, None)
+
+        Args:
+            doc: 已打开的文档 (读取页数与目录；串行模式下直接提取)
+            pdf_source: 字节串或本地文件路径；并行模式下工作进程从该文件各自打开文档
+            terms: 研究关注点的关键词 (小写、按出现顺序)，用于相关页筛选
+            relevant_only: 是否只保留相关页 (仅对达到并行阈值的大文档生效)
+        """
+        total = len(doc)
+        large = total >= self.min_pages
+        if relevant_only and large and terms:
+            terms = select_terms(doc, terms)
+        filtering = relevant_only and large and bool(terms)
+        keep = set(range(min(_LEAD_PAGES, total))) | outline_pages(doc, terms) if filtering else None
+        pdf_text_stats["documents"] += 1
+        started = time.perf_counter()
+
+        if large and self.workers > 0 and not self.ready:
+            # 进程池尚未就绪：后台启动，本文档串行提取
+            self.warm_up()
+        if large and self.ready:
+            pdf_text_stats["parallel_documents"] += 1
+            pages = self._iter_parallel(doc, pdf_source, total, terms if filtering else (), cancel_token)
+        else:
+            pages = self._iter_serial(doc, terms if filtering else (), cancel_token)
+
+        try:
+            for i, (text, hits) in enumerate(pages):
+                pdf_text_stats["pages"] += 1
+                # 需命中至少两个不同的关注词 (只剩一个时命中即可)，避免单个词把整份文档都选进来
+                if keep is not None and i not in keep and distinct_hits(terms, hits) < min(2, len(terms)):
+                    pdf_text_stats["skipped_pages"] += 1
+                    yield i, None
+                else:
+                    yield i, text
+        finally:
+            pdf_text_stats["busy_sec"] += time.perf_counter() - started
+
+    def _iter_serial(self, doc, terms, cancel_token, start: int = 0) -> Iterator[Tuple[str, Tuple[int, ...]]]:
+        for i in range(start, len(doc)):
+            if cancel_token and cancel_token.cancelled:
+                return
+            text = doc[i].get_text()
+            yield text, _hit_terms(text, terms) if terms else ()
+
+    def _iter_parallel(self, doc, pdf_source, total, terms,
+                       cancel_token) -> Iterator[Tuple[str, Tuple[int, ...]]]:
+        # 工作进程需要从文件打开文档：内存中的小文件先写到临时文件
+        path, temp_path = pdf_source, None
+        if not isinstance(pdf_source, str):
+            with tempfile.NamedTemporaryFile(prefix="apex_pdf_", suffix=".pdf", delete=False) as f:
+                f.write(pdf_source)
+            path = temp_path = f.name
+
+        chunk = min(_MAX_CHUNK, max(_MIN_CHUNK, -(-total // (self.workers * 4))))
+        ranges = [(start, min(total, start + chunk)) for start in range(0, total, chunk)]
+        executor = self._get_executor()
+        # 提交窗口：已提交未取走的页段不超过 workers * 2，控制内存中的文本量
+        window = self.workers * 2
+        futures: List[Future] = []
+        try:
+            for n in range(len(ranges)):
+                try:
+                    while len(futures) < min(len(ranges), n + window):
+                        start, end = ranges[len(futures)]
+                        futures.append(executor.submit(_extract_range, path, start, end, list(terms)))
+                    if cancel_token and cancel_token.cancelled:
+                        return
+                    pages = futures[n].result()
+                except BrokenProcessPool:
+                    # 前 n 个页段已经产出：余下页面在当前线程串行提取
+                    self._reset(executor)
+                    yield from self._iter_serial(doc, terms, cancel_token, start=ranges[n][0])
+                    return
+                yield from pages
+                futures[n] = None
+        finally:
+            for future in futures:
+                if future is not None:
+                    future.cancel()
+            if temp_path:
+                # 未取消的页段可能仍在读取：Linux 下删除已打开的文件不影响读取
+                os.unlink(temp_path)
+
+
+# 进程级单例
+pdf_extractor = ParallelPdfExtractor(settings.PDF_TEXT_WORKERS, settings.PDF_PARALLEL_MIN_PAGES)
@@ -1,17 +1,21 @@
 # app/modules/perception/search.py
 import asyncio
-import random
 import re
-from typing import List, Dict
-import httpx
+import time
+from collections import defaultdict, deque
+from typing import List, Dict, Optional, Set
 from app.core.llm import simple_llm_call
 from app.core.utils import parse_json_safe
+from app.core.cancellation import raise_if_cancelled, run_cancellable
+from app.core.budget import get_budget
+from app.core.http import http_clients
 from app.modules.insight.prompts import prompts
-
-# 🟢 引入成熟的开源库
-import arxiv
-from github import Github, Auth
-import wikipedia
+from app.modules.perception.search_cache import search_cache
+from app.modules.perception.tavily_keys import tavily_keys
+from app.modules.perception import wiki_provider
+from app.modules.perception.github_provider import github_client
+from app.modules.perception.arxiv_provider import arxiv_client
+from app.modules.perception.url_canon import canonicalize_url
 
 from app.core.config import settings
 
@@ -42,212 +46,344 @@ def _fallback_query_translate(query: str) -> str:
         cleaned = " ".join(keywords[:5]) if keywords else query
     return cleaned
 
-# --- 1. arXiv 搜索 (基于 arxiv 库) ---
-def _sync_arxiv_search(query: str, limit: int) -> List[Dict]:
-    """[同步] arXiv 搜索逻辑"""
+# --- 0.5 平台并发控制 ---
+# 🟢 各平台独立的并发上限：多个研究流同时搜索时不会挤爆某个平台的限流，
+#    原生异步请求也不再占用线程池
+_provider_semaphores: Dict[str, asyncio.Semaphore] = {}
+
+def _provider_slot(provider: str) -> asyncio.Semaphore:
+    sem = _provider_semaphores.get(provider)
+    if sem is None:
+        sem = asyncio.Semaphore(settings.PROVIDER_MAX_CONCURRENCY.get(provider, 4))
+        _provider_semaphores[provider] = sem
+    return sem
+
+
+# --- 0.6 平台耗时与超时统计 ---
+class _ProviderStats:
+    """各平台回源耗时 (最近 200 次) 与软/硬超时次数"""
+
+    def __init__(self):
+        self.calls = 0
+        self.soft_timeouts = 0
+        self.hard_timeouts = 0
+        self.late_fills = 0
+        self.latencies = deque(maxlen=200)
+
+    def snapshot(self) -> dict:
+        ordered = sorted(self.latencies)
+        pct = lambda p: round(ordered[min(len(ordered) - 1, int(p * len(ordered)))], 2) if ordered else None
+        return {
+            "calls": self.calls,
+            "soft_timeouts": self.soft_timeouts,
+            "hard_timeouts": self.hard_timeouts,
+            "late_fills": self.late_fills,
+            "latency_p50": pct(0.5),
+            "latency_p95": pct(0.95),
+        }
+
+_provider_stats: Dict[str, _ProviderStats] = defaultdict(_ProviderStats)
+# 软超时后仍在后台运行的平台请求 (完成后写入缓存)
+_late_searches: Set[asyncio.Task] = set()
+
+def provider_stats() -> Dict[str, dict]:
+    return {provider: stats.snapshot() for provider, stats in _provider_stats.items()}
+
+
+# --- 1. arXiv 搜索 (共享客户端，跨任务限速；只返回元数据) ---
+async def _search_arxiv(query: str, limit: int = 3) -> List[Dict]:
+    if not settings.ENABLE_ARXIV: return []
     print(f"📚 [arXiv] Searching: {query}...")
     try:
-        # 构造搜索客户端
-        client = arxiv.Client()
-        search = arxiv.Search(
-            query=query,
-            max_results=limit,
-            sort_by=arxiv.SortCriterion.Relevance
-        )
-        
-        results = []
-        for r in client.results(search):
-            results.append({
-                "url": r.pdf_url, # 直接给 PDF 链接，配合我们的 PDF 解析器
-                "title": f"[arXiv] {r.title}",
-                "snippet": f"Published: {r.published.date()}\nAbstract: {r.summary[:500]}...",
-                "source": "arxiv"
-            })
-        return results
+        async with _provider_slot("arxiv"):
+            return await arxiv_client.search(query, limit)
     except Exception as e:
         print(f"⚠️ [arXiv] Error: {e}")
         return []
 
-async def _search_arxiv(query: str, limit: int = 3) -> List[Dict]:
-    """[异步包装] 放入线程池执行"""
-    if not settings.ENABLE_ARXIV: return []
-    return await asyncio.to_thread(_sync_arxiv_search, query, limit)
-
 
-# --- 2. GitHub 搜索 (基于 PyGithub 库) ---
-def _sync_github_search(query: str, limit: int) -> List[Dict]:
-    """[同步] GitHub 搜索逻辑"""
+# --- 2. GitHub 搜索 (REST API + ETag 条件请求) ---
+async def _search_github(query: str, limit: int = 3) -> List[Dict]:
+    if not settings.ENABLE_GITHUB: return []
     print(f"💻 [GitHub] Searching: {query}...")
     try:
-        # 鉴权 (强烈建议配置 Token，否则限制极严)
-        auth = Auth.Token(settings.GITHUB_TOKEN) if settings.GITHUB_TOKEN else None
-        g = Github(auth=auth)
-        
-        # 搜索仓库
-        repos = g.search_repositories(query=query, sort="stars", order="desc")
-        
-        results = []
-        # PyGithub 的分页是懒加载的，只取前 limit 个
-        for i, repo in enumerate(repos):
-            if i >= limit: break
-            
-            results.append({
-                "url": repo.html_url,
-                "title": f"[GitHub] {repo.full_name} ({repo.stargazers_count}⭐)",
-                "snippet": f"Language: {repo.language}\nDescription: {repo.description}\n(Readme will be crawled)",
-                "source": "github"
-            })
-        
-        g.close()
-        return results
+        async with _provider_slot("github"):
+            return await github_client.search_repositories(query, limit)
     except Exception as e:
         print(f"⚠️ [GitHub] Error: {e}")
         return []
 
-async def _search_github(query: str, limit: int = 3) -> List[Dict]:
-    """[异步包装] 放入线程池执行"""
-    if not settings.ENABLE_GITHUB: return []
-    return await asyncio.to_thread(_sync_github_search, query, limit)
-
 
-# --- 3. Wikipedia 搜索 (基于 wikipedia 库) ---
-def _sync_wiki_search(query: str, limit: int) -> List[Dict]:
-    """[同步] Wiki 搜索逻辑"""
+# --- 3. Wikipedia 搜索 (MediaWiki 批量查询，中英文并发) ---
+async def _search_wiki(query: str, limit: int = 2) -> List[Dict]:
+    if not settings.ENABLE_WIKI: return []
     print(f"📖 [Wiki] Searching: {query}...")
     try:
-        # 优先尝试中文，若无结果可考虑回退英文 (此处简化为中文)
-        wikipedia.set_lang("zh")
-        
-        # 1. 搜索词条标题
-        search_results = wikipedia.search(query, results=limit)
-        if not search_results:
-            # 回退到英文
-            wikipedia.set_lang("en")
-            search_results = wikipedia.search(query, results=limit)
-            
-        final_results = []
-        for title in search_results:
-            try:
-                # 2. 获取词条详情
-                # auto_suggest=False 防止自动纠错导致搜到不相关的
-                page = wikipedia.page(title, auto_suggest=False)
-                
-                final_results.append({
-                    "url": page.url,
-                    "title": f"[Wiki] {page.title}",
-                    "snippet": page.summary[:500] + "...",
-                    "source": "wiki"
-                })
-            except wikipedia.DisambiguationError as e:
-                # 歧义页面，取第一个选项重试
-                try:
-                    page = wikipedia.page(e.options[0], auto_suggest=False)
-                    final_results.append({
-                        "url": page.url,
-                        "title": f"[Wiki] {page.title}",
-                        "snippet": page.summary[:500] + "...",
-                        "source": "wiki"
-                    })
-                except: pass
-            except wikipedia.PageError:
-                pass # 页面不存在
-                
-        return final_results
+        async with _provider_slot("wiki"):
+            return await wiki_provider.search(query, limit)
     except Exception as e:
         print(f"⚠️ [Wiki] Error: {e}")
         return []
 
-async def _search_wiki(query: str, limit: int = 2) -> List[Dict]:
-    """[异步包装] 放入线程池执行"""
-    if not settings.ENABLE_WIKI: return []
-    return await asyncio.to_thread(_sync_wiki_search, query, limit)
 
+# --- 4. Web 搜索 (Tavily) - Key 池按健康度选择 ---
+TAVILY_SEARCH_URL = "https://api.tavily.com/search"
 
-# --- 4. Web 搜索 (Tavily) - 支持多 Key 轮询 ---
-async def _search_web_tavily(query: str, limit: int) -> List[Dict]:
-    from app.core.config import settings
-    # 随机选择一个 API Key，实现负载均衡
-    api_key = random.choice(settings.TAVILY_API_KEYS) if settings.TAVILY_API_KEYS else None
-    if not api_key: return []
-    
+def _retry_after(resp) -> Optional[float]:
     try:
-        async with httpx.AsyncClient() as client:
-            resp = await client.post(
-                "https://api.tavily.com/search",
-                json={"api_key": api_key, "query": query, "max_results": limit, "search_depth": "basic"},
-                timeout=15.0
-            )
-            resp.raise_for_status()
-            data = resp.json()
-            return [{
-                "url": r["url"], 
-                "title": r["title"], 
-                "snippet": r["content"], 
-                "source": "web"
-            } for r in data.get("results", [])]
-    except Exception as e:
-        print(f"⚠️ [Web] Error: {e}")
-        return []
+        return float(resp.headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+async def _search_web_tavily(query: str, limit: int) -> List[Dict]:
+    # 🟢 由 Key 池挑选最健康的 Key；被拒/限流/额度耗尽时换下一个 Key 重试
+    tried = set()
+    for _ in range(tavily_keys.size):
+        async with tavily_keys.lease(exclude=tried) as key:
+            if key is None:
+                break
+            tried.add(key.fingerprint)
+            try:
+                # 🟢 复用共享连接池，避免每次请求重新握手
+                client = http_clients.get("api", TAVILY_SEARCH_URL)
+                resp = await client.post(
+                    TAVILY_SEARCH_URL,
+                    json={"api_key": key.api_key, "query": query, "max_results": limit, "search_depth": "basic"},
+                )
+            except Exception as e:
+                tavily_keys.report(key, None, error=repr(e))
+                print(f"⚠️ [Web] Error: {e}")
+                return []
+
+            tavily_keys.report(key, resp.status_code, retry_after=_retry_after(resp))
+            if resp.status_code in (401, 403, 429, 432, 433):
+                continue
+            try:
+                resp.raise_for_status()
+                data = resp.json()
+                return [{
+                    "url": r["url"], 
+                    "title": r["title"], 
+                    "snippet": r["content"], 
+                    "source": "web"
+                } for r in data.get("results", [])]
+            except Exception as e:
+                print(f"⚠️ [Web] Error: {e}")
+                return []
+
+    if settings.TAVILY_API_KEYS:
+        print("⚠️ [Web] No healthy Tavily key available (revoked, rate limited or out of quota)")
+    return []
 
 
 # --- 5. 聚合入口 ---
-async def search_generic(query: str) -> List[Dict[str, str]]:
+def _resolve_queries(query: str, optimized_queries: Optional[Dict]) -> Dict[str, str]:
+    """根据 LLM 重写结果生成各平台查询词；重写失败时使用规则引擎兜底"""
+    if not isinstance(optimized_queries, dict):
+        print("🔄 [Search] LLM optimization failed, using rule-based fallback...")
+        translated_query = _fallback_query_translate(query)
+        return {
+            "arxiv": translated_query,
+            "github": translated_query,
+            "wiki": translated_query,  # Wiki 也尝试翻译
+            "web": query,  # Web 搜索保留中文
+        }
+    return {p: optimized_queries.get(p) or query for p in ("arxiv", "github", "wiki", "web")}
+
+
+def _track_late(provider: str, fetch: asyncio.Future):
+    """跟踪软超时后仍在进行的请求，统计其最终结果 (写入缓存由 search_cache.fetch 完成)"""
+    stats = _provider_stats[provider]
+
+    def done(f: asyncio.Future):
+        _late_searches.discard(f)
+        if f.cancelled():
+            return
+        if isinstance(f.exception(), asyncio.TimeoutError):
+            stats.hard_timeouts += 1
+            print(f"⏱️ [Search] {provider} hit its hard deadline, request abandoned")
+        elif f.exception() is None and f.result():
+            stats.late_fills += 1
+
+    _late_searches.add(fetch)
+    fetch.add_done_callback(done)
+
+
+async def _dispatch_providers(queries: Dict[str, str]) -> List[Dict[str, str]]:
+    """并发查询全部平台 (每个平台的结果按 平台+查询词+条数 缓存)，合并并按规范 URL 去重"""
+    print(f"🚀 [Dispatching] \n   - ArXiv: {queries['arxiv']}\n   - GitHub: {queries['github']}"
+          f"\n   - Wiki: {queries['wiki']}\n   - Web: {queries['web']}")
+
+    async def cached(provider: str, search_fn, limit: int):
+        q = queries[provider]
+        stats = _provider_stats[provider]
+
+        async def timed_loader():
+            started = time.monotonic()
+            try:
+                return await search_fn(q, limit)
+            finally:
+                stats.latencies.append(time.monotonic() - started)
+
+        stats.calls += 1
+        # 🟢 硬截止：超过后取消请求；软截止：不再等待，先返回已到达的平台结果，
+        #    请求继续在后台运行，到达后写入缓存供后续调用命中
+        fetch = asyncio.ensure_future(asyncio.wait_for(
+            search_cache.fetch(provider, q, limit, timed_loader),
+            settings.PROVIDER_HARD_DEADLINE_SEC.get(provider, 30),
+        ))
+        try:
+            results = await asyncio.wait_for(
+                asyncio.shield(fetch), settings.PROVIDER_SOFT_DEADLINE_SEC.get(provider, 10)
+            )
+        except asyncio.TimeoutError:
+            stats.soft_timeouts += 1
+            print(f"⏱️ [Search] {provider} missed its soft deadline, continuing without it")
+            _track_late(provider, fetch)
+            return []
+        except asyncio.CancelledError:
+            fetch.cancel()
+            raise
+        # 记录该平台实际使用的查询词 (重排序时作为补充查询词，不写入缓存)
+        return [{**r, "query": q} for r in results]
+
+    tasks = [
+        # 传入各自优化后的关键词
+        cached("arxiv", _search_arxiv, settings.Result_Count_Arxiv),
+        cached("github", _search_github, settings.Result_Count_Github),
+        cached("wiki", _search_wiki, settings.Result_Count_Wiki),
+        # Web 搜索通常最强，使用优化后的 Web 关键词
+        cached("web", _search_web_tavily, settings.Result_Count_Web)
+    ]
+    results_list = await asyncio.gather(*tasks)
+
+    all_results = []
+    seen_urls = set()
+    for res_group in results_list:
+        for r in res_group:
+            # 🟢 按规范 URL 去重 (忽略追踪参数、http/https、arXiv 版本号等差异)
+            key = canonicalize_url(r['url'])
+            if key not in seen_urls:
+                seen_urls.add(key)
+                all_results.append(r)
+    return all_results
+
+
+async def search_generic(query: str, task_id: str = None, priority: str = "interactive") -> List[Dict[str, str]]:
     """
     [混合搜索 V2] 智能查询重写 + 并行搜索
+
+    Args:
+        task_id: 所属研究任务，任务取消时立即中断查询重写和各平台请求；
+                 每次调用扣减 1 次搜索预算，耗尽时直接返回空结果
+        priority: 查询重写 LLM 调用的调度优先级 (断言核查等批量场景传 "batch")
     """
+    raise_if_cancelled(task_id)
+    budget = get_budget(task_id)
+    if budget and not budget.acquire("search_calls"):
+        print(f"💸 [Hybrid Search] Search budget exhausted, skipping: {query}")
+        return []
     print(f"🤔 [Hybrid Search] Optimizing query: {query}...")
 
     # --- A. 调用 LLM 进行查询重写 (Query Rewriting) ---
     # 使用 MODEL_CHAT (快速模型) 即可，不需要推理模型
-    try:
+    # 🟢 重写结果同样走缓存：重复的任务描述 / 断言无需再调用 LLM
+    async def rewrite():
         rewrite_prompt = prompts.search_query_optimization(query)
         # 这里建议用 MODEL_FAST 或 MODEL_CHAT，追求速度
-        resp = await simple_llm_call(rewrite_prompt, model=settings.MODEL_CHAT)
-        optimized_queries = parse_json_safe(resp)
+        resp = await simple_llm_call(rewrite_prompt, model=settings.MODEL_CHAT, task_id=task_id, priority=priority)
+        parsed = parse_json_safe(resp)
+        return parsed if isinstance(parsed, dict) else None
+
+    try:
+        optimized_queries = await search_cache.fetch("rewrite", query, 0, rewrite)
     except Exception as e:
         print(f"⚠️ Query optimization failed: {e}, falling back to raw query.")
         optimized_queries = None
 
     # --- B. 准备各平台的查询词 ---
-    # 如果重写失败，使用规则引擎兜底
-    if optimized_queries is None:
-        print("🔄 [Search] LLM optimization failed, using rule-based fallback...")
-        translated_query = _fallback_query_translate(query)
-        q_arxiv = translated_query
-        q_github = translated_query
-        q_wiki = _fallback_query_translate(query)  # Wiki 也尝试翻译
-        q_web = query  # Web 搜索保留中文
-    else:
-        q_arxiv = optimized_queries.get("arxiv", query)
-        q_github = optimized_queries.get("github", query)
-        q_wiki = optimized_queries.get("wiki", query)
-        q_web = optimized_queries.get("web", query)
-
-    print(f"🚀 [Dispatching] \n   - ArXiv: {q_arxiv}\n   - GitHub: {q_github}\n   - Wiki: {q_wiki}\n   - Web: {q_web}")
+    queries = _resolve_queries(query, optimized_queries)
 
     # --- C. 并发执行 ---
-    tasks = [
-        # 传入各自优化后的关键词
-        _search_arxiv(q_arxiv, limit=settings.Result_Count_Arxiv),
-        _search_github(q_github, limit=settings.Result_Count_Github),
-        _search_wiki(q_wiki, limit=settings.Result_Count_Wiki),
-        # Web 搜索通常最强，使用优化后的 Web 关键词
-        _search_web_tavily(q_web, limit=settings.Result_Count_Web)
-    ]
-    
-    results_list = await asyncio.gather(*tasks)
-    
-    # ... (后续的展平、去重逻辑保持不变) ...
-    all_results = []
-    seen_urls = set()
-    for res_group in results_list:
-        for r in res_group:
-            if r['url'] not in seen_urls:
-                seen_urls.add(r['url'])
-                all_results.append(r)
+    all_results = await run_cancellable(_dispatch_providers(queries), task_id)
             
     print(f"✅ [Hybrid Search] Found {len(all_results)} total results")
     return all_results
 
+
+async def search_generic_batch(
+    queries: List[str],
+    task_id: str = None,
+    priority: str = "interactive"
+) -> List[List[Dict[str, str]]]:
+    """
+    🟢 [批量混合搜索] 一次 LLM 调用完成所有就绪任务的查询重写，随后所有平台请求全部并发
+
+    一波 N 个就绪任务原本要串行付出 N 次重写往返；这里缓存未命中的任务描述
+    合并成一次结构化调用，失败或遗漏的条目回退到规则引擎。
+
+    Returns:
+        与 queries 一一对应的结果列表 (单个查询失败或预算不足时为空列表)
+    """
+    if not queries:
+        return []
+    raise_if_cancelled(task_id)
+
+    # 每个查询计 1 次搜索预算，超出预算的查询直接返回空结果
+    budget = get_budget(task_id)
+    granted = [not budget or bool(budget.acquire("search_calls")) for _ in queries]
+    if not all(granted):
+        print(f"💸 [Batch Search] Search budget covers {sum(granted)}/{len(queries)} queries")
+
+    # --- A. 批量查询重写 (缓存命中的跳过) ---
+    rewritten: Dict[int, Optional[Dict]] = {}
+    misses = []
+    for i, query in enumerate(queries):
+        if not granted[i]:
+            continue
+        cached = search_cache.get("rewrite", query, 0) if settings.SEARCH_CACHE_ENABLED else None
+        if cached and cached[1] < settings.SEARCH_CACHE_TTL_SEC.get("rewrite", 86400):
+            rewritten[i] = cached[0]
+        else:
+            misses.append(i)
+
+    if misses:
+        print(f"🤔 [Batch Search] Rewriting {len(misses)} queries in one call "
+              f"({len(rewritten)} served from cache)...")
+        prompt = prompts.search_query_batch_optimization([queries[i] for i in misses])
+        resp = await simple_llm_call(prompt, model=settings.MODEL_CHAT, task_id=task_id, priority=priority)
+        parsed = parse_json_safe(resp)
+        items = parsed if isinstance(parsed, list) else []
+        for item in items:
+            if not isinstance(item, dict):
+                continue
+            try:
+                pos = int(item.get("id"))
+            except (TypeError, ValueError):
+                continue
+            # LLM 给出的编号不可信：越界 (含负数) 或重复的条目一律忽略，以第一次出现为准
+            if not 0 <= pos < len(misses) or misses[pos] in rewritten:
+                continue
+            idx = misses[pos]
+            rewritten[idx] = item
+            search_cache.set("rewrite", queries[idx], 0, {k: v for k, v in item.items() if k != "id"})
+
+    # --- B. 所有查询的所有平台请求并发执行 ---
+    async def run_one(i: int, query: str) -> List[Dict[str, str]]:
+        if not granted[i]:
+            return []
+        try:
+            return await _dispatch_providers(_resolve_queries(query, rewritten.get(i)))
+        except Exception as e:
+            print(f"⚠️ [Batch Search] Failed for '{query}': {e}")
+            return []
+
+    results = await run_cancellable(
+        asyncio.gather(*[run_one(i, q) for i, q in enumerate(queries)]),
+        task_id
+    )
+    print(f"✅ [Batch Search] {len(queries)} queries -> {sum(len(r) for r in results)} total results")
+    return results
+
 # 兼容导出
-search_tool = search_generic
\ No newline at end of file
+search_tool = search_generic
@@ -0,0 +1,130 @@
+# app/modules/perception/search_cache.py
+"""
+跨任务共享的搜索结果缓存 (SQLite)
+
+search_generic 每次都会重新请求 arXiv / GitHub / Wikipedia / Tavily，
+断言核查阶段的 `verify {claim}` 搜索也是如此。本模块按
+(平台, 规范化查询词, 条数) 缓存结果，并同样缓存 LLM 查询重写的结果：
+
+    - 新鲜期 (TTL) 内：直接命中，不发任何请求
+    - 过期但仍在 stale 窗口内：先返回旧结果，同时在后台刷新 (stale-while-revalidate)
+    - 超出 stale 窗口：同步回源
+
+空结果不缓存 (各平台出错时也返回空列表，缓存它会放大故障)。
+"""
+import asyncio
+import json
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from typing import Any, Awaitable, Callable, Dict, Optional, Set, Tuple
+
+from app.core.config import settings
+
+
+def normalize_query(query: str) -> str:
+    """全角转半角、小写、合并空白，让语义相同的查询命中同一条缓存"""
+    query = unicodedata.normalize("NFKC", query or "")
+    return re.sub(r"\s+", " ", query).strip().lower()
+
+
+class SearchCache:
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL;")
+        self._conn.execute("PRAGMA synchronous=NORMAL;")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS search_cache (
+                provider   TEXT NOT NULL,
+                query      TEXT NOT NULL,
+                lim        INTEGER NOT NULL,
+                payload    TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                PRIMARY KEY (provider, query, lim)
+            )
+        """)
+        self._conn.commit()
+        # 正在后台刷新的 key，避免同一条目被重复刷新
+        self._refreshing: Set[Tuple[str, str, int]] = set()
+        self._background: Set[asyncio.Task] = set()
+        self.stats: Dict[str, int] = {"hit": 0, "stale": 0, "miss": 0}
+
+    def get(self, provider: str, query: str, limit: int) -> Optional[Tuple[Any, float]]:
+        """返回 (缓存值, 已缓存秒数)，未命中返回 None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT payload, created_at FROM search_cache WHERE provider=? AND query=? AND lim=?",
+                (provider, normalize_query(query), limit)
+            ).fetchone()
+        if not row:
+            return None
+        return json.loads(row[0]), time.time() - row[1]
+
+    def set(self, provider: str, query: str, limit: int, value: Any):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO search_cache (provider, query, lim, payload, created_at) VALUES (?, ?, ?, ?, ?)",
+                (provider, normalize_query(query), limit, json.dumps(value, ensure_ascii=False), time.time())
+            )
+            self._conn.commit()
+
+    async def fetch(
+        self,
+        provider: str,
+        query: str,
+        limit: int,
+        loader: Callable[[], Awaitable[Any]],
+    ) -> Any:
+        """
+        带缓存的取数入口：loader 为回源函数 (返回空值时不写缓存)
+        """
+        if not settings.SEARCH_CACHE_ENABLED:
+            return await loader()
+
+        ttl = settings.SEARCH_CACHE_TTL_SEC.get(provider, 86400)
+        cached = self.get(provider, query, limit)
+        if cached:
+            value, age = cached
+            if age < ttl:
+                self.stats["hit"] += 1
+                print(f"🗃️ [SearchCache] Hit {provider}: {query[:60]}")
+                return value
+            if age < ttl + settings.SEARCH_CACHE_STALE_SEC:
+                self.stats["stale"] += 1
+                print(f"🗃️ [SearchCache] Stale {provider}, revalidating in background: {query[:60]}")
+                self._refresh_in_background(provider, query, limit, loader)
+                return value
+
+        self.stats["miss"] += 1
+        value = await loader()
+        if value:
+            self.set(provider, query, limit, value)
+        return value
+
+    def _refresh_in_background(self, provider: str, query: str, limit: int, loader):
+        key = (provider, normalize_query(query), limit)
+        if key in self._refreshing:
+            return
+        self._refreshing.add(key)
+
+        async def refresh():
+            try:
+                value = await loader()
+                if value:
+                    self.set(provider, query, limit, value)
+            except (Exception, asyncio.CancelledError) as e:
+                print(f"⚠️ [SearchCache] Background refresh failed for {provider}: {e!r}")
+            finally:
+                self._refreshing.discard(key)
+
+        task = asyncio.create_task(refresh())
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+
+# 进程级单例
+search_cache = SearchCache(settings.SEARCH_CACHE_PATH)
@@ -0,0 +1,281 @@
+# app/modules/perception/tavily_keys.py
+"""
+Tavily API Key 池 (配额跟踪 + 健康度选择)
+
+原先每次搜索 random.choice 一个 Key，已被吊销 (401) 或额度用尽 (429/432) 的 Key
+会被反复选中，而失败又被静默吞成空结果。本模块为每个 Key 维护：
+
+    - 本月已用额度 (按 credit 计，跨月自动清零)
+    - 并发中的请求数 (每个 Key 独立的并发上限，总吞吐随 Key 数线性增长)
+    - 冷却窗口 (429 限流后指数退避，优先遵循 Retry-After)
+    - 吊销状态 (401/403 后长时间冷却 TAVILY_KEY_REVOKED_RETRY_SEC，到期后再试探一次：
+      成功即恢复，仍被拒绝则继续冷却；偶发的 403 不会让付费 Key 永久停用)
+
+选择策略：在可用 Key 中挑 (并发数, 已用额度比例, 近期失败率) 最小者。
+计数持久化到 JSON 文件 (只存 Key 的哈希指纹，不落明文)，重启后继续生效。
+"""
+import asyncio
+import hashlib
+import json
+import os
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from app.core.config import settings
+
+# 连续失败 (超时/5xx) 达到该次数后短暂冷却
+_FAILURE_COOLDOWN_AFTER = 3
+# 冷却时间上限 (秒)
+_MAX_COOLDOWN_SEC = 3600
+# 非关键计数的落盘最小间隔 (秒)；状态变化 (吊销/冷却/额度耗尽) 立即落盘
+_SAVE_INTERVAL_SEC = 10
+
+
+def key_fingerprint(api_key: str) -> str:
+    return hashlib.sha256(api_key.encode()).hexdigest()[:16]
+
+
+def _current_month() -> str:
+    return datetime.now(timezone.utc).strftime("%Y-%m")
+
+
+class _KeyState:
+    def __init__(self, api_key: str, saved: dict = None):
+        saved = saved or {}
+        self.api_key = api_key
+        self.fingerprint = key_fingerprint(api_key)
+        self.month: str = saved.get("month", _current_month())
+        self.used: float = saved.get("used", 0)
+        self.requests: int = saved.get("requests", 0)
+        self.failures: int = saved.get("failures", 0)
+        self.rate_limited: int = saved.get("rate_limited", 0)
+        self.revoked: bool = saved.get("revoked", False)
+        self.quota_exhausted: bool = saved.get("quota_exhausted", False)
+        # 冷却截止时间使用墙钟时间，才能跨重启保留
+        self.cooldown_until: float = saved.get("cooldown_until", 0.0)
+        self.backoff_sec: float = saved.get("backoff_sec", 0.0)
+        self.last_error: Optional[str] = saved.get("last_error")
+        self.consecutive_failures = 0
+        self.inflight = 0
+        self._roll_month()
+
+    def _roll_month(self):
+        month = _current_month()
+        if self.month != month:
+            self.month = month
+            self.used = 0
+            self.quota_exhausted = False
+
+    def available(self, quota: float) -> bool:
+        self._roll_month()
+        # 吊销的 Key 不在这里直接排除：冷却到期后允许一次试探请求
+        if self.quota_exhausted:
+            return False
+        if quota and self.used >= quota:
+            return False
+        return time.time() >= self.cooldown_until
+
+    def score(self, quota: float) -> tuple:
+        usage_ratio = self.used / quota if quota else 0.0
+        failure_ratio = (self.failures + self.rate_limited) / max(self.requests, 1)
+        return (self.inflight, round(usage_ratio, 2), failure_ratio)
+
+    def to_dict(self) -> dict:
+        return {
+            "month": self.month,
+            "used": self.used,
+            "requests": self.requests,
+            "failures": self.failures,
+            "rate_limited": self.rate_limited,
+            "revoked": self.revoked,
+            "quota_exhausted": self.quota_exhausted,
+            "cooldown_until": self.cooldown_until,
+            "backoff_sec": self.backoff_sec,
+            "last_error": self.last_error,
+        }
+
+
+class TavilyKeyPool:
+    def __init__(self, api_keys: List[str], state_path: str,
+                 monthly_quota: float, per_key_concurrency: int, cooldown_sec: float,
+                 revoked_retry_sec: float):
+        self.state_path = state_path
+        self.monthly_quota = monthly_quota
+        self.per_key_concurrency = max(1, per_key_concurrency)
+        self.cooldown_sec = cooldown_sec
+        self.revoked_retry_sec = revoked_retry_sec
+        saved = self._load()
+        self._keys: List[_KeyState] = [
+            _KeyState(k, saved.get(key_fingerprint(k))) for k in dict.fromkeys(api_keys)
+        ]
+        self._cond: Optional[asyncio.Condition] = None
+        self._last_save = 0.0
+
+    # --- 持久化 ---
+    def _load(self) -> Dict[str, dict]:
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                return json.load(f).get("keys", {})
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            print(f"⚠️ [TavilyKeys] Failed to load key state, starting fresh: {e}")
+            return {}
+
+    def _save(self, force: bool = False):
+        now = time.time()
+        if not force and now - self._last_save < _SAVE_INTERVAL_SEC:
+            return
+        self._last_save = now
+        data = {"keys": {k.fingerprint: k.to_dict() for k in self._keys}}
+        tmp_path = f"{self.state_path}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.state_path)
+        except Exception as e:
+            print(f"⚠️ [TavilyKeys] Failed to persist key state: {e}")
+
+    # --- 选择 ---
+    @property
+    def size(self) -> int:
+        return len(self._keys)
+
+    def _condition(self) -> asyncio.Condition:
+        # 延迟创建，绑定到实际运行的事件循环
+        if self._cond is None:
+            self._cond = asyncio.Condition()
+        return self._cond
+
+    def _pick(self, exclude: set) -> Optional[_KeyState]:
+        candidates = [
+            k for k in self._keys
+            if k.fingerprint not in exclude
+            and k.available(self.monthly_quota)
+            and k.inflight < self.per_key_concurrency
+        ]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda k: k.score(self.monthly_quota))
+
+    def _has_capacity(self, exclude: set) -> bool:
+        """是否存在仅因并发已满而暂不可用的 Key (值得等待)"""
+        return any(
+            k.fingerprint not in exclude and k.available(self.monthly_quota)
+            for k in self._keys
+        )
+
+    @asynccontextmanager
+    async def lease(self, exclude: set = None):
+        """
+        借出一个最健康的 Key；所有可用 Key 并发已满时排队等待，
+        没有任何可用 Key (吊销/冷却/额度耗尽) 时返回 None。
+        """
+        exclude = exclude or set()
+        cond = self._condition()
+        async with cond:
+            key = self._pick(exclude)
+            while key is None and self._has_capacity(exclude):
+                await cond.wait()
+                key = self._pick(exclude)
+            if key is not None:
+                key.inflight += 1
+        try:
+            yield key
+        finally:
+            if key is not None:
+                async with cond:
+                    key.inflight -= 1
+                    cond.notify_all()
+
+    # --- 结果回报 ---
+    def report(self, key: _KeyState, status: Optional[int], cost: float = 1,
+               retry_after: Optional[float] = None, error: str = None):
+        """
+        根据响应状态更新 Key 健康度
+
+        Args:
+            status: HTTP 状态码；网络错误/超时传 None
+            cost: 本次请求消耗的 credit (basic 搜索为 1)
+        """
+        key.requests += 1
+        changed = False
+
+        if status is not None and status < 400:
+            key.used += cost
+            key.consecutive_failures = 0
+            key.backoff_sec = 0.0
+            if key.revoked:
+                # 试探请求成功：此前的 401/403 只是偶发
+                key.revoked, changed = False, True
+                print(f"✅ [TavilyKeys] Key {key.fingerprint[:8]} accepted again, re-enabled")
+            if self.monthly_quota and key.used >= self.monthly_quota:
+                key.quota_exhausted = changed = True
+                print(f"💳 [TavilyKeys] Key {key.fingerprint[:8]} reached monthly quota")
+        elif status in (401, 403):
+            key.revoked = changed = True
+            key.cooldown_until = time.time() + self.revoked_retry_sec
+            key.last_error = error or f"HTTP {status}"
+            print(f"🚫 [TavilyKeys] Key {key.fingerprint[:8]} rejected ({status}), "
+                  f"disabled for {self.revoked_retry_sec:.0f}s")
+        elif status == 429:
+            key.rate_limited += 1
+            key.backoff_sec = min(max(key.backoff_sec * 2, self.cooldown_sec), _MAX_COOLDOWN_SEC)
+            wait = retry_after if retry_after is not None else key.backoff_sec
+            key.cooldown_until = time.time() + wait
+            key.last_error = error or "HTTP 429"
+            changed = True
+            print(f"⏸️ [TavilyKeys] Key {key.fingerprint[:8]} rate limited, cooling down {wait:.0f}s")
+        elif status in (432, 433):
+            # Tavily：套餐/按量额度已用尽
+            key.quota_exhausted = changed = True
+            key.last_error = error or f"HTTP {status}"
+            print(f"💳 [TavilyKeys] Key {key.fingerprint[:8]} out of credits ({status})")
+        else:
+            key.failures += 1
+            key.consecutive_failures += 1
+            key.last_error = error or (f"HTTP {status}" if status else "network error")
+            if key.consecutive_failures >= _FAILURE_COOLDOWN_AFTER:
+                key.cooldown_until = time.time() + self.cooldown_sec
+                key.consecutive_failures = 0
+                changed = True
+
+        self._save(force=changed)
+
+    def stats(self) -> dict:
+        now = time.time()
+        return {
+            "keys": [
+                {
+                    "fingerprint": k.fingerprint[:8],
+                    "available": k.available(self.monthly_quota),
+                    "used": k.used,
+                    "quota": self.monthly_quota or None,
+                    "inflight": k.inflight,
+                    "requests": k.requests,
+                    "failures": k.failures,
+                    "rate_limited": k.rate_limited,
+                    "revoked": k.revoked,
+                    "quota_exhausted": k.quota_exhausted,
+                    "cooldown_sec": max(0, round(k.cooldown_until - now)),
+                    "last_error": k.last_error,
+                }
+                for k in self._keys
+            ],
+        }
+
+    def flush(self):
+        self._save(force=True)
+
+
+# 进程级单例
+tavily_keys = TavilyKeyPool(
+    settings.TAVILY_API_KEYS,
+    state_path=settings.TAVILY_KEY_STATE_PATH,
+    monthly_quota=settings.TAVILY_MONTHLY_QUOTA,
+    per_key_concurrency=settings.TAVILY_PER_KEY_CONCURRENCY,
+    cooldown_sec=settings.TAVILY_KEY_COOLDOWN_SEC,
+    revoked_retry_sec=settings.TAVILY_KEY_REVOKED_RETRY_SEC,
+)
@@ -0,0 +1,67 @@
+# app/modules/perception/url_canon.py
+"""
+URL 规范化
+
+同一份资料会以多种 URL 形式出现：arxiv.org/abs/X、arxiv.org/pdf/Xv2、带 utm_* 追踪参数、
+http/https、www 前缀、移动版域名、结尾斜杠……按原始字符串去重会把它们当成不同资源，
+重复下载与渲染。canonicalize_url 把这些变体归一为同一个键，仅用于去重与账本查询，
+实际抓取仍使用原始 URL。
+"""
+import re
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+# 不影响页面内容的追踪参数。只收录专用于追踪的键名：ref / source / from 这类通用名
+# 可能承载内容 (如 GitHub 的 ?ref=<分支>)，去掉会把不同资源合并成同一条账本记录
+_TRACKING_PARAMS = {
+    "gclid", "fbclid", "msclkid", "dclid", "yclid", "igshid", "mc_cid", "mc_eid",
+    "ref_src", "spm", "scm", "share_source", "vd_source", "_hsenc", "_hsmi", "cmpid",
+}
+_TRACKING_PREFIXES = ("utm_", "pk_", "hmsr", "hmpl", "hmcu", "hmkw", "hmci")
+
+_ARXIV_PATH_RE = re.compile(r"^/(?:abs|pdf|html)/(.+?)(?:v\d+)?(?:\.pdf)?/?$")
+
+
+def _is_tracking(key: str) -> bool:
+    key = key.lower()
+    return key in _TRACKING_PARAMS or key.startswith(_TRACKING_PREFIXES)
+
+
+def canonicalize_url(url: str) -> str:
+    """返回用于去重的规范 URL；无法解析时原样返回"""
+    try:
+        parts = urlsplit((url or "").strip())
+    except ValueError:
+        return url
+    if not parts.hostname:
+        return url
+
+    host = parts.hostname.lower()
+    if host.startswith("www."):
+        host = host[4:]
+    # 移动版百科 -> 桌面版
+    host = re.sub(r"^([a-z\-]+)\.m\.wikipedia\.org$", r"\1.wikipedia.org", host)
+    port = parts.port
+    netloc = host if port in (None, 80, 443) else f"{host}:{port}"
+    path = parts.path or "/"
+
+    # arXiv：abs / pdf / html 与各版本号指向同一篇论文
+    if host in ("arxiv.org", "export.arxiv.org"):
+        match = _ARXIV_PATH_RE.match(path)
+        if match:
+            return f"https://arxiv.org/abs/{match.group(1)}"
+
+    # GitHub：owner / 仓库名大小写不敏感 (其后的分支与文件路径区分大小写)，.git 后缀等价
+    if host == "github.com":
+        segments = path.split("/")
+        if len(segments) > 2 and segments[2].endswith(".git"):
+            segments[2] = segments[2][:-4]
+        path = "/".join(s.lower() if i <= 2 else s for i, s in enumerate(segments))
+
+    if len(path) > 1 and path.endswith("/"):
+        path = path.rstrip("/")
+
+    query = urlencode(sorted(
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if not _is_tracking(k)
+    ))
+    # http 与 https 视为同一资源
+    return urlunsplit(("https", netloc, path, query, ""))
@@ -0,0 +1,87 @@
+# app/modules/perception/wiki_provider.py
+"""
+Wikipedia 检索 (MediaWiki 批量查询)
+
+逐个词条取摘要需要 1 次搜索 + N 次详情请求，遇到歧义页还要再来一轮，中文无结果时
+整套流程再对英文重跑一遍。这里用 generator=search 把"搜索 + 摘要 + 规范 URL + 歧义标记"
+合并为每种语言 1 次请求，中英文并发发出。歧义页不再额外请求其候选词条，
+而是在同一次搜索中多取几条结果，用排名紧随其后的正式词条替补。
+无论返回多少词条，每次检索的耗时都只相当于 1 次请求。
+"""
+import asyncio
+from typing import Dict, List, Optional
+
+from app.core.http import http_clients
+
+# 中文优先，英文作为回退
+WIKI_LANGS = ("zh", "en")
+# 为歧义页预留的替补名额
+DISAMBIGUATION_SPARES = 3
+
+_PAGE_PROPS = {
+    "prop": "extracts|info|pageprops",
+    "exintro": 1,
+    "explaintext": 1,
+    "exlimit": "max",
+    "inprop": "url",
+    "ppprop": "disambiguation",
+    "redirects": 1,
+}
+
+
+def _api_url(lang: str) -> str:
+    return f"https://{lang}.wikipedia.org/w/api.php"
+
+
+async def _query(lang: str, params: Dict) -> Dict:
+    # 语言通过 URL 区分，不依赖任何进程级全局状态
+    url = _api_url(lang)
+    client = http_clients.get("api", url)
+    resp = await client.get(url, params={"action": "query", "format": "json", "formatversion": 2, **params})
+    resp.raise_for_status()
+    return resp.json()
+
+
+def _is_disambiguation(page: Dict) -> bool:
+    return "disambiguation" in page.get("pageprops", {})
+
+
+def _to_result(page: Dict) -> Dict:
+    return {
+        "url": page["fullurl"],
+        "title": f"[Wiki] {page['title']}",
+        "snippet": page.get("extract", "")[:500] + "...",
+        "source": "wiki"
+    }
+
+
+async def _search_lang(lang: str, query: str, limit: int) -> List[Dict]:
+    data = await _query(lang, {
+        **_PAGE_PROPS,
+        "generator": "search",
+        "gsrsearch": query,
+        # 多取几条，用于替补被剔除的歧义页
+        "gsrlimit": limit + DISAMBIGUATION_SPARES,
+    })
+    pages = sorted(
+        (p for p in data.get("query", {}).get("pages", [])
+         if not p.get("missing") and not _is_disambiguation(p) and p.get("fullurl")),
+        key=lambda p: p.get("index", 0),
+    )
+    return [_to_result(p) for p in pages[:limit]]
+
+
+async def search(query: str, limit: int) -> List[Dict]:
+    """中英文并发检索，优先返回中文结果，中文无结果时使用英文结果"""
+    by_lang = await asyncio.gather(*[_search_lang(lang, query, limit) for lang in WIKI_LANGS],
+                                   return_exceptions=True)
+    error: Optional[BaseException] = None
+    for results in by_lang:
+        if isinstance(results, BaseException):
+            error = error or results
+            continue
+        if results:
+            return results
+    if error:
+        raise error
+    return []
@@ -30,7 +30,7 @@ class VerificationAgent:
     """
     
     @staticmethod
-    async def extract_claims(text: str) -> List[FactClaim]:
+    async def extract_claims(text: str, task_id: str = None) -> List[FactClaim]:
         """第一步：提取关键事实断言 (Map-Reduce 模式)"""
         splitter = RecursiveCharacterTextSplitter(
             chunk_size=4000,
@@ -43,7 +43,7 @@ class VerificationAgent:
         
         async def process_chunk(chunk_text: str) -> List[dict]:
             prompt = ResearchPrompts.verification_claims_extraction(chunk_text)
-            response = await simple_llm_call(prompt, model=settings.MODEL_CHAT)
+            response = await simple_llm_call(prompt, model=settings.MODEL_CHAT, task_id=task_id, priority="batch")
             result = parse_json_safe(response)
             return result if isinstance(result, list) else []
 
@@ -65,15 +65,18 @@ class VerificationAgent:
         return final_claims
 
     @staticmethod
-    async def verify_claim(claim: FactClaim) -> FactClaim:
+    async def verify_claim(claim: FactClaim, task_id: str = None, allow_debate: bool = True) -> FactClaim:
         """
         第二步：独立搜索验证 + 🟢 自动辩论升级
+
+        Args:
+            allow_debate: 是否允许升级到 MAD 辩论 (截止时间临近时关闭，争议断言直接标记为 Disputed)
         """
         print(f"🔍 [Verification] Checking: {claim.claim}")
         
         # 1. 获取上下文
         try:
-            results = await search_tool(f"verify {claim.claim}")
+            results = await search_tool(f"verify {claim.claim}", task_id=task_id, priority="batch")
             context = "\n".join([r["snippet"] for r in results]) if results else "No search results found."
         except Exception as e:
             print(f"⚠️ Search failed: {e}")
@@ -81,7 +84,7 @@ class VerificationAgent:
         
         # 2. 初始 LLM 判定
         prompt = ResearchPrompts.verification_claim_check(claim.claim, context)
-        response = await simple_llm_call(prompt, model=settings.MODEL_REASONING)
+        response = await simple_llm_call(prompt, model=settings.MODEL_REASONING, task_id=task_id, priority="batch")
 
         data = parse_json_safe(response)
         if data:
@@ -92,11 +95,15 @@ class VerificationAgent:
 
             # 🟢 3. MAD 自动升级机制 (Auto-Escalation)
             # 如果初始判定有争议，启动辩论框架进行深究
-            if initial_status == "Disputed":
+            if initial_status == "Disputed" and not allow_debate:
+                claim.verification_status = "Disputed"
+                print(f"⏳ [Verification] MAD skipped under deadline pressure: {claim.claim}")
+
+            elif initial_status == "Disputed":
                 print(f"🚨 [Verification] Dispute detected! Escalating to MAD protocol for: {claim.claim}")
 
                 # 启动辩论
-                debate_result = await MADFramework.conduct_debate(claim.claim, context)
+                debate_result = await MADFramework.conduct_debate(claim.claim, context, task_id=task_id)
 
                 # 根据辩论结果更新状态
                 # 如果正方(Affirmative)赢了，说明原断言其实是成立的，之前可能误判
@@ -126,10 +133,16 @@ class VerificationAgent:
         return claim
 
     @classmethod
-    async def verify_report(cls, draft: str) -> str:
-        """主入口"""
+    async def verify_report(cls, draft: str, task_id: str = None, allow_debate: bool = True) -> str:
+        """
+        主入口
+
+        Args:
+            task_id: 所属研究任务，任务取消时所有在途的搜索、判定和辩论一并中断
+            allow_debate: 是否允许争议断言升级到 MAD 辩论
+        """
         # 1. 提取
-        claims = await cls.extract_claims(draft)
+        claims = await cls.extract_claims(draft, task_id=task_id)
         if not claims:
             # 添加未验证警告说明，而非静默跳过
             warning = "\n\n---\n> ⚠️ **注意**：系统未能从文本中提取出可验证的独立事实断言，本报告未经自动化事实核查。"
@@ -139,7 +152,7 @@ class VerificationAgent:
         sem = asyncio.Semaphore(5)
         async def sem_task(c):
             async with sem:
-                return await cls.verify_claim(c)
+                return await cls.verify_claim(c, task_id=task_id, allow_debate=allow_debate)
 
         verified_claims = await asyncio.gather(*[sem_task(c) for c in claims])
         
@@ -0,0 +1,28 @@
+# app/pdf_worker.py
+"""
+PDF 文字层提取的工作进程函数
+
+只依赖 PyMuPDF。放在 app 包顶层而不是 app.modules.perception 下：后者的 __init__ 会导入
+crawler / search (crawl4ai、litellm、PaddleOCR 探测以及各 SQLite 缓存单例)，
+工作进程按模块名导入这里的函数时不应连带打开这些资源。
+"""
+from typing import List, Sequence, Tuple
+
+import fitz  # PyMuPDF
+
+
+def hit_terms(text: str, terms: Sequence[str]) -> Tuple[int, ...]:
+    """文本中命中的关键词下标 (terms 为小写)"""
+    lowered = text.lower()
+    return tuple(i for i, term in enumerate(terms) if term in lowered)
+
+
+def extract_range(path: str, start: int, end: int,
+                  terms: Sequence[str]) -> List[Tuple[str, Tuple[int, ...]]]:
+    """[工作进程] 独立打开文档，提取 [start, end) 页的文字层与命中的关键词"""
+    pages = []
+    with fitz.open(path, filetype="pdf") as doc:
+        for i in range(start, end):
+            text = doc[i].get_text()
+            pages.append((text, hit_terms(text, terms) if terms else ()))
+    return pages
@@ -1,11 +1,37 @@
 # main.py
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.api.research import router as research_router
+from app.api.system import router as system_router
+from app.core.http import http_clients
+from app.modules.perception.tavily_keys import tavily_keys
+from app.modules.perception.browser_pool import browser_pool
+from app.modules.perception.ocr_service import ocr_service
+from app.modules.perception.pdf_parallel import pdf_extractor
 import uvicorn
 from app.core.config import settings
 
-app = FastAPI(title="Deep Research Backend")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # 预热常驻浏览器池，首个抓取请求无需等待 Chromium 启动
+    try:
+        await browser_pool.start()
+    except Exception as e:
+        print(f"⚠️ Browser pool warm-up failed, will retry on first crawl: {e}")
+    # PDF 文字层提取进程在后台启动 (不阻塞服务就绪)
+    pdf_extractor.warm_up()
+    yield
+    await browser_pool.close()
+    ocr_service.shutdown()
+    pdf_extractor.shutdown()
+    # 关闭共享 HTTP 连接池，并落盘 Tavily Key 计数
+    await http_clients.aclose()
+    tavily_keys.flush()
+
+
+app = FastAPI(title="Deep Research Backend", lifespan=lifespan)
 
 # 添加 CORS 中间件
 app.add_middleware(
@@ -18,6 +44,7 @@ app.add_middleware(
 
 # 注册路由
 app.include_router(research_router, prefix="/api")
+app.include_router(system_router, prefix="/api")
 
 if __name__ == "__main__":
     print(f"🚀 Starting server on {settings.API_HOST}:{settings.API_PORT}")
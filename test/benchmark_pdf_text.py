@@ -0,0 +1,101 @@
+"""
+大型 PDF 文字层提取吞吐基准
+
+生成一份带目录的合成 PDF (默认 500 页)，分别测量：
+    - 串行提取 (原 process_pdf_sync 的逐页 get_text)
+    - 多进程并行提取 (不同工作进程数)
+    - 并行 + 相关页筛选
+
+用法 (在项目根目录)：
+    python test/benchmark_pdf_text.py --pages 500 --workers 1 2 4
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fitz  # noqa: E402
+
+from app.modules.perception.pdf_parallel import ParallelPdfExtractor  # noqa: E402
+from app.modules.perception.reranker import tokenize  # noqa: E402
+
+# 章节标题 -> 该章节正文特有的词汇 (其余为通用词)
+TOPICS = {
+    "Revenue and profit analysis": "revenue profit margin quarter 营收 利润",
+    "Battery supply chain": "battery cell lithium supplier chain 电池 供应链",
+    "Autonomous driving software": "autonomous driving software sensor model 自动驾驶",
+    "Energy storage business": "energy storage grid capacity deployment 储能",
+    "Regulatory environment": "regulation policy subsidy compliance 监管 政策",
+    "Risk factors": "risk uncertainty litigation exposure 风险",
+}
+WORDS = "the company group market growth segment vehicle customer region year total 市场 增长 公司".split()
+FOCUS = "battery supply chain and energy storage capacity"
+
+
+def build_pdf(path: str, pages: int, seed: int = 7):
+    rng = random.Random(seed)
+    doc = fitz.open()
+    toc = []
+    section_len = max(1, pages // 25)
+    for i in range(pages):
+        page = doc.new_page()
+        if i % section_len == 0:
+            topic = rng.choice(list(TOPICS))
+            vocab = WORDS * 3 + TOPICS[topic].split()
+            toc.append([1, f"{len(toc) + 1}. {topic}", i + 1])
+            page.insert_text((72, 60), toc[-1][1], fontsize=16)
+        body = " ".join(rng.choice(vocab) for _ in range(320))
+        page.insert_textbox(fitz.Rect(72, 80, 540, 760), body, fontsize=9, fontname="china-s")
+    doc.set_toc(toc)
+    doc.save(path)
+    doc.close()
+
+
+def run(label: str, extractor: ParallelPdfExtractor, path: str, terms=(), relevant_only=False):
+    with fitz.open(path) as doc:
+        started = time.perf_counter()
+        first_page_at = None
+        kept = 0
+        for i, text in extractor.iter_pages(doc, path, terms, relevant_only=relevant_only):
+            if first_page_at is None:
+                first_page_at = time.perf_counter() - started
+            kept += text is not None
+        elapsed = time.perf_counter() - started
+        total = len(doc)
+    print(f"{label:<28} {elapsed:7.2f}s  {total / elapsed:8.1f} pages/s  "
+          f"first page {first_page_at * 1000:7.1f} ms  kept {kept}/{total}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, default=500)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.gettempdir(), f"apex_bench_{args.pages}.pdf")
+    started = time.perf_counter()
+    build_pdf(path, args.pages)
+    print(f"📄 Synthetic PDF: {args.pages} pages, {os.path.getsize(path) / 1048576:.1f} MB "
+          f"(built in {time.perf_counter() - started:.1f}s), CPUs: {os.cpu_count()}")
+
+    run("serial", ParallelPdfExtractor(workers=0, min_pages=0), path)
+    for workers in args.workers:
+        extractor = ParallelPdfExtractor(workers=workers, min_pages=0)
+        # 进程池就绪前的文档走串行；进程启动单独计时，不计入吞吐
+        run(f"parallel x{workers} (starting)", extractor, path)
+        started = time.perf_counter()
+        while not extractor.ready:
+            time.sleep(0.01)
+        print(f"{'pool start':<28} {time.perf_counter() - started:7.2f}s (after the run above)")
+        run(f"parallel x{workers}", extractor, path)
+        run(f"parallel x{workers} relevant", extractor, path, terms=tokenize(FOCUS), relevant_only=True)
+        extractor.shutdown()
+    os.unlink(path)
+
+
+if __name__ == "__main__":
+    main()